@@ -0,0 +1,229 @@
+"""
+Gateway Client
+Shared HTTP client for the gateway scripts (termux_sender, termux_inbound_forwarder,
+backend/gateway_simulator.py and demo_app):
+- one pooled keep-alive requests.Session per client
+- retries with jittered exponential backoff on connection errors, timeouts, 429 and 5xx
+  (honouring Retry-After), only for calls that are safe to repeat
+- gzip-compressed request bodies above `compress_min_bytes`; gzip responses are accepted
+  and gunzipped here, refusing bodies that inflate past `max_response_bytes`
+- typed methods for the gateway endpoints; outbound polls can use the compact format
+  (one body per template, parallel id / phone lists), msgpack when installed, and a
+  per-poll claim token, repeated until a response arrives, that recovers a batch whose
+  response was lost
+
+Copy this file next to the Termux scripts on the phone; it only needs `requests`.
+"""
+import gzip
+import json
+import random
+import time
+import uuid
+import zlib
+from typing import Dict, List, Literal, Optional, TypedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+try:
+    import msgpack
+except ImportError:  # optional; responses then come back as JSON
+    msgpack = None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+READ_CHUNK = 64 * 1024
+
+
+class ResponseTooLarge(requests.RequestException):
+    """The response body (after gunzip) exceeded the client's max_response_bytes."""
+
+
+class _OutboundBase(TypedDict):
+    id: int
+    phone: str
+    body: str
+    purpose: str
+    disaster_id: Optional[int]
+    segments: int  # SMS parts the body goes out as
+
+
+class OutboundMessage(_OutboundBase, total=False):
+    created_at: str  # absent in the compact format
+    attempt_count: int
+    claim_token: Optional[str]  # lease this row was claimed under; echo it in failed reports
+
+
+class StatusReport(TypedDict, total=False):
+    id: int
+    status: Literal["sent", "delivered", "failed"]
+    error: Optional[str]
+    # a failure is applied only while this gateway / claim still holds the row
+    gateway_id: str
+    claim_token: Optional[str]
+
+
+class InboundSMS(TypedDict, total=False):
+    # "from" is a keyword, so build these as dicts: {"from": ..., "message": ...}
+    message: str
+    gateway_msg_id: Optional[str]
+
+
+class GatewayClient:
+    def __init__(self, base_url: str, timeout: float = 15, retries: int = 4, backoff_base: float = 0.5,
+                 backoff_max: float = 30, compress_min_bytes: int = 1024, pool_size: int = 4,
+                 max_response_bytes: int = 16 * 1024 * 1024):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.compress_min_bytes = compress_min_bytes
+        self.max_response_bytes = max_response_bytes
+        self._poll_tokens: Dict[str, str] = {}  # gateway_id -> token of a poll not yet answered
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip"
+        self.session.headers["Accept"] = "application/msgpack, application/json" if msgpack else "application/json"
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "GatewayClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to sleep before retry `attempt` (0-based): full jitter, capped."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method: str, path: str, *, params: Optional[dict] = None, json_body=None,
+                timeout: Optional[float] = None, idempotent: bool = True):
+        """Send one API call and return the decoded JSON.
+
+        Non-idempotent calls are retried only when the connection could not be opened,
+        i.e. when the server cannot have seen the request.
+        """
+        headers = {}
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body, separators=(",", ":")).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+            if len(data) >= self.compress_min_bytes:
+                data = gzip.compress(data, compresslevel=6)
+                headers["Content-Encoding"] = "gzip"
+        attempt = 0
+        while True:
+            try:
+                r = self.session.request(method, self.base_url + path, params=params, data=data,
+                                         headers=headers, timeout=timeout or self.timeout, stream=True)
+            except requests.ConnectionError as e:
+                retry = idempotent or isinstance(e, requests.ConnectTimeout) or _not_sent(e)
+                if not retry or attempt >= self.retries:
+                    raise
+                delay = self.backoff(attempt)
+            except requests.Timeout:
+                if not idempotent or attempt >= self.retries:
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if r.status_code not in RETRY_STATUS or not idempotent or attempt >= self.retries:
+                    body = self._read_body(r)
+                    r.raise_for_status()  # the error's response carries the body (e.g. FastAPI's detail)
+                    if msgpack is not None and r.headers.get("Content-Type", "").startswith("application/msgpack"):
+                        return msgpack.unpackb(body)
+                    return json.loads(body)
+                delay = self.backoff(attempt, r.headers.get("Retry-After"))
+                r.close()
+            attempt += 1
+            time.sleep(delay)
+
+    def _read_body(self, r: requests.Response) -> bytes:
+        """Read and gunzip the body ourselves so a small gzip bomb can't inflate past
+        max_response_bytes in memory; requests would decode the whole thing first."""
+        limit = self.max_response_bytes
+        gunzip = None
+        if r.headers.get("Content-Encoding", "").lower() == "gzip":
+            gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = bytearray()
+        try:
+            for chunk in r.raw.stream(READ_CHUNK, decode_content=False):
+                if gunzip is not None:
+                    chunk = gunzip.decompress(chunk, limit + 1 - len(body))
+                body += chunk
+                if len(body) > limit:
+                    raise ResponseTooLarge(f"response body over {limit} bytes", response=r)
+        finally:
+            r.close()
+        r._content = bytes(body)  # so r.json() / r.text work on the decoded body
+        return r._content
+
+    # ---------- gateway endpoints ----------
+    def fetch_outbound(self, limit: int, gateway_id: str, wait: float = 0,
+                       lease_seconds: Optional[int] = None, since_id: Optional[int] = None,
+                       max_segments: Optional[int] = None, compact: bool = False) -> List[OutboundMessage]:
+        # rows come back leased to gateway_id, which must be unique to this phone; the server
+        # holds the request up to `wait` seconds until something is queued (long-poll). Each
+        # poll carries a claim token that is reused until a response arrives, so a retry after
+        # a lost response gets that claim's rows back; since_id (the highest id received so
+        # far) keeps rows this gateway already has out of it.
+        token = self._poll_tokens.setdefault(gateway_id, uuid.uuid4().hex)
+        params = {"limit": limit, "gateway_id": gateway_id, "wait": wait, "claim_token": token}
+        if lease_seconds is not None:
+            params["lease_seconds"] = lease_seconds
+        if since_id is not None:
+            params["since_id"] = since_id
+        if max_segments is not None:
+            params["max_segments"] = max_segments
+        if compact:
+            params["format"] = "compact"
+        res = self.request("GET", "/gateway/outbound", params=params, timeout=wait + self.timeout)
+        del self._poll_tokens[gateway_id]  # answered: the next poll claims under a fresh token
+        return expand_compact(res) if compact else res
+
+    def mark_sent(self, ids: List[int]) -> Dict[str, int]:
+        return self.request("POST", "/gateway/mark-sent", json_body=list(ids))
+
+    def report_status(self, reports: List[StatusReport]) -> Dict[str, int]:
+        return self.request("POST", "/gateway/delivered", json_body=list(reports))
+
+    def post_inbound(self, from_: str, message: str, gateway_msg_id: Optional[str] = None) -> dict:
+        # without a gateway_msg_id the server can't dedupe a replay, so don't risk one
+        body = {"from": from_, "message": message, "gateway_msg_id": gateway_msg_id}
+        return self.request("POST", "/receive-sms", json_body=body, idempotent=gateway_msg_id is not None)
+
+    def post_inbound_batch(self, items: List[InboundSMS]) -> List[dict]:
+        idempotent = all(i.get("gateway_msg_id") for i in items)
+        return self.request("POST", "/receive-sms/batch", json_body=list(items), timeout=30,
+                            idempotent=idempotent)["results"]
+
+    def get(self, path: str, **params):
+        return self.request("GET", path, params=params or None)
+
+    def post(self, path: str, body=None, idempotent: bool = False):
+        return self.request("POST", path, json_body=body, idempotent=idempotent)
+
+
+def expand_compact(page: dict) -> List[OutboundMessage]:
+    """Flatten a compact /gateway/outbound page back into one dict per message."""
+    out: List[OutboundMessage] = []
+    for t in page["templates"]:
+        for sms_id, phone in zip(t["ids"], t["phones"]):
+            out.append({"id": sms_id, "phone": phone, "body": t["body"], "purpose": t["purpose"],
+                        "disaster_id": t["disaster_id"], "segments": t.get("segments", 1),
+                        "claim_token": t.get("claim_token")})
+    return out
+
+
+def _not_sent(exc: requests.ConnectionError) -> bool:
+    # refused / unresolvable: urllib3 never got a socket, so nothing reached the server
+    reason = exc.args[0] if exc.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 """
 Termux Inbound Forwarder
-- Polls Android SMS inbox via Termux:API and forwards new messages to backend /receive-sms
+- Polls Android SMS inbox via Termux:API and forwards new messages to backend /receive-sms/batch
+  (the backlog after an outage goes up gzipped in chunks of --batch-size, over one keep-alive
+  connection, retried with backoff; see gateway_client.py)
 
 Requirements on the Android phone (Termux):
   pkg update && pkg install -y python termux-api
   pip install requests
+  # copy gateway_client.py next to this script
   export BASE_URL=http://<YOUR_PC_LAN_IP>:8000
   python termux_inbound_forwarder.py --interval 5 --limit 50
 
@@ -19,34 +22,115 @@ import json
 import os
 import subprocess
 import time
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Set
+
+from gateway_client import GatewayClient
+
+
+SEEN_PATH = os.path.expanduser("~/.termux_inbound_seen.log")
+# where earlier versions kept {"seen": [hash, ...]}; still read so an upgrade doesn't re-post
+LEGACY_STATE_PATH = os.path.expanduser("~/.termux_inbound_state.json")
+
+
+class SeenStore:
+    """Bounded, insertion-ordered set of forwarded message keys.
+
+    Persisted as an append-only log: each poll appends only its new keys, and the file is
+    compacted to the newest `capacity` keys once it holds twice that many lines. The
+    backend dedupes on gateway_msg_id as well, so this store only saves round trips.
+    """
+
+    def __init__(self, path: str, capacity: int = 5000):
+        self.path = path
+        self.capacity = capacity
+        self._keys: "OrderedDict[str, None]" = OrderedDict()
+        self._pending: List[str] = []
+        self._lines = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._lines += 1
+                    self._remember(line.strip())
+
+    def _remember(self, key: str) -> None:
+        if not key:
+            return
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def add(self, key: str) -> None:
+        if key not in self._keys:
+            self._pending.append(key)
+        self._remember(key)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        if self._lines + len(self._pending) > 2 * self.capacity:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(k + "\n" for k in self._keys)
+            os.replace(tmp, self.path)
+            self._lines = len(self._keys)
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(k + "\n" for k in self._pending)
+            self._lines += len(self._pending)
+        self._pending.clear()
 
-import requests
 
-
-STATE_PATH = os.path.expanduser("~/.termux_inbound_state.json")
-
-
-def load_state() -> Dict:
-    if os.path.exists(STATE_PATH):
-        try:
-            with open(STATE_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+def hash_msg(m: Dict) -> str:
+    # identity of the SMS itself; excludes mutable fields such as `read`
+    key = f"{m.get('_id', m.get('id'))}-{m.get('number')}-{m.get('body')}-{m.get('received', m.get('date'))}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
 
-def save_state(state: Dict) -> None:
-    tmp = STATE_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(state, f)
-    os.replace(tmp, STATE_PATH)
+def legacy_hashes(m: Dict) -> Set[str]:
+    # the key earlier versions stored: it included `read`, which flips once the SMS is
+    # opened, so both values are tried
+    base = f"{m.get('id')}-{m.get('number')}-{m.get('body')}-{m.get('date')}"
+    return {hashlib.sha256(f"{base}-{read}".encode("utf-8")).hexdigest() for read in (m.get("read"), True, False)}
 
 
-def hash_msg(m: Dict) -> str:
-    key = f"{m.get('id')}-{m.get('number')}-{m.get('body')}-{m.get('date')}-{m.get('read')}"
-    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+def load_legacy_seen(path: str = LEGACY_STATE_PATH) -> Set[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return set(json.load(f).get("seen", []))
+    except (OSError, ValueError, AttributeError):
+        return set()
+
+
+def new_messages(msgs: List[Dict], seen: SeenStore, legacy: Set[str] = frozenset()) -> List[tuple]:
+    """(key, /receive-sms item) for inbox messages not forwarded yet, oldest first.
+
+    A message an earlier version already forwarded (found in `legacy`) is recorded in
+    `seen` under its current key and skipped.
+    """
+    pending = []
+    # Newest last for natural processing order
+    for m in reversed(msgs):
+        # Consider only inbox messages
+        if m.get("type", "").lower() != "inbox":
+            continue
+        h = hash_msg(m)
+        if h in seen:
+            continue
+        if legacy and not legacy.isdisjoint(legacy_hashes(m)):
+            seen.add(h)
+            continue
+        frm = m.get("number") or m.get("address") or ""
+        body = m.get("body") or ""
+        if not frm or not body:
+            continue
+        # the hash doubles as the server-side idempotency key for retries
+        pending.append((h, {"from": frm, "message": body, "gateway_msg_id": h}))
+    return pending
 
 
 def inbox(limit: int = 50) -> List[Dict]:
@@ -61,58 +145,43 @@ def inbox(limit: int = 50) -> List[Dict]:
         raise RuntimeError(f"Failed to parse inbox JSON: {e}\nOutput: {p.stdout[:300]}")
 
 
-def forward(base_url: str, frm: str, body: str) -> None:
-    r = requests.post(
-        f"{base_url}/receive-sms",
-        json={"from": frm, "message": body},
-        timeout=15,
-    )
-    r.raise_for_status()
-
-
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--base-url", default=os.environ.get("BASE_URL", "http://127.0.0.1:8000"))
     ap.add_argument("--interval", type=int, default=5)
     ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--batch-size", type=int, default=100, help="Messages per /receive-sms/batch call")
     args = ap.parse_args()
 
-    state = load_state()
-    seen = set(state.get("seen", []))
+    seen = SeenStore(SEEN_PATH)
+    legacy = load_legacy_seen()
+    client = GatewayClient(args.base_url)
 
-    print(f"[INBOUND] Polling inbox every {args.interval}s -> {args.base_url}/receive-sms")
+    print(f"[INBOUND] Polling inbox every {args.interval}s -> {args.base_url}/receive-sms/batch")
     try:
         while True:
             try:
-                msgs = inbox(args.limit)
-                # Newest last for natural processing order
-                for m in reversed(msgs):
-                    # Consider only inbox messages
-                    if m.get("type", "").lower() != "inbox":
-                        continue
-                    h = hash_msg(m)
-                    if h in seen:
-                        continue
-                    frm = m.get("number") or m.get("address") or ""
-                    body = m.get("body") or ""
-                    if not frm or not body:
-                        continue
+                pending = new_messages(inbox(args.limit), seen, legacy)
+                for i in range(0, len(pending), args.batch_size):
+                    chunk = pending[i:i + args.batch_size]
                     try:
-                        forward(args.base_url, frm, body)
-                        print(f"[INBOUND] Forwarded from {frm}: {body[:60].replace('\n',' ')}...")
-                        seen.add(h)
-                        # Persist a bounded history
-                        if len(seen) > 1000:
-                            seen = set(list(seen)[-500:])
+                        # one round trip (and one DB transaction) for a whole chunk of the backlog
+                        client.post_inbound_batch([item for _, item in chunk])
                     except Exception as e:
                         print(f"[ERR] Forward failed: {e}")
+                        break  # keep order: retry this chunk and the rest next poll
+                    for h, item in chunk:
+                        seen.add(h)
+                        preview = item["message"][:60].replace("\n", " ")
+                        print(f"[INBOUND] Forwarded from {item['from']}: {preview}...")
             except Exception as e:
                 print(f"[ERR] Inbox poll failed: {e}")
-            state = {"seen": list(seen)}
-            save_state(state)
+            seen.flush()
             time.sleep(args.interval)
     except KeyboardInterrupt:
         print("[INBOUND] Stopped")
+    finally:
+        client.close()
 
 
 if __name__ == "__main__":
@@ -1,70 +1,269 @@
 #!/usr/bin/env python3
 """
 Termux SMS Sender
-- Polls backend outbound queue
-- Sends using termux-sms-send (Termux:API required)
-- Marks messages as sent
+- Polls backend outbound queue (prefetching the next batch while the current one sends)
+  in the compact wire format; a lost response is re-delivered on the next poll
+- Sends using termux-sms-send (Termux:API required) from a small worker pool, one or
+  more workers per SIM slot, each SIM paced by its own token bucket
+- Reports sent / failed per message to /gateway/delivered in small batches as they finish,
+  so a failure mid-batch never causes already-sent messages to go out again
 
 Usage on Android (Termux):
   pkg update && pkg install -y python termux-api
   pip install requests
+  # copy gateway_client.py next to this script
   export BASE_URL=http://<YOUR_PC_LAN_IP>:8000
-  python termux_sender.py --interval 10 --limit 20
+  python termux_sender.py --wait 30 --limit 20 --gateway-id phone-1
+  # dual-SIM phone, 20 SMS/min on each SIM
+  python termux_sender.py --sims 0,1 --rate 20 --gateway-id phone-1
+
+Several phones may run this at once. Each install generates its own gateway id on first
+run and keeps it in ~/.termux_gateway_id; --gateway-id / GATEWAY_ID override it.
+
+Android itself caps SMS per app (30 per 30 minutes by default); raise it with
+  adb shell settings put global sms_outgoing_check_max_count 10000
+before setting --rate above that.
 
 Grant SMS permissions to Termux if prompted.
 """
 import os
+import queue
+import threading
 import time
 import subprocess
 import argparse
-import requests
+import uuid
+from typing import Dict, List, Optional
 
+from gateway_client import GatewayClient
 
-def fetch_outbound(base_url, limit=20):
-    r = requests.get(f"{base_url}/gateway/outbound", params={"limit": limit}, timeout=15)
-    r.raise_for_status()
-    return r.json()
+GATEWAY_ID_PATH = os.path.expanduser("~/.termux_gateway_id")
 
 
-def mark_sent(base_url, ids):
-    r = requests.post(f"{base_url}/gateway/mark-sent", json=ids, timeout=15)
-    r.raise_for_status()
-    return r.json()
+def send_sms(number, body, sim_slot=None):
+    # termux-sms-send -n <number> [-s <slot>] "body"
+    cmd = ["termux-sms-send", "-n", number]
+    if sim_slot is not None:
+        cmd += ["-s", str(sim_slot)]
+    result = subprocess.run(cmd + [body], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"termux-sms-send failed: {result.stderr.strip()}")
 
 
-def send_sms(number, body):
-    # termux-sms-send -n <number> "body"
-    cmd = ["termux-sms-send", "-n", number, body]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise RuntimeError(f"termux-sms-send failed: {result.stderr}")
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event, n: int = 1) -> bool:
+        """Block until `n` tokens are available (at most `burst` are ever needed up front;
+        the rest is borrowed and slows the next callers). False if `stop` is set meanwhile."""
+        need = min(n, self.burst)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= need:
+                    self._tokens -= n
+                    return True
+                delay = (need - self._tokens) / self.rate
+            if stop.wait(delay):
+                return False
+
+
+class StatusReporter(threading.Thread):
+    """Collects per-message results from the workers and posts them in small batches.
+
+    A batch goes up once `batch_size` results are waiting or `interval` seconds after the
+    oldest one arrived. On a network error the batch is kept and retried, so a result is
+    only dropped if the process dies before the server hears about it (the row's lease
+    then expires and it is requeued).
+    """
+
+    def __init__(self, client: GatewayClient, gateway_id: str, batch_size: int = 20, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.client = client
+        self.gateway_id = gateway_id
+        self.batch_size = batch_size
+        self.interval = interval
+        self.results: "queue.Queue[dict]" = queue.Queue()
+        self._pending: Dict[int, dict] = {}
+        self._closing = threading.Event()
+
+    def put(self, report: dict) -> None:
+        # identifies the claim, so a late failure can't requeue a row another gateway now holds
+        self.results.put({**report, "gateway_id": self.gateway_id})
+
+    def run(self) -> None:
+        first = None
+        while not (self._closing.is_set() and self.results.empty()):
+            try:
+                r = self.results.get(timeout=0.2)
+                self._pending[r["id"]] = r
+                first = first or time.monotonic()
+            except queue.Empty:
+                pass
+            due = first is not None and time.monotonic() - first >= self.interval
+            if len(self._pending) >= self.batch_size or due:
+                first = None if self._flush() else time.monotonic()
+        self._flush()
+
+    def _flush(self) -> bool:
+        if not self._pending:
+            return True
+        try:
+            res = self.client.report_status(list(self._pending.values()))
+        except Exception as e:
+            print(f"[ERR] status report ({len(self._pending)} pending): {e}")
+            return False
+        print(f"[TERMUX] Reported {len(self._pending)}: {res}")
+        self._pending.clear()
+        return True
+
+    def close(self, timeout: float = 15) -> None:
+        self._closing.set()
+        self.join(timeout)
+
+
+class Sim:
+    def __init__(self, slot: Optional[int], rate_per_min: float, burst: int):
+        self.slot = slot
+        self.bucket = TokenBucket(rate_per_min / 60.0, burst)
+        self.sent = 0
+
+    @property
+    def name(self) -> str:
+        return "default" if self.slot is None else f"sim{self.slot}"
+
+
+def worker(sim: Sim, outbox: "queue.Queue", reporter: StatusReporter, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            msg, deadline = outbox.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        try:
+            # carriers meter SMS parts, so a multipart message costs one token per part
+            if not sim.bucket.acquire(stop, msg.get("segments", 1)):
+                return  # unsent: its lease runs out and the server requeues it
+            if time.monotonic() > deadline:
+                # lease (nearly) expired: another gateway may own it by now, sending would duplicate
+                print(f"[TERMUX] Lease expired, skipping {msg['id']}")
+                continue
+            try:
+                send_sms(msg["phone"], msg["body"], sim.slot)
+            except Exception as e:
+                reporter.put({"id": msg["id"], "status": "failed", "error": str(e)[:255],
+                              "claim_token": msg.get("claim_token")})
+                print(f"[ERR] {sim.name} -> {msg['phone']}: {e}")
+            else:
+                sim.sent += 1
+                reporter.put({"id": msg["id"], "status": "sent"})
+                print(f"[TERMUX] {sim.name} sent to {msg['phone']}: {msg['body']}")
+        finally:
+            outbox.task_done()
+
+
+def backlog_limit(sims: List[Sim], lease_seconds: int, margin_s: int) -> int:
+    """How many leased messages the SIMs can get through before the leases run out."""
+    per_s = sum(s.bucket.rate for s in sims)
+    return max(1, int(per_s * max(lease_seconds - margin_s, 1)))
+
+
+def install_gateway_id(path: str = GATEWAY_ID_PATH) -> str:
+    """This install's gateway id: read from `path`, or generated and saved on first run.
+
+    Hostnames don't work as ids: every Android phone calls itself "localhost", and two
+    phones under one id could resume each other's leases.
+    """
+    try:
+        with open(path) as f:
+            gateway_id = f.read().strip()
+        if gateway_id:
+            return gateway_id
+    except FileNotFoundError:
+        pass
+    gateway_id = f"gw-{uuid.uuid4().hex[:12]}"
+    with open(path, "w") as f:
+        f.write(gateway_id + "\n")
+    return gateway_id
 
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--base-url", default=os.environ.get("BASE_URL", "http://127.0.0.1:8000"))
-    ap.add_argument("--interval", type=int, default=10)
-    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--interval", type=int, default=10, help="Pause after an error, or between polls when --wait is 0")
+    ap.add_argument("--wait", type=int, default=30, help="Long-poll seconds; 0 = plain fixed-interval polling")
+    ap.add_argument("--limit", type=int, default=20, help="Max messages claimed per poll")
+    ap.add_argument("--gateway-id", default=os.environ.get("GATEWAY_ID"),
+                    help=f"Unique per phone (default: generated once and kept in {GATEWAY_ID_PATH})")
+    ap.add_argument("--sims", default="", help="Comma-separated SIM slots to send from, e.g. 0,1 (default: the phone's default SIM)")
+    ap.add_argument("--rate", type=float, default=30, help="Carrier limit per SIM, SMS parts per minute")
+    ap.add_argument("--burst", type=int, default=5, help="Messages a SIM may send back-to-back after idling")
+    ap.add_argument("--workers-per-sim", type=int, default=2, help="Concurrent termux-sms-send calls per SIM")
+    ap.add_argument("--lease-seconds", type=int, default=120, help="Lease requested for claimed rows")
+    ap.add_argument("--lease-margin", type=int, default=15, help="Skip a message this close to its lease expiry")
+    ap.add_argument("--report-batch", type=int, default=20, help="Status reports per /gateway/delivered call")
+    ap.add_argument("--report-interval", type=float, default=1.0, help="Max seconds a status report waits to be sent")
     args = ap.parse_args()
+    args.gateway_id = args.gateway_id or install_gateway_id()
+
+    slots = [int(s) for s in args.sims.split(",") if s.strip()] or [None]
+    sims = [Sim(slot, args.rate, args.burst) for slot in slots]
+    max_backlog = backlog_limit(sims, args.lease_seconds, args.lease_margin)
+    outbox: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+    client = GatewayClient(args.base_url)
+    reporter = StatusReporter(client, args.gateway_id, args.report_batch, args.report_interval)
+    reporter.start()
+    workers = [threading.Thread(target=worker, args=(sim, outbox, reporter, stop), daemon=True)
+               for sim in sims for _ in range(max(args.workers_per_sim, 1))]
+    for t in workers:
+        t.start()
 
-    print(f"[TERMUX] Polling {args.base_url} every {args.interval}s")
+    print(f"[TERMUX] Polling {args.base_url} (long-poll {args.wait}s) with {', '.join(s.name for s in sims)} "
+          f"at {args.rate:g}/min each, backlog <= {max_backlog}")
+    since_id = None  # highest id received; rows above it from a lost poll response are re-sent
     try:
         while True:
+            queued = outbox.qsize()
+            # refill while at least half the backlog has drained, so the next batch is
+            # already here when the workers finish this one
+            room = min(args.limit, max_backlog - queued)
+            if room <= 0 or (queued and queued * 2 > max_backlog):
+                time.sleep(0.5)
+                continue
             try:
-                msgs = fetch_outbound(args.base_url, args.limit)
-                ids = []
+                # long-poll only when idle; with work in hand, take whatever is ready now
+                wait = args.wait if queued == 0 else 0
+                # budget the claim in SMS parts too, so multipart alerts don't outrun the lease
+                msgs = client.fetch_outbound(room, args.gateway_id, wait, args.lease_seconds,
+                                             since_id=since_id, max_segments=room, compact=True)
+                deadline = time.monotonic() + args.lease_seconds - args.lease_margin
                 for m in msgs:
-                    print(f"[TERMUX] Sending to {m['phone']}: {m['body']}")
-                    send_sms(m['phone'], m['body'])
-                    ids.append(m['id'])
-                if ids:
-                    res = mark_sent(args.base_url, ids)
-                    print(f"[TERMUX] Marked sent: {res}")
+                    outbox.put((m, deadline))
+                    since_id = max(since_id or 0, m["id"])
+                if not msgs and wait <= 0:
+                    time.sleep(1 if queued else args.interval)
             except Exception as e:
                 print(f"[ERR] {e}")
-            time.sleep(args.interval)
+                time.sleep(args.interval)
     except KeyboardInterrupt:
-        print("[TERMUX] Stopped")
+        print("[TERMUX] Stopping")
+    finally:
+        stop.set()
+        for t in workers:
+            t.join(5)
+        reporter.close()
+        client.close()
+        print(f"[TERMUX] Stopped; sent {', '.join(f'{s.name}={s.sent}' for s in sims)}")
+
 
 if __name__ == "__main__":
     main()
@@ -1,212 +1,465 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, Form, File, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import ValidationError
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..core.database import get_db, Base, engine
-from ..schemas.schemas import InboundSMSIn, DisasterReportOut, VerifyDisasterRequest, UserCreate, UserOut, OutboundSMSOut, MoveUser, HelpRequestOut
+from ..core.database import get_db, get_read_db, get_async_db, engine, AsyncSessionLocal
+from ..core.config import get_settings
+from ..schemas.schemas import InboundSMSIn, DisasterReportOut, VerifyDisasterRequest, UserCreate, UserOut, OutboundSMSOut, MoveUser, HelpRequestOut, FanoutJobOut, DeliveryReport
+from ..models.migrations import upgrade_schema
 from ..models.models import (
-    DisasterReport, InboundMessage, InboundKind, SeverityEnum, ReportStatus, User,
-    DisasterAlert, UserAlertLog, OutboundPurpose, OutboundSMS, HelpRequest, HelpStatus
+    DisasterReport, ReportStatus, User, DisasterAlert, OutboundSMS, HelpRequest, HelpStatus, FanoutJob
 )
-from ..services.parsing import parse_inbound
-from ..services.geofence import inside_radius
-from ..services.sms_gateway import queue_alert, fetch_unsent
-from typing import List
+from ..services.ingest import ingest_batch
+from ..services.geofence import cell_id, towers, import_towers, parse_area, prepare_area
+from ..services.sms_gateway import claim_batch, resume_claims, compact_outbound, mark_sent, record_delivery
+from ..services import fanout
+from ..services.notify import outbound_queued
+from ..services.active_index import active_disasters
+from ..services.movement import apply_moves
+from ..services.clustering import report_clusters, pending_representatives, cluster_counts
+from ..services.pagination import DEFAULT_PAGE, MAX_PAGE, keyset_page
+from typing import List, Literal
+import json
+import re
+import time
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:  # optional; gateways asking for application/msgpack get JSON instead
+    msgpack = None
 
 router = APIRouter()
 templates = Jinja2Templates(directory="backend/app/templates")
+SSE_KEEPALIVE_S = 15
+MOVE_STREAM_CHUNK = 5000
+
+# Ensure tables, plus columns / indexes added since the database was created
+# (simple hackathon approach; in prod use Alembic)
+upgrade_schema(engine)
 
-# Ensure tables (simple hackathon approach; in prod use Alembic)
-Base.metadata.create_all(bind=engine)
+async def _ingest(db: AsyncSession, items: list[tuple[str, str, str | None]]) -> list[dict]:
+    try:
+        results = await db.run_sync(ingest_batch, items)
+        await db.commit()
+    except IntegrityError:
+        # a concurrent post stored one of these gateway_msg_ids first: replay as duplicates
+        await db.rollback()
+        results = await db.run_sync(ingest_batch, items)
+        await db.commit()
+    return results
 
 @router.post("/receive-sms")
-def receive_sms(payload: InboundSMSIn, db: Session = Depends(get_db)):
-    parsed = parse_inbound(payload.message)
-    inbound = InboundMessage(phone=payload.from_, body=payload.message, kind=parsed.kind)
-    db.add(inbound)
-
-    disaster_report = None
-    if parsed.kind.name == 'REPORT' and parsed.report:
-        dr = DisasterReport(
-            raw_text=payload.message,
-            type=parsed.report.type,
-            location_text=parsed.report.location_text,
-            radius_m=parsed.report.radius_m,
-            severity=parsed.report.severity,
-            status=ReportStatus.pending,
-            reporter_phone=payload.from_,
-        )
-        db.add(dr)
-        disaster_report = dr
-    elif parsed.kind == InboundKind.HELP:
-        # create HelpRequest after commit when we have inbound id (simplify by flushing)
-        db.flush()
-        hr = HelpRequest(inbound_id=inbound.id, phone=payload.from_)
-        db.add(hr)
-    elif parsed.kind == InboundKind.SAFE:
-        pass  # could log safety confirmation
+async def receive_sms(payload: InboundSMSIn, db: AsyncSession = Depends(get_async_db)):
+    [result] = await _ingest(db, [(payload.from_, payload.message, payload.gateway_msg_id)])
+    return result
 
-    db.commit()
-    if disaster_report:
-        return {"message": "report received", "report_id": disaster_report.id}
-    return {"message": "received"}
+@router.post("/receive-sms/batch")
+async def receive_sms_batch(payload: List[InboundSMSIn], db: AsyncSession = Depends(get_async_db)):
+    # one transaction and one bulk INSERT per table for a gateway's whole backlog
+    results = await _ingest(db, [(m.from_, m.message, m.gateway_msg_id) for m in payload])
+    for m, res in zip(payload, results):
+        if m.gateway_msg_id is not None:
+            res["gateway_msg_id"] = m.gateway_msg_id
+    return {"results": results}
+
+def _page(q, id_col, cursor: str | None, limit: int, ts_col=None, response: Response | None = None):
+    try:
+        rows, next_cursor = keyset_page(q, id_col, cursor, limit, ts_col=ts_col)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if response is not None and next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows, next_cursor
+
+def _created_between(q, col, since: datetime | None, until: datetime | None):
+    if since is not None:
+        q = q.filter(col >= since)
+    if until is not None:
+        q = q.filter(col < until)
+    return q
+
+def _pending_clusters(db: Session, cursor: str | None, limit: int, since: datetime | None, until: datetime | None,
+                      response: Response | None = None) -> tuple[list[DisasterReportOut], str | None]:
+    # one row per duplicate cluster, with its size
+    q = _created_between(db.query(DisasterReport).filter(pending_representatives()), DisasterReport.created_at, since, until)
+    reports, next_cursor = _page(q, DisasterReport.id, cursor, limit, DisasterReport.created_at, response)
+    counts = cluster_counts(db, [r.id for r in reports])
+    return [DisasterReportOut.model_validate(r).model_copy(update={"report_count": counts[r.id]}) for r in reports], next_cursor
+
+def _active_query(db: Session, since: datetime | None, until: datetime | None):
+    q = db.query(DisasterReport).join(DisasterAlert).filter(DisasterReport.status==ReportStatus.approved, DisasterAlert.deactivated_at.is_(None))
+    return _created_between(q, DisasterReport.created_at, since, until)
+
+def _help_query(db: Session, status: HelpStatus | None, since: datetime | None, until: datetime | None):
+    q = db.query(HelpRequest)
+    if status is not None:
+        q = q.filter(HelpRequest.status==status)
+    return _created_between(q, HelpRequest.created_at, since, until)
 
+# list endpoints page newest-first by keyset; the next page's cursor comes back in X-Next-Cursor
 @router.get("/disasters/pending", response_model=List[DisasterReportOut])
-def list_pending(db: Session = Depends(get_db)):
-    return db.query(DisasterReport).filter(DisasterReport.status==ReportStatus.pending).all()
+def list_pending(response: Response, limit: int = DEFAULT_PAGE, cursor: str | None = None, since: datetime | None = None, until: datetime | None = None, db: Session = Depends(get_read_db)):
+    return _pending_clusters(db, cursor, limit, since, until, response)[0]
 
 @router.get("/disasters/active", response_model=List[DisasterReportOut])
-def list_active(db: Session = Depends(get_db)):
-    q = db.query(DisasterReport).join(DisasterAlert).filter(DisasterReport.status==ReportStatus.approved, DisasterAlert.deactivated_at.is_(None))
-    return q.all()
+def list_active(response: Response, limit: int = DEFAULT_PAGE, cursor: str | None = None, since: datetime | None = None, until: datetime | None = None, db: Session = Depends(get_read_db)):
+    return _page(_active_query(db, since, until), DisasterReport.id, cursor, limit, DisasterReport.created_at, response)[0]
 
 @router.post("/disasters/{disaster_id}/verify")
-def verify_disaster(disaster_id: int, body: VerifyDisasterRequest, db: Session = Depends(get_db)):
+def verify_disaster(disaster_id: int, body: VerifyDisasterRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     dr = db.query(DisasterReport).filter(DisasterReport.id==disaster_id).first()
     if not dr:
         raise HTTPException(404, "Not found")
     if dr.status != ReportStatus.pending:
         raise HTTPException(400, "Already processed")
+    # the whole duplicate cluster is decided at once: the verified report carries the alert,
+    # the other pending members are merged into it (or rejected with it)
+    cluster = dr.cluster_id or dr.id
+    members = (
+        update(DisasterReport)
+        .where(DisasterReport.status == ReportStatus.pending, DisasterReport.id != dr.id,
+               or_(DisasterReport.id == cluster, DisasterReport.cluster_id == cluster))
+        .execution_options(synchronize_session=False)
+    )
     if not body.approve:
         dr.status = ReportStatus.rejected
+        merged = db.execute(members.values(status=ReportStatus.rejected)).rowcount
         db.commit()
-        return {"status": "rejected"}
+        report_clusters.discard(cluster)
+        return {"status": "rejected", "merged_reports": merged}
     # Approve
+    if body.area is not None:
+        try:
+            dr.area_geojson = parse_area(body.area)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        area = prepare_area(dr.area_geojson)
+        dr.area_min_lat, dr.area_max_lat, dr.area_min_lng, dr.area_max_lng = area.bbox
+        dr.lat, dr.lng = area.center
+    if body.radius_m is not None:
+        dr.radius_m = body.radius_m
+    if not dr.radius_m and dr.area_geojson is None:
+        # "REPORT: FLOOD at HIGH STREET" parses without a radius; approving it as-is would
+        # alert nobody, now or on later moves
+        raise HTTPException(400, "Report has no radius: pass radius_m or an area")
     dr.status = ReportStatus.approved
     if body.lat is not None and body.lng is not None:
         dr.lat = body.lat
         dr.lng = body.lng
     alert = DisasterAlert(disaster_id=dr.id)
     db.add(alert)
-    db.flush()
-
-    # compute impacted users
-    if dr.lat is not None and dr.lng is not None and dr.radius_m:
-        users = db.query(User).filter(User.last_lat.isnot(None), User.last_lng.isnot(None)).all()
-        for u in users:
-            if inside_radius(dr.lat, dr.lng, u.last_lat, u.last_lng, dr.radius_m):
-                # dedupe
-                exists = db.query(UserAlertLog).filter_by(disaster_id=dr.id, user_id=u.id).first()
-                if not exists:
-                    log = UserAlertLog(disaster_id=dr.id, user_id=u.id)
-                    db.add(log)
-                    queue_alert(db, u.phone, f"ALERT: {dr.type} near {dr.location_text}. Reply HELP if you need assistance.", OutboundPurpose.ALERT, disaster_id=dr.id)
+    merged = db.execute(members.values(status=ReportStatus.merged, cluster_id=dr.id)).rowcount
+
+    # impacted users are computed by a background job, chunk by chunk
+    job = None
+    if dr.lat is not None and dr.lng is not None and (dr.radius_m or dr.area_geojson):
+        job = fanout.create_job(db, dr)
+    db.commit()
+    active_disasters.invalidate()
+    report_clusters.discard(cluster)
+    if job is None:
+        return {"status": "approved", "merged_reports": merged}
+    background_tasks.add_task(fanout.run_job, job.id)
+    return {"status": "approved", "merged_reports": merged, "fanout_job_id": job.id}
+
+@router.post("/disasters/{disaster_id}/deactivate")
+def deactivate_disaster(disaster_id: int, db: Session = Depends(get_db)):
+    alert = db.query(DisasterAlert).filter(DisasterAlert.disaster_id==disaster_id, DisasterAlert.deactivated_at.is_(None)).first()
+    if not alert:
+        raise HTTPException(404, "No active alert")
+    alert.deactivated_at = datetime.utcnow()
+    db.commit()
+    active_disasters.invalidate()
+    return {"status": "deactivated"}
+
+@router.get("/disasters/{disaster_id}/fanout", response_model=FanoutJobOut)
+def fanout_progress(disaster_id: int, db: Session = Depends(get_read_db)):
+    job = db.query(FanoutJob).filter_by(disaster_id=disaster_id).first()
+    if not job:
+        raise HTTPException(404, "No fan-out for this disaster")
+    return FanoutJobOut(
+        disaster_id=job.disaster_id, status=job.status, users_scanned=job.users_scanned,
+        alerts_queued=job.alerts_queued, elapsed_s=fanout.elapsed_s(job), error=job.error,
+        started_at=job.started_at, finished_at=job.finished_at,
+    )
+
+def _upsert_user(db: Session, phone: str, lat: float | None, lng: float | None, tower: str | None, lang: str | None = None) -> User:
+    user = db.query(User).filter_by(phone=phone).first()
+    if not user:
+        user = User(phone=phone)
+        db.add(user)
+    if lat is not None or lng is not None:
+        if lat is not None: user.last_lat = lat
+        if lng is not None: user.last_lng = lng
+        user.loc_uncertainty_m = None
+    elif tower is not None:
+        # tower only: place the user at the tower, its coverage as uncertainty
+        loc = towers.resolve(db, tower)
+        if loc is not None:
+            user.last_lat, user.last_lng, user.loc_uncertainty_m = loc
+    if tower is not None: user.last_tower = tower
+    if lang: user.lang = lang.strip().lower()
+    user.geo_cell = cell_id(user.last_lat, user.last_lng)
+    return user
+
+@router.post("/towers/import")
+def towers_import(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Bulk upsert of the tower registry from CSV (tower_id,lat,lng[,coverage_m])."""
+    try:
+        count = import_towers(db, file.file.read().decode("utf-8-sig"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     db.commit()
-    return {"status": "approved"}
+    towers.invalidate()
+    return {"status": "ok", "imported": count}
 
 @router.post("/users", response_model=UserOut)
 def create_or_update_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter_by(phone=user.phone).first()
-    if existing:
-        if user.last_lat is not None: existing.last_lat = user.last_lat
-        if user.last_lng is not None: existing.last_lng = user.last_lng
-        if user.last_tower is not None: existing.last_tower = user.last_tower
-    else:
-        existing = User(phone=user.phone, last_lat=user.last_lat, last_lng=user.last_lng, last_tower=user.last_tower)
-        db.add(existing)
+    existing = _upsert_user(db, user.phone, user.last_lat, user.last_lng, user.last_tower, user.lang)
     db.commit()
     db.refresh(existing)
     return existing
 
 @router.post("/move-user")
 def move_user(m: MoveUser, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(phone=m.phone).first()
-    if not user:
-        user = User(phone=m.phone)
-        db.add(user)
-        db.flush()
-    user.last_lat = m.lat
-    user.last_lng = m.lng
-
-    # Check active disasters
-    active = db.query(DisasterReport).join(DisasterAlert).filter(DisasterReport.status==ReportStatus.approved, DisasterAlert.deactivated_at.is_(None))
-    new_alerts = 0
-    for dr in active:
-        if dr.lat and dr.lng and dr.radius_m and user.last_lat and user.last_lng:
-            if inside_radius(dr.lat, dr.lng, user.last_lat, user.last_lng, dr.radius_m):
-                exists = db.query(UserAlertLog).filter_by(disaster_id=dr.id, user_id=user.id).first()
-                if not exists:
-                    log = UserAlertLog(disaster_id=dr.id, user_id=user.id)
-                    db.add(log)
-                    queue_alert(db, user.phone, f"ALERT: {dr.type} near {dr.location_text}. Reply HELP if you need assistance.", OutboundPurpose.ALERT, disaster_id=dr.id)
-                    new_alerts += 1
+    # Check active disasters (in memory; the DB is only touched to queue a new alert)
+    res = apply_moves(db, [(m.phone, m.lat, m.lng, m.tower_id)])
+    if res.unresolved:
+        raise HTTPException(status_code=404, detail="Unknown tower")
     db.commit()
-    return {"status": "ok", "new_alerts": new_alerts}
+    for disaster_id, user_ids in res.alerted.items():
+        active_disasters.mark_alerted(disaster_id, user_ids)
+    return {"status": "ok", "new_alerts": res.new_alerts}
+
+async def _apply_moves(db: AsyncSession, moves: list[MoveUser], total: dict) -> None:
+    res = await db.run_sync(apply_moves, [(m.phone, m.lat, m.lng, m.tower_id) for m in moves])
+    await db.commit()
+    for disaster_id, user_ids in res.alerted.items():
+        active_disasters.mark_alerted(disaster_id, user_ids)
+    total["moved"] += res.moved
+    total["unresolved"] += res.unresolved
+    total["new_alerts"] += res.new_alerts
+
+@router.post("/move-users/batch")
+async def move_users_batch(moves: List[MoveUser], db: AsyncSession = Depends(get_async_db)):
+    total = {"status": "ok", "moved": 0, "unresolved": 0, "new_alerts": 0}
+    await _apply_moves(db, moves, total)
+    return total
+
+@router.post("/move-users/stream")
+async def move_users_stream(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """NDJSON upload, one MoveUser object per line; applied and committed every MOVE_STREAM_CHUNK lines."""
+    total = {"status": "ok", "moved": 0, "unresolved": 0, "new_alerts": 0}
+    chunk: list[MoveUser] = []
+    line_no = 0
+    buf = b""
+
+    def parse(line: bytes) -> None:
+        nonlocal line_no
+        line_no += 1
+        if line.strip():
+            try:
+                chunk.append(MoveUser.model_validate_json(line))
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail={"line": line_no, "errors": e.errors(include_url=False), **total})
+
+    async for data in request.stream():
+        buf += data
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            parse(line)
+        if len(chunk) >= MOVE_STREAM_CHUNK:
+            await _apply_moves(db, chunk, total)
+            chunk = []
+    parse(buf)
+    if chunk:
+        await _apply_moves(db, chunk, total)
+    return total
+
+CLAIM_TOKEN_RE = re.compile(r"[0-9A-Za-z_-]{16,32}")
+
+def _check_gateway(gateway_id: str, claim_token: str | None = None) -> None:
+    # leases are per phone: a shared fallback name would let two phones resume each other's rows
+    if not gateway_id or gateway_id == "default" or len(gateway_id) > 64:
+        raise HTTPException(400, "gateway_id must be set to an id unique to this phone (max 64 chars)")
+    if claim_token is not None and not CLAIM_TOKEN_RE.fullmatch(claim_token):
+        raise HTTPException(400, "claim_token must be 16-32 random [0-9A-Za-z_-] characters")
+
+def _claim_out(db: Session, gateway_id: str, limit: int, lease_seconds: int | None, since_id: int | None = None,
+               max_segments: int | None = None, claim_token: str | None = None) -> list[OutboundSMSOut]:
+    msgs = resume_claims(db, gateway_id, claim_token, since_id, limit, lease_seconds) if claim_token else []
+    budget = None if max_segments is None else max_segments - sum(m.segments for m in msgs)
+    if len(msgs) < limit and (budget is None or budget > 0):
+        resumed = {m.id for m in msgs}
+        msgs += [m for m in claim_batch(db, gateway_id, limit=limit - len(msgs), lease_seconds=lease_seconds,
+                                        max_segments=budget, claim_token=claim_token) if m.id not in resumed]
+    return [OutboundSMSOut.model_validate(m) for m in msgs]
+
+def _negotiated(request: Request, payload, headers: dict) -> Response:
+    # msgpack for gateways that ask for it and when it is installed; JSON otherwise
+    headers = {**headers, "Vary": "Accept"}
+    if msgpack is not None and "application/msgpack" in request.headers.get("accept", ""):
+        return Response(msgpack.packb(payload), media_type="application/msgpack", headers=headers)
+    return JSONResponse(payload, headers=headers)
 
 @router.get("/gateway/outbound", response_model=List[OutboundSMSOut])
-def gateway_outbound(limit: int = 50, db: Session = Depends(get_db)):
-    msgs = fetch_unsent(db, limit=limit)
-    return msgs
+async def gateway_outbound(request: Request, gateway_id: str, limit: int = 50, lease_seconds: int | None = None, wait: float = 0,
+                           since_id: int | None = None, max_segments: int | None = None, claim_token: str | None = None,
+                           fmt: Literal["full", "compact"] = Query("full", alias="format"),
+                           db: AsyncSession = Depends(get_async_db)):
+    # rows are leased to this gateway so parallel gateways never receive the same SMS;
+    # with ?wait=N an empty queue holds the request until something is queued (long-poll).
+    # claim_token = a random token the gateway picks per poll and repeats until it gets a
+    # response: rows already claimed under it (above since_id) are re-sent, not re-claimed;
+    # max_segments caps the batch by SMS parts for gateways rate-limited per part
+    _check_gateway(gateway_id, claim_token)
+    deadline = time.monotonic() + min(max(wait, 0), get_settings().gateway_max_wait_seconds)
+    while True:
+        version = outbound_queued.version
+        msgs = await db.run_sync(_claim_out, gateway_id, limit, lease_seconds, since_id, max_segments, claim_token)
+        await db.commit()
+        remaining = deadline - time.monotonic()
+        if msgs or remaining <= 0:
+            break
+        # the async SQLite pool is a single connection: never hold it while idle
+        await db.close()
+        await outbound_queued.wait_async(version, remaining)
+    headers = {"X-Next-Since-Id": str(max([m.id for m in msgs] + [since_id or 0]))}
+    if fmt == "compact":
+        return _negotiated(request, compact_outbound(msgs, since_id), headers)
+    return _negotiated(request, [m.model_dump(mode="json") for m in msgs], headers)
+
+@router.get("/gateway/outbound/stream")
+async def gateway_outbound_stream(gateway_id: str, limit: int = 50, lease_seconds: int | None = None):
+    """Server-sent events: each `outbound` event carries a freshly claimed batch.
+
+    Idle connections wait on the event loop, not in a threadpool thread, and hold no
+    database connection between batches.
+    """
+    _check_gateway(gateway_id)
+    async def events():
+        while True:
+            version = outbound_queued.version
+            async with AsyncSessionLocal() as db:
+                msgs = await db.run_sync(_claim_out, gateway_id, limit, lease_seconds)
+                await db.commit()
+            if msgs:
+                yield f"event: outbound\ndata: {json.dumps([m.model_dump(mode='json') for m in msgs])}\n\n"
+            elif not await outbound_queued.wait_async(version, SSE_KEEPALIVE_S):
+                yield ": keepalive\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@router.get("/gateway/outbound/peek", response_model=List[OutboundSMSOut])
+def gateway_outbound_peek(phone: str | None = None, limit: int = 200, db: Session = Depends(get_read_db)):
+    """Queued rows, read-only: no lease, no attempt counted. For the demo's mock phone and
+    debugging; gateways that send SMS must claim through /gateway/outbound."""
+    q = db.query(OutboundSMS).filter(OutboundSMS.sent_at.is_(None), OutboundSMS.failed_at.is_(None))
+    if phone:
+        q = q.filter(OutboundSMS.phone == phone)
+    return q.order_by(OutboundSMS.id.asc()).limit(min(limit, MAX_PAGE)).all()
 
 @router.post("/gateway/mark-sent")
-def gateway_mark_sent(ids: List[int], db: Session = Depends(get_db)):
-    from ..services.sms_gateway import mark_sent
+async def gateway_mark_sent(ids: List[int], db: AsyncSession = Depends(get_async_db)):
     if not ids:
         return {"updated": 0}
-    count = mark_sent(db, ids)
-    db.commit()
+    count = await db.run_sync(mark_sent, ids)
+    await db.commit()
     return {"updated": count}
 
+@router.post("/gateway/delivered")
+async def gateway_delivered(reports: List[DeliveryReport], db: AsyncSession = Depends(get_async_db)):
+    # bulk per-message status; failed rows are requeued with backoff
+    counts = await db.run_sync(record_delivery, reports)
+    await db.commit()
+    return counts
+
 @router.get("/messages/help", response_model=List[HelpRequestOut])
-def list_help(db: Session = Depends(get_db)):
-    return db.query(HelpRequest).filter(HelpRequest.status==HelpStatus.open).all()
+def list_help(response: Response, status: HelpStatus | None = HelpStatus.open, limit: int = DEFAULT_PAGE, cursor: str | None = None, since: datetime | None = None, until: datetime | None = None, db: Session = Depends(get_read_db)):
+    return _page(_help_query(db, status, since, until), HelpRequest.id, cursor, limit, HelpRequest.created_at, response)[0]
 
 # ---------- UI (Jinja2) ----------
+def _next_url(request: Request, next_cursor: str | None) -> str | None:
+    return str(request.url.include_query_params(cursor=next_cursor)) if next_cursor else None
+
 @router.get("/ui/pending", response_class=HTMLResponse)
-def ui_pending(request: Request, db: Session = Depends(get_db)):
-    reports = db.query(DisasterReport).filter(DisasterReport.status==ReportStatus.pending).all()
-    return templates.TemplateResponse("pending.html", {"request": request, "reports": reports})
+def ui_pending(request: Request, limit: int = DEFAULT_PAGE, cursor: str | None = None, since: datetime | None = None, until: datetime | None = None, db: Session = Depends(get_read_db)):
+    reports, next_cursor = _pending_clusters(db, cursor, limit, since, until)
+    return templates.TemplateResponse("pending.html", {"request": request, "reports": reports, "next_url": _next_url(request, next_cursor)})
 
 @router.get("/ui/active", response_class=HTMLResponse)
-def ui_active(request: Request, db: Session = Depends(get_db)):
-    reports = db.query(DisasterReport).join(DisasterAlert).filter(DisasterReport.status==ReportStatus.approved, DisasterAlert.deactivated_at.is_(None)).all()
-    return templates.TemplateResponse("active.html", {"request": request, "reports": reports})
+def ui_active(request: Request, limit: int = DEFAULT_PAGE, cursor: str | None = None, since: datetime | None = None, until: datetime | None = None, db: Session = Depends(get_read_db)):
+    reports, next_cursor = _page(_active_query(db, since, until), DisasterReport.id, cursor, limit, DisasterReport.created_at)
+    return templates.TemplateResponse("active.html", {"request": request, "reports": reports, "next_url": _next_url(request, next_cursor)})
 
 @router.get("/ui/help", response_class=HTMLResponse)
-def ui_help(request: Request, db: Session = Depends(get_db)):
-    helps = db.query(HelpRequest).filter(HelpRequest.status==HelpStatus.open).all()
-    return templates.TemplateResponse("help.html", {"request": request, "help_requests": helps})
+def ui_help(request: Request, status: HelpStatus | None = HelpStatus.open, limit: int = DEFAULT_PAGE, cursor: str | None = None, since: datetime | None = None, until: datetime | None = None, db: Session = Depends(get_read_db)):
+    helps, next_cursor = _page(_help_query(db, status, since, until), HelpRequest.id, cursor, limit, HelpRequest.created_at)
+    return templates.TemplateResponse("help.html", {"request": request, "help_requests": helps, "status": status, "next_url": _next_url(request, next_cursor)})
 
 @router.get("/ui/outbound", response_class=HTMLResponse)
-def ui_outbound(request: Request, db: Session = Depends(get_db)):
-    msgs = db.query(OutboundSMS).order_by(OutboundSMS.id.desc()).limit(200).all()
-    return templates.TemplateResponse("outbound.html", {"request": request, "messages": msgs})
+def ui_outbound(request: Request, state: str | None = None, disaster_id: str | None = None, limit: int = DEFAULT_PAGE, cursor: str | None = None, db: Session = Depends(get_read_db)):
+    # the filter form submits empty strings for "any"
+    q = db.query(OutboundSMS)
+    if disaster_id:
+        if not disaster_id.isdigit():
+            raise HTTPException(400, "disaster_id must be an integer")
+        q = q.filter(OutboundSMS.disaster_id==int(disaster_id))
+    ts_col = None
+    if state == "queued":
+        q = q.filter(OutboundSMS.sent_at.is_(None), OutboundSMS.failed_at.is_(None))
+    elif state == "sent":
+        # newest sends first, served by ix_outbound_sent
+        q, ts_col = q.filter(OutboundSMS.sent_at.isnot(None)), OutboundSMS.sent_at
+    elif state == "failed":
+        # given up after OUTBOUND_MAX_ATTEMPTS, newest first (ix_outbound_failed)
+        q, ts_col = q.filter(OutboundSMS.failed_at.isnot(None)), OutboundSMS.failed_at
+    elif state == "delivered":
+        q = q.filter(OutboundSMS.delivered_at.isnot(None))
+    msgs, next_cursor = _page(q, OutboundSMS.id, cursor, limit, ts_col)
+    return templates.TemplateResponse("outbound.html", {"request": request, "messages": msgs, "state": state, "disaster_id": disaster_id, "next_url": _next_url(request, next_cursor)})
 
 @router.post("/ui/approve/{disaster_id}")
-def ui_approve(disaster_id: int, lat: float | None = Form(default=None), lng: float | None = Form(default=None), db: Session = Depends(get_db)):
-    body = VerifyDisasterRequest(approve=True, lat=lat, lng=lng)
-    verify_disaster(disaster_id, body, db)
+def ui_approve(disaster_id: int, background_tasks: BackgroundTasks, lat: float | None = Form(default=None), lng: float | None = Form(default=None), radius_m: int | None = Form(default=None), area: str | None = Form(default=None), db: Session = Depends(get_db)):
+    try:
+        area_geometry = json.loads(area) if area and area.strip() else None
+    except json.JSONDecodeError:
+        raise HTTPException(400, "area must be GeoJSON")
+    if area_geometry is not None and not isinstance(area_geometry, dict):
+        # valid JSON but not an object (e.g. [1, 2]): VerifyDisasterRequest would reject it with a 500
+        raise HTTPException(400, "area must be a GeoJSON object")
+    if radius_m is not None and radius_m <= 0:
+        raise HTTPException(400, "radius_m must be positive")
+    body = VerifyDisasterRequest(approve=True, lat=lat, lng=lng, radius_m=radius_m, area=area_geometry)
+    verify_disaster(disaster_id, body, background_tasks, db)
     return RedirectResponse(url="/ui/pending", status_code=303)
 
 @router.post("/ui/reject/{disaster_id}")
-def ui_reject(disaster_id: int, db: Session = Depends(get_db)):
+def ui_reject(disaster_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     body = VerifyDisasterRequest(approve=False)
-    verify_disaster(disaster_id, body, db)
+    verify_disaster(disaster_id, body, background_tasks, db)
     return RedirectResponse(url="/ui/pending", status_code=303)
 
 # ---------- SMSSync-compatible inbound (form) ----------
 # SMSSync can send fields like: secret, from, message
 @router.post("/receive-sms-smssync")
-def receive_sms_smssync(from_: str = Form(alias="from"), message: str = Form(...), secret: str | None = Form(default=None), db: Session = Depends(get_db)):
+async def receive_sms_smssync(from_: str = Form(alias="from"), message: str = Form(...), secret: str | None = Form(default=None), message_id: str | None = Form(default=None), db: AsyncSession = Depends(get_async_db)):
     # TODO: validate secret if configured
-    payload = InboundSMSIn(**{"from": from_, "message": message})
-    return receive_sms(payload, db)
+    payload = InboundSMSIn(**{"from": from_, "message": message, "gateway_msg_id": message_id})
+    return await receive_sms(payload, db)
 
 # ---------- Users UI ----------
 @router.get("/ui/users", response_class=HTMLResponse)
-def ui_users(request: Request, db: Session = Depends(get_db)):
-    users = db.query(User).order_by(User.id.desc()).limit(500).all()
-    return templates.TemplateResponse("users.html", {"request": request, "users": users})
+def ui_users(request: Request, limit: int = DEFAULT_PAGE, cursor: str | None = None, db: Session = Depends(get_read_db)):
+    users, next_cursor = _page(db.query(User), User.id, cursor, limit)
+    return templates.TemplateResponse("users.html", {"request": request, "users": users, "next_url": _next_url(request, next_cursor)})
 
 @router.post("/ui/users")
-def ui_users_create(phone: str = Form(...), last_lat: float | None = Form(default=None), last_lng: float | None = Form(default=None), last_tower: str | None = Form(default=None), db: Session = Depends(get_db)):
-    existing = db.query(User).filter_by(phone=phone).first()
-    if existing:
-        if last_lat is not None: existing.last_lat = last_lat
-        if last_lng is not None: existing.last_lng = last_lng
-        if last_tower is not None: existing.last_tower = last_tower
-    else:
-        existing = User(phone=phone, last_lat=last_lat, last_lng=last_lng, last_tower=last_tower)
-        db.add(existing)
+def ui_users_create(phone: str = Form(...), last_lat: float | None = Form(default=None), last_lng: float | None = Form(default=None), last_tower: str | None = Form(default=None), lang: str | None = Form(default=None), db: Session = Depends(get_db)):
+    _upsert_user(db, phone, last_lat, last_lng, last_tower or None, lang)
     db.commit()
     return RedirectResponse(url="/ui/users", status_code=303)
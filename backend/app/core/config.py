@@ -1,12 +1,36 @@
 from pydantic import Field
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 
 class Settings(BaseSettings):
     app_name: str = "Offline Disaster Alert API"
     debug: bool = True
     database_url: str = Field(default="sqlite:///./disaster.db", description="SQLAlchemy database URL")
+    async_database_url: str | None = Field(default=None, description="Async driver URL; derived from database_url when unset")
+    read_database_url: str | None = Field(default=None, description="Optional replica for read-only list/dashboard queries")
+    sqlite_profile: Literal["default", "tuned"] = Field(default="tuned", description="'tuned' = WAL + pragmas + pooled read engine")
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 64 * 1024
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
     gateway_auth_token: str | None = None
+    outbound_lease_seconds: int = Field(default=120, description="How long a gateway owns claimed outbound rows")
+    outbound_max_attempts: int = Field(default=5, description="Claims per outbound row before it is given up")
+    outbound_retry_base_seconds: int = Field(default=30, description="Backoff before the first retry of a failed SMS; doubles per attempt")
+    outbound_retry_max_seconds: int = 3600
+    gateway_max_wait_seconds: int = Field(default=60, description="Upper bound for /gateway/outbound?wait= long-polls")
+    fanout_chunk_size: int = Field(default=2000, description="Users evaluated per committed fan-out chunk")
+    active_index_ttl_s: float = Field(default=30, description="Max age of the in-memory active-disaster index")
+    cluster_window_s: int = Field(default=1800, description="Reports join an open cluster seen within this many seconds")
+    cluster_min_similarity: float = Field(default=0.5, description="Min Jaccard similarity of location tokens to join a cluster")
+    tower_default_coverage_m: int = Field(default=2000, description="Coverage radius for imported towers without one")
+    default_lang: str = Field(default="en", description="Alert language for users without one (see message_templates.ALERT_TEXT)")
+    alert_max_segments: int = Field(default=1, description="SMS parts an alert may use; longer locations are abbreviated or cut")
+    gzip_request_max_bytes: int = Field(default=16 * 1024 * 1024, description="Largest inflated body accepted with Content-Encoding: gzip")
+    gzip_request_max_compressed_bytes: int = Field(default=4 * 1024 * 1024, description="Largest gzip body received before inflating")
+    gzip_min_response_bytes: int = Field(default=1000, description="Responses smaller than this are sent uncompressed")
 
     class Config:
         env_file = ".env"
@@ -1,22 +1,135 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import get_settings
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
-)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"))
+
+
+def _engine_kwargs(url: str) -> dict:
+    if not _is_sqlite(url):
+        return {"pool_size": settings.db_pool_size, "max_overflow": settings.db_max_overflow, "pool_pre_ping": True}
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if settings.sqlite_profile == "tuned" and not _is_sqlite_memory(url):
+        kwargs.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+    return kwargs
+
+
+def _tune_sqlite(engine, read_only: bool = False) -> None:
+    """Apply the production pragmas to every new DBAPI connection of `engine`."""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        # WAL lets readers run alongside the single writer instead of "database is locked"
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cur.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cur.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_size_kb)}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+
+
+def _make_engine(url: str, read_only: bool = False):
+    eng = create_engine(url, **_engine_kwargs(url))
+    if _is_sqlite(url) and settings.sqlite_profile == "tuned" and not _is_sqlite_memory(url):
+        _tune_sqlite(eng, read_only=read_only)
+    return eng
+
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (aiosqlite / asyncpg)."""
+    scheme, rest = url.split(":", 1)
+    if "+" in scheme and scheme.split("+", 1)[1] in ("aiosqlite", "asyncpg"):
+        return url
+    backend = scheme.split("+", 1)[0]
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}.get(backend)
+    return f"{backend}+{driver}:{rest}" if driver else url
+
+
+def _make_async_engine(url: str):
+    kwargs = _engine_kwargs(url)
+    if _is_sqlite(url) and "pool_size" in kwargs:
+        # SQLite admits one writer at a time and every async route writes: queueing on a
+        # single pooled connection is far cheaper than contending via busy_timeout backoff.
+        # Handlers therefore hold it only for their queries: long-polls and SSE streams
+        # release their session before waiting, so any number of them can be idle at once.
+        kwargs.update(poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0)
+    eng = create_async_engine(url, **kwargs)
+    if _is_sqlite(url) and settings.sqlite_profile == "tuned" and not _is_sqlite_memory(url):
+        _tune_sqlite(eng.sync_engine)
+    return eng
+
+
+engine = _make_engine(settings.database_url)
+
+# Dashboards and list endpoints read through their own pool so they never queue behind
+# ingest writers. A replica URL can be configured; with SQLite/WAL it is the same file
+# opened query-only.
+if settings.read_database_url:
+    read_engine = _make_engine(settings.read_database_url, read_only=True)
+elif _is_sqlite(settings.database_url) and settings.sqlite_profile == "tuned" and not _is_sqlite_memory(settings.database_url):
+    read_engine = _make_engine(settings.database_url, read_only=True)
+else:
+    read_engine = engine
+
+# asyncio engine for the high-concurrency ingest/gateway routes; the UI stays on the sync engine
+async_engine = _make_async_engine(settings.async_database_url or _async_url(settings.database_url))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 class Base(DeclarativeBase):
     pass
 
+def insert_returning_ids(db, model, rows: list[dict]) -> list[int]:
+    """Bulk INSERT returning the new primary keys in the order of `rows`.
+
+    SQLite can't promise RETURNING order, so SQLAlchemy's sort_by_parameter_order falls back
+    to one statement per row there. A single writer's multi-row INSERT assigns ascending
+    rowids in VALUES order, so sorting the returned ids gives the same answer in one batch.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sorted(db.scalars(insert(model).returning(model.id), rows))
+    return list(db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows))
+
+def insert_ignore(db, model):
+    """INSERT that silently skips rows violating a unique constraint."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(model).prefix_with("IGNORE")
+    return dialect_insert(model).on_conflict_do_nothing()
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
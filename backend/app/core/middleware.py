@@ -0,0 +1,83 @@
+import zlib
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class GzipRequestMiddleware:
+    """Inflate `Content-Encoding: gzip` request bodies before the routes see them.
+
+    Gateways on slow mobile links compress large posts (inbound batches, status reports).
+    The body is inflated chunk by chunk as it arrives, and both the bytes received
+    (`max_compressed_size`) and the inflated size (`max_size`) are capped, so neither a
+    huge upload nor a small one that expands without bound is held in memory.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int, max_compressed_size: int):
+        self.app = app
+        self.max_size = max_size
+        self.max_compressed_size = max_compressed_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = next((v for k, v in scope["headers"] if k == b"content-encoding"), b"").strip().lower()
+        if encoding != b"gzip":
+            return await self.app(scope, receive, send)
+
+        too_large = JSONResponse({"detail": "Request body too large"}, 413)
+        length = next((v for k, v in scope["headers"] if k == b"content-length"), b"")
+        if length.isdigit() and int(length) > self.max_compressed_size:
+            return await too_large(scope, receive, send)
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = bytearray()
+        received = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > self.max_compressed_size:
+                return await too_large(scope, receive, send)
+            try:
+                body += inflater.decompress(chunk, self.max_size + 1 - len(body))
+            except zlib.error:
+                return await JSONResponse({"detail": "Malformed gzip body"}, 400)(scope, receive, send)
+            if len(body) > self.max_size or inflater.unconsumed_tail:
+                return await too_large(scope, receive, send)
+            if not message.get("more_body", False):
+                break
+        body = bytes(body)
+        if not inflater.eof:
+            return await JSONResponse({"detail": "Truncated gzip body"}, 400)(scope, receive, send)
+
+        headers = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        delivered = False
+
+        async def inflated_receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(dict(scope, headers=headers), inflated_receive, send)
+
+
+class ResponseGzipMiddleware(GZipMiddleware):
+    """Starlette's GZipMiddleware, minus `exclude_paths`.
+
+    Its streaming mode buffers inside the compressor, which would hold back server-sent
+    events until the buffer fills; streamed endpoints are listed here and passed through.
+    """
+
+    def __init__(self, app: ASGIApp, exclude_paths: tuple[str, ...] = (), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
@@ -1,10 +1,23 @@
 from fastapi import FastAPI
 from .api.routes import router as api_router
+from .core.config import get_settings
+from .core.middleware import GzipRequestMiddleware, ResponseGzipMiddleware
+from .services import fanout
 
 app = FastAPI(title="Offline Disaster Alert API", version="0.1.0")
+# gateways on mobile links gzip their posts and accept gzip back (SSE stays uncompressed)
+app.add_middleware(GzipRequestMiddleware, max_size=get_settings().gzip_request_max_bytes,
+                   max_compressed_size=get_settings().gzip_request_max_compressed_bytes)
+app.add_middleware(ResponseGzipMiddleware, minimum_size=get_settings().gzip_min_response_bytes,
+                   compresslevel=6, exclude_paths=("/gateway/outbound/stream",))
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.on_event("startup")
+def resume_fanout_jobs():
+    # continue approvals whose fan-out was interrupted by a restart
+    fanout.resume_jobs()
+
 app.include_router(api_router)
@@ -0,0 +1,124 @@
+"""Bring an existing database up to the current models at startup.
+
+create_all only creates missing tables. Columns and indexes added to the models since a
+database file was created are added here, NOT NULL is dropped from columns the models have
+since made nullable, and derived columns are backfilled, so an old disaster.db keeps
+working after an upgrade. Every step is idempotent.
+"""
+import enum
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+from ..core.database import Base
+from .models import User
+
+BACKFILL_CHUNK = 5000
+
+
+def _literal(value) -> str | None:
+    if isinstance(value, enum.Enum):
+        value = value.name  # SQLAlchemy's Enum type stores member names
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def _column_ddl(conn: Connection, column) -> str:
+    quote = conn.dialect.identifier_preparer.quote
+    ddl = f"{quote(column.name)} {column.type.compile(dialect=conn.dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    literal = _literal(default) if default is not None else None
+    if literal is not None:
+        ddl += f" DEFAULT {literal}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    # a NOT NULL column without a constant default can't be added to existing rows: it
+    # is added nullable and the ORM default fills it on new rows
+    return ddl
+
+
+def add_missing_columns(conn: Connection) -> list[str]:
+    """ALTER TABLE ... ADD COLUMN for model columns the database lacks; create missing indexes."""
+    insp = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {_column_ddl(conn, column)}"))
+            if column.unique:
+                # ADD COLUMN can't carry a UNIQUE constraint; a unique index enforces the same
+                name = f"uq_{table.name}_{column.name}"
+                conn.execute(text(f"CREATE UNIQUE INDEX {quote(name)} ON {quote(table.name)} ({quote(column.name)})"))
+            added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    return added
+
+
+def relax_not_null(conn: Connection) -> list[str]:
+    """Drop NOT NULL from columns that are nullable in the models but not in the database
+    (outbound_sms.body became nullable when broadcasts moved to shared templates)."""
+    insp = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    relaxed = []
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        in_db = {c["name"]: c["nullable"] for c in insp.get_columns(table.name)}
+        names = [c.name for c in table.columns
+                 if c.nullable and not c.primary_key and in_db.get(c.name) is False]
+        if not names:
+            continue
+        if conn.dialect.name == "sqlite":
+            _rebuild_sqlite_table(conn, table, [c for c in table.columns if c.name in in_db])
+        else:
+            for name in names:
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(name)} DROP NOT NULL"))
+        relaxed += [f"{table.name}.{name}" for name in names]
+    return relaxed
+
+
+def _rebuild_sqlite_table(conn: Connection, table, columns) -> None:
+    # SQLite can't ALTER a column's constraints: create the table as the model has it under
+    # a temporary name, copy the rows, drop the old one, rename, and recreate the indexes
+    quote = conn.dialect.identifier_preparer.quote
+    tmp = f"_new_{table.name}"
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.execute(text(ddl.replace(f"TABLE {quote(table.name)} ", f"TABLE {quote(tmp)} ", 1)))
+    cols = ", ".join(quote(c.name) for c in columns)
+    conn.execute(text(f"INSERT INTO {quote(tmp)} ({cols}) SELECT {cols} FROM {quote(table.name)}"))
+    conn.execute(text(f"DROP TABLE {quote(table.name)}"))
+    conn.execute(text(f"ALTER TABLE {quote(tmp)} RENAME TO {quote(table.name)}"))
+    for index in table.indexes:
+        index.create(conn)
+
+
+def backfill_geo_cells(conn: Connection) -> int:
+    """Set users.geo_cell for located users written before the column existed."""
+    from ..services.geofence import cell_id
+
+    rows = conn.execute(
+        select(User.id, User.last_lat, User.last_lng)
+        .where(User.geo_cell.is_(None), User.last_lat.isnot(None), User.last_lng.isnot(None))
+    ).all()
+    stmt = update(User.__table__).where(User.__table__.c.id == bindparam("uid")).values(geo_cell=bindparam("cell"))
+    for i in range(0, len(rows), BACKFILL_CHUNK):
+        conn.execute(stmt, [{"uid": uid, "cell": cell_id(lat, lng)} for uid, lat, lng in rows[i:i + BACKFILL_CHUNK]])
+    return len(rows)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        add_missing_columns(conn)
+        relax_not_null(conn)
+        backfill_geo_cells(conn)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, UniqueConstraint, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, UniqueConstraint, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..core.database import Base
@@ -13,6 +13,7 @@ class ReportStatus(str, enum.Enum):
     pending = "pending"
     rejected = "rejected"
     approved = "approved"
+    merged = "merged"  # duplicate folded into its cluster's approved report
 
 class InboundKind(str, enum.Enum):
     REPORT = "REPORT"
@@ -31,6 +32,12 @@ class OutboundPurpose(str, enum.Enum):
     INFO = "INFO"
     HELP_CONFIRM = "HELP_CONFIRM"
 
+class FanoutStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -38,6 +45,19 @@ class User(Base):
     last_lat = Column(Float, nullable=True)
     last_lng = Column(Float, nullable=True)
     last_tower = Column(String(64), nullable=True)
+    # grid cell of (last_lat, last_lng), see services.geofence.cell_id
+    geo_cell = Column(Integer, index=True, nullable=True)
+    # radius in meters the true position may be off by (tower coverage); null = exact fix
+    loc_uncertainty_m = Column(Integer, nullable=True)
+    lang = Column(String(8), nullable=True)  # ISO 639-1 code for localized alerts; null = default
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class CellTower(Base):
+    __tablename__ = "cell_towers"
+    id = Column(String(64), primary_key=True)  # operator tower / cell id as reported in User.last_tower
+    lat = Column(Float, nullable=False)
+    lng = Column(Float, nullable=False)
+    coverage_m = Column(Integer, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 class DisasterReport(Base):
@@ -49,10 +69,21 @@ class DisasterReport(Base):
     lat = Column(Float, nullable=True)
     lng = Column(Float, nullable=True)
     radius_m = Column(Integer, nullable=True)
+    # optional affected area (GeoJSON MultiPolygon, see geofence.parse_area); replaces the circle when set
+    area_geojson = Column(Text, nullable=True)
+    area_min_lat = Column(Float, nullable=True)
+    area_max_lat = Column(Float, nullable=True)
+    area_min_lng = Column(Float, nullable=True)
+    area_max_lng = Column(Float, nullable=True)
     severity = Column(Enum(SeverityEnum), nullable=True)
+    # representative report of the duplicate cluster this one joined (null = own cluster)
+    cluster_id = Column(Integer, ForeignKey("disaster_reports.id"), index=True, nullable=True)
     status = Column(Enum(ReportStatus), default=ReportStatus.pending, nullable=False)
     reporter_phone = Column(String(32), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        Index("ix_reports_status_created", "status", "created_at"),
+    )
 
     alert = relationship("DisasterAlert", back_populates="disaster", uselist=False)
 
@@ -72,6 +103,8 @@ class InboundMessage(Base):
     body = Column(Text, nullable=False)
     kind = Column(Enum(InboundKind), nullable=False)
     disaster_id = Column(Integer, ForeignKey("disaster_reports.id"), nullable=True)
+    # gateway-supplied message identity; a retried post is answered from the original row
+    gateway_msg_id = Column(String(128), unique=True, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 class HelpRequest(Base):
@@ -80,19 +113,73 @@ class HelpRequest(Base):
     inbound_id = Column(Integer, ForeignKey("inbound_messages.id"), nullable=False)
     phone = Column(String(32), index=True, nullable=False)
     status = Column(Enum(HelpStatus), default=HelpStatus.open, nullable=False)
+    people_count = Column(Integer, nullable=True)  # head count parsed from the HELP text, if any
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        # list pages filter by status and seek by (created_at, id); SQLite appends the rowid
+        Index("ix_help_status_created", "status", "created_at"),
+    )
+
+class MessageTemplate(Base):
+    """Rendered text shared by every OutboundSMS of one disaster, purpose and language."""
+    __tablename__ = "message_templates"
+    id = Column(Integer, primary_key=True)
+    disaster_id = Column(Integer, ForeignKey("disaster_reports.id"), nullable=True)
+    purpose = Column(Enum(OutboundPurpose), nullable=False)
+    lang = Column(String(8), nullable=False)
+    body = Column(Text, nullable=False)
+    segments = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("disaster_id", "purpose", "lang", name="uq_template_key"),
+    )
 
 class OutboundSMS(Base):
     __tablename__ = "outbound_sms"
     id = Column(Integer, primary_key=True)
     phone = Column(String(32), index=True, nullable=False)
-    body = Column(Text, nullable=False)
+    # one-off text; broadcasts leave it null and reference a shared template (read via .body)
+    inline_body = Column("body", Text, nullable=True)
+    template_id = Column(Integer, ForeignKey("message_templates.id"), nullable=True)
     purpose = Column(Enum(OutboundPurpose), nullable=False)
     disaster_id = Column(Integer, ForeignKey("disaster_reports.id"), nullable=True)
+    # SMS parts the body is sent as (GSM-7 / UCS-2), see services.sms_encoding.segments
+    segments = Column(Integer, default=1, nullable=False)
+    # lower drains first, see services.sms_gateway.queue_priority
+    priority = Column(Integer, default=5, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     sent_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
     attempt_count = Column(Integer, default=0, nullable=False)
+    last_error = Column(String(255), nullable=True)
+    # set when the row is given up after outbound_max_attempts; it then leaves the queue
+    failed_at = Column(DateTime, nullable=True)
+    # lease held by the gateway currently sending this row; an expired lease returns it to the pool
+    claimed_by = Column(String(64), nullable=True)
+    # also what /gateway/outbound?claim_token= resumes a lost claim by
+    claim_token = Column(String(32), index=True, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # dequeue in priority order and per-disaster fair share both stay O(limit): sent and
+        # given-up rows sort out of the (NULL, NULL) prefix the claim queries seek
+        Index("ix_outbound_pending", "sent_at", "failed_at", "priority", "id"),
+        Index("ix_outbound_disaster_pending", "disaster_id", "sent_at", "failed_at", "id"),
+        Index("ix_outbound_sent", "sent_at", "id"),  # /ui/outbound?state=sent keyset
+        Index("ix_outbound_failed", "failed_at", "id"),  # /ui/outbound?state=failed keyset
+    )
+
+    template = relationship("MessageTemplate", lazy="joined")
+
+    @property
+    def body(self) -> str | None:
+        return self.inline_body if self.template_id is None else self.template.body
+
+    @body.setter
+    def body(self, value: str | None) -> None:
+        self.inline_body = value
 
 class UserAlertLog(Base):
     __tablename__ = "user_alert_log"
@@ -104,3 +191,19 @@ class UserAlertLog(Base):
     __table_args__ = (
         UniqueConstraint('disaster_id', 'user_id', name='uq_disaster_user'),
     )
+
+class FanoutJob(Base):
+    """Progress of an approval's alert fan-out; the cursor makes the job resumable."""
+    __tablename__ = "fanout_jobs"
+    id = Column(Integer, primary_key=True)
+    disaster_id = Column(Integer, ForeignKey("disaster_reports.id"), unique=True, nullable=False)
+    status = Column(Enum(FanoutStatus), default=FanoutStatus.pending, nullable=False)
+    # keyset position in candidate_users order: last processed (geo_cell, user id)
+    cursor_cell = Column(Integer, nullable=True)
+    cursor_user_id = Column(Integer, nullable=True)
+    users_scanned = Column(Integer, default=0, nullable=False)
+    alerts_queued = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
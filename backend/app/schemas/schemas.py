@@ -1,13 +1,14 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Literal
 from datetime import datetime
-from ..models.models import SeverityEnum, ReportStatus, InboundKind, HelpStatus, OutboundPurpose
+from ..models.models import SeverityEnum, ReportStatus, InboundKind, HelpStatus, OutboundPurpose, FanoutStatus
 
 class UserCreate(BaseModel):
     phone: str
     last_lat: Optional[float] = None
     last_lng: Optional[float] = None
     last_tower: Optional[str] = None
+    lang: Optional[str] = Field(default=None, max_length=8)  # alert language, e.g. "hi"; unset = default
 
 class UserOut(BaseModel):
     id: int
@@ -15,6 +16,8 @@ class UserOut(BaseModel):
     last_lat: Optional[float]
     last_lng: Optional[float]
     last_tower: Optional[str]
+    loc_uncertainty_m: Optional[int] = None
+    lang: Optional[str] = None
     updated_at: datetime
     class Config:
         from_attributes = True
@@ -27,10 +30,13 @@ class DisasterReportOut(BaseModel):
     lat: Optional[float]
     lng: Optional[float]
     radius_m: Optional[int]
+    area_geojson: Optional[str] = None
     severity: Optional[SeverityEnum]
     status: ReportStatus
     reporter_phone: Optional[str]
     created_at: datetime
+    cluster_id: Optional[int] = None
+    report_count: int = 1  # pending reports in this one's duplicate cluster (pending list only)
     class Config:
         from_attributes = True
 
@@ -38,10 +44,13 @@ class VerifyDisasterRequest(BaseModel):
     approve: bool
     lat: Optional[float] = None
     lng: Optional[float] = None
+    radius_m: Optional[int] = Field(default=None, gt=0)  # for reports that named no radius
+    area: Optional[dict] = None  # GeoJSON Polygon / MultiPolygon (or Feature), [lng, lat] order
 
 class InboundSMSIn(BaseModel):
     from_: str = Field(alias="from")
     message: str
+    gateway_msg_id: Optional[str] = None
 
 class OutboundSMSOut(BaseModel):
     id: int
@@ -49,19 +58,49 @@ class OutboundSMSOut(BaseModel):
     body: str
     purpose: OutboundPurpose
     disaster_id: Optional[int]
+    segments: int = 1
     created_at: datetime
+    attempt_count: int = 0
+    claim_token: Optional[str] = None  # echo it in failed DeliveryReports
     class Config:
         from_attributes = True
 
+class DeliveryReport(BaseModel):
+    id: int
+    status: Literal["sent", "delivered", "failed"]
+    error: Optional[str] = None
+    # the reporting gateway and the claim it got the row in; a failure is applied only
+    # while that claim still holds the row
+    gateway_id: Optional[str] = None
+    claim_token: Optional[str] = None
+
 class MoveUser(BaseModel):
     phone: str
-    lat: float
-    lng: float
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    tower_id: Optional[str] = None  # resolved via the tower registry when lat/lng are missing
+
+    @model_validator(mode="after")
+    def _has_position(self):
+        if (self.lat is None or self.lng is None) and self.tower_id is None:
+            raise ValueError("lat and lng, or tower_id, required")
+        return self
 
 class HelpRequestOut(BaseModel):
     id: int
     phone: str
     status: HelpStatus
+    people_count: Optional[int] = None
     created_at: datetime
     class Config:
         from_attributes = True
+
+class FanoutJobOut(BaseModel):
+    disaster_id: int
+    status: FanoutStatus
+    users_scanned: int
+    alerts_queued: int
+    elapsed_s: Optional[float]
+    error: Optional[str] = None
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
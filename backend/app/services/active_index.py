@@ -0,0 +1,139 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+from ..core.config import get_settings
+from ..models.models import DisasterReport, DisasterAlert, ReportStatus, SeverityEnum, UserAlertLog
+from .geofence import PreparedArea, inside_radius_many, prepare_area
+
+
+@dataclass(frozen=True)
+class ActiveDisaster:
+    id: int
+    type: str | None
+    location_text: str | None
+    severity: SeverityEnum | None
+    lat: float
+    lng: float
+    radius_m: int | None
+    area: PreparedArea | None = None  # polygon area; replaces the circle when set
+
+
+class UserBitmap:
+    """Set of user ids stored one bit per id (1M users = 125 KB)."""
+
+    def __init__(self):
+        self._bits = bytearray()
+
+    def add(self, user_id: int) -> None:
+        byte = user_id >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))
+        self._bits[byte] |= 1 << (user_id & 7)
+
+    def update(self, user_ids: Iterable[int]) -> None:
+        for uid in user_ids:
+            self.add(uid)
+
+    def __contains__(self, user_id: int) -> bool:
+        byte = user_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (user_id & 7)))
+
+
+class ActiveDisasterIndex:
+    """Process-local snapshot of active disasters for late-entrant detection.
+
+    A batch of moves is checked against each disaster in one vectorized pass, and each
+    disaster keeps a bitmap of users already alerted, so a move only reaches the DB when
+    an alert really has to be queued. Invalidate on approve/deactivate; the TTL
+    bounds staleness when other workers change the set.
+
+    A refresh is incremental: it reloads the (short) active-disaster list, but reads
+    the alert log in full only for disasters it hasn't seen yet; for the others only rows
+    past the highest alert-log id already read. A bit missed here (e.g. a sequence gap on
+    PostgreSQL) only costs a DB round trip, since fan_out_alerts dedupes on the log itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at: float | None = None
+        self._disasters: list[ActiveDisaster] = []
+        self._alerted: dict[int, UserBitmap] = {}
+        self._log_watermark = 0  # highest UserAlertLog.id folded into the bitmaps
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure(self, db: Session) -> None:
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at < get_settings().active_index_ttl_s
+        if not fresh:
+            self._refresh(db)
+
+    def _refresh(self, db: Session) -> None:
+        rows = db.execute(
+            select(DisasterReport.id, DisasterReport.type, DisasterReport.location_text, DisasterReport.severity,
+                   DisasterReport.lat, DisasterReport.lng, DisasterReport.radius_m, DisasterReport.area_geojson)
+            .join(DisasterAlert, DisasterAlert.disaster_id == DisasterReport.id)
+            .where(DisasterReport.status == ReportStatus.approved, DisasterAlert.deactivated_at.is_(None),
+                   DisasterReport.lat.isnot(None), DisasterReport.lng.isnot(None),
+                   or_(DisasterReport.radius_m.isnot(None), DisasterReport.area_geojson.isnot(None)))
+        ).all()
+        disasters = [ActiveDisaster(*r[:-1], area=prepare_area(r[-1]) if r[-1] else None) for r in rows]
+        with self._lock:
+            known, watermark = set(self._alerted), self._log_watermark
+        # read up to a fixed top id so rows logged meanwhile are picked up next time, not lost
+        top = db.scalar(select(func.max(UserAlertLog.id))) or 0
+        added = [d.id for d in disasters if d.id not in known]
+        kept = [d.id for d in disasters if d.id in known]
+        fresh = {disaster_id: UserBitmap() for disaster_id in added}
+        if added:
+            for disaster_id, user_id in db.execute(
+                select(UserAlertLog.disaster_id, UserAlertLog.user_id)
+                .where(UserAlertLog.disaster_id.in_(added), UserAlertLog.id <= top)
+            ):
+                fresh[disaster_id].add(user_id)
+        newer = []
+        if kept and top > watermark:
+            newer = db.execute(
+                select(UserAlertLog.disaster_id, UserAlertLog.user_id)
+                .where(UserAlertLog.id > watermark, UserAlertLog.id <= top, UserAlertLog.disaster_id.in_(kept))
+            ).all()
+        with self._lock:
+            alerted = {d.id: self._alerted.get(d.id) or fresh.get(d.id) or UserBitmap() for d in disasters}
+            for disaster_id, user_id in newer:
+                alerted[disaster_id].add(user_id)
+            self._disasters = disasters
+            self._alerted = alerted
+            self._log_watermark = max(self._log_watermark, top)
+            self._loaded_at = time.monotonic()
+
+    def late_entrants(self, db: Session, user_ids: list[int], lats, lngs, slack_m=None) -> list[tuple[ActiveDisaster, list[int]]]:
+        """For each active disaster, the positions in user_ids of users now inside it (widened
+        by per-user slack_m) and not alerted yet, one vectorized pass per disaster."""
+        self._ensure(db)
+        with self._lock:
+            disasters, alerted = self._disasters, self._alerted
+        out = []
+        for d in disasters:
+            if d.area is not None:
+                mask = d.area.contains_many(lats, lngs, slack_m=slack_m)
+            else:
+                mask = inside_radius_many(d.lat, d.lng, lats, lngs, d.radius_m, slack_m=slack_m)
+            seen = alerted[d.id]
+            idx = [i for i, hit in enumerate(mask) if hit and user_ids[i] not in seen]
+            if idx:
+                out.append((d, idx))
+        return out
+
+    def mark_alerted(self, disaster_id: int, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            bitmap = self._alerted.get(disaster_id)
+            if bitmap is not None:
+                bitmap.update(user_ids)
+
+
+active_disasters = ActiveDisasterIndex()
@@ -0,0 +1,176 @@
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from sqlalchemy import and_, event, exists, func, select, update
+from sqlalchemy.orm import Session, aliased
+from ..core.config import get_settings
+from ..models.models import DisasterReport, ReportStatus
+
+TYPE_ALIASES = {"FLOODING": "FLOOD", "FLOODS": "FLOOD", "WILDFIRE": "FIRE", "FIRES": "FIRE", "QUAKE": "EARTHQUAKE"}
+TOKEN_ALIASES = {"STREET": "ST", "ROAD": "RD", "AVENUE": "AVE", "MKT": "MARKET", "NAGAR": "NGR"}
+STOPWORDS = {"THE", "AT", "NEAR", "OF", "IN", "ON", "AND", "BY"}
+_TOKEN_RE = re.compile(r"[A-Z0-9]+")
+
+
+def normalize_type(report_type: str | None) -> str:
+    t = (report_type or "").upper().strip()
+    return TYPE_ALIASES.get(t, t)
+
+
+def location_tokens(location_text: str | None) -> frozenset[str]:
+    words = _TOKEN_RE.findall((location_text or "").upper())
+    return frozenset(TOKEN_ALIASES.get(w, w) for w in words if w not in STOPWORDS)
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    """Jaccard similarity of two token sets (two empty locations count as the same place)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class OpenCluster:
+    rep_id: int  # representative report; members point at it via DisasterReport.cluster_id
+    tokens: frozenset[str]
+    last_seen: datetime
+
+
+class ClusterIndex:
+    """Process-local index of open (pending) report clusters keyed by normalized type.
+
+    New reports are matched against the few open clusters of their type instead of
+    rescanning the pending table. Changes made in a transaction are applied only when it
+    commits (see assign()); discard() closes a cluster once it has been verified.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_type: dict[str, list[OpenCluster]] | None = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._by_type = None
+
+    def _load(self, db: Session) -> dict[str, list[OpenCluster]]:
+        by_type = self._by_type
+        if by_type is not None:
+            return by_type
+        since = datetime.utcnow() - timedelta(seconds=get_settings().cluster_window_s)
+        last_seen = dict(db.execute(
+            select(DisasterReport.cluster_id, func.max(DisasterReport.created_at))
+            .where(DisasterReport.status == ReportStatus.pending, DisasterReport.cluster_id.isnot(None))
+            .group_by(DisasterReport.cluster_id)
+        ).all())
+        by_type = {}
+        for rep_id, rtype, loc, created in db.execute(
+            select(DisasterReport.id, DisasterReport.type, DisasterReport.location_text, DisasterReport.created_at)
+            .where(DisasterReport.status == ReportStatus.pending, DisasterReport.cluster_id.is_(None))
+        ):
+            seen = max(created, last_seen.get(rep_id, created))
+            if seen >= since:
+                by_type.setdefault(normalize_type(rtype), []).append(OpenCluster(rep_id, location_tokens(loc), seen))
+        with self._lock:
+            self._by_type = by_type
+        return by_type
+
+    def assign(self, db: Session, reports: list[tuple[int, str | None, str | None]]) -> dict[int, int]:
+        """Cluster freshly inserted (id, type, location_text) reports, in order.
+
+        Returns {member report id: representative id}; reports that open a new cluster are
+        absent (they are their own representative, cluster_id stays NULL). Caller persists
+        the mapping and commits.
+        """
+        settings = get_settings()
+        now = datetime.utcnow()
+        since = now - timedelta(seconds=settings.cluster_window_s)
+        loaded = self._load(db)
+        with self._lock:
+            current = {t: list(cs) for t, cs in loaded.items()}
+        members: dict[int, int] = {}
+        opened: list[tuple[str, OpenCluster]] = []
+        touched: dict[int, datetime] = {}
+        for report_id, rtype, loc in reports:
+            key, tokens = normalize_type(rtype), location_tokens(loc)
+            live = [c for c in current.get(key, []) if c.last_seen >= since]
+            best = max(live, key=lambda c: similarity(tokens, c.tokens), default=None)
+            if best is not None and similarity(tokens, best.tokens) >= settings.cluster_min_similarity:
+                members[report_id] = best.rep_id
+                touched[best.rep_id] = now
+            else:
+                c = OpenCluster(report_id, tokens, now)
+                current.setdefault(key, []).append(c)
+                opened.append((key, c))
+        pending = db.info.setdefault("clusters", ([], {}))
+        pending[0].extend(opened)
+        pending[1].update(touched)
+        return members
+
+    def _apply(self, opened: list[tuple[str, OpenCluster]], touched: dict[int, datetime]) -> None:
+        with self._lock:
+            if self._by_type is None:
+                return  # next _load() reads the committed rows anyway
+            since = datetime.utcnow() - timedelta(seconds=get_settings().cluster_window_s)
+            for key, clusters in self._by_type.items():
+                self._by_type[key] = [c for c in clusters if c.last_seen >= since or c.rep_id in touched]
+            for key, c in opened:
+                self._by_type.setdefault(key, []).append(c)
+            if touched:
+                for clusters in self._by_type.values():
+                    for c in clusters:
+                        if c.rep_id in touched:
+                            c.last_seen = max(c.last_seen, touched[c.rep_id])
+
+    def discard(self, rep_id: int) -> None:
+        with self._lock:
+            if self._by_type is None:
+                return
+            for key, clusters in self._by_type.items():
+                self._by_type[key] = [c for c in clusters if c.rep_id != rep_id]
+
+
+report_clusters = ClusterIndex()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_clusters(session: Session):
+    pending = session.info.pop("clusters", None)
+    if pending:
+        report_clusters._apply(*pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_clusters(session: Session):
+    session.info.pop("clusters", None)
+
+
+def cluster_reports(db: Session, reports: list[tuple[int, str | None, str | None]]) -> dict[int, int]:
+    """Assign freshly inserted reports to open clusters and store DisasterReport.cluster_id."""
+    members = report_clusters.assign(db, reports)
+    if members:
+        db.execute(update(DisasterReport), [{"id": rid, "cluster_id": rep} for rid, rep in members.items()])
+    return members
+
+
+def pending_representatives():
+    """Filter for pending reports shown in the queue: cluster representatives, plus members
+    whose representative is no longer pending (verified by a process with a stale index)."""
+    rep = aliased(DisasterReport)
+    return and_(
+        DisasterReport.status == ReportStatus.pending,
+        ~exists().where(rep.id == DisasterReport.cluster_id, rep.status == ReportStatus.pending),
+    )
+
+
+def cluster_counts(db: Session, rep_ids: list[int]) -> dict[int, int]:
+    """Number of pending reports (representative included) in each cluster."""
+    counts = {rid: 1 for rid in rep_ids}
+    for i in range(0, len(rep_ids), 500):
+        for rep_id, n in db.execute(
+            select(DisasterReport.cluster_id, func.count())
+            .where(DisasterReport.cluster_id.in_(rep_ids[i:i + 500]), DisasterReport.status == ReportStatus.pending)
+            .group_by(DisasterReport.cluster_id)
+        ):
+            counts[rep_id] += n
+    return counts
@@ -0,0 +1,118 @@
+import logging
+import threading
+from array import array
+from datetime import datetime
+from sqlalchemy.orm import Session
+from ..core.config import get_settings
+from ..core.database import SessionLocal
+from ..models.models import DisasterReport, FanoutJob, FanoutStatus
+from .geofence import candidate_users, candidate_users_in_box, expand_box, inside_radius_many, prepare_area, towers
+from .sms_gateway import fan_out_alerts
+from .message_templates import alert_templates
+from .active_index import active_disasters
+
+log = logging.getLogger(__name__)
+
+# Job ids currently being processed in this process (guards against double starts).
+_running: set[int] = set()
+_running_lock = threading.Lock()
+
+
+def create_job(db: Session, dr: DisasterReport) -> FanoutJob:
+    job = FanoutJob(disaster_id=dr.id)
+    db.add(job)
+    db.flush()
+    return job
+
+
+def run_job(job_id: int) -> None:
+    """Process a fan-out job chunk by chunk, committing after each chunk.
+
+    Safe to call again after a crash: it continues from the stored cursor, and
+    fan_out_alerts skips users already in the alert log.
+    """
+    with _running_lock:
+        if job_id in _running:
+            return
+        _running.add(job_id)
+    db = SessionLocal()
+    try:
+        _run(db, job_id)
+    except Exception as e:
+        log.exception("fan-out job %s failed", job_id)
+        db.rollback()
+        job = db.get(FanoutJob, job_id)
+        if job:
+            job.status = FanoutStatus.failed
+            job.error = str(e)
+            db.commit()
+    finally:
+        db.close()
+        with _running_lock:
+            _running.discard(job_id)
+
+
+def _run(db: Session, job_id: int) -> None:
+    job = db.get(FanoutJob, job_id)
+    if job is None or job.status == FanoutStatus.done:
+        return
+    dr = db.get(DisasterReport, job.disaster_id)
+    body = alert_templates(db, dr)  # rendered once per language, shared by every row
+    chunk = get_settings().fanout_chunk_size
+    # tower-located users count as inside when their coverage circle touches the zone
+    slack_max = towers.max_coverage_m(db)
+    area = prepare_area(dr.area_geojson) if dr.area_geojson else None
+    job.status = FanoutStatus.running
+    job.started_at = job.started_at or datetime.utcnow()
+    db.commit()
+
+    while True:
+        after = (job.cursor_cell, job.cursor_user_id) if job.cursor_cell is not None else None
+        if area is not None:
+            rows = candidate_users_in_box(db, expand_box(area.bbox, slack_max), after=after, limit=chunk)
+        else:
+            rows = candidate_users(db, dr.lat, dr.lng, dr.radius_m + slack_max, after=after, limit=chunk)
+        if not rows:
+            break
+        lats = array("d", (r.last_lat for r in rows))
+        lngs = array("d", (r.last_lng for r in rows))
+        slack = array("d", (r.loc_uncertainty_m or 0 for r in rows))
+        if area is not None:
+            mask = area.contains_many(lats, lngs, slack_m=slack)
+        else:
+            mask = inside_radius_many(dr.lat, dr.lng, lats, lngs, dr.radius_m, slack_m=slack)
+        recipients = [(r.id, r.phone, r.lang) for r, hit in zip(rows, mask) if hit]
+        queued = fan_out_alerts(db, dr.id, recipients, body, severity=dr.severity)
+        job.cursor_cell, job.cursor_user_id = rows[-1].geo_cell, rows[-1].id
+        job.users_scanned += len(rows)
+        job.alerts_queued += len(queued)
+        db.commit()  # gateways can start draining this chunk now
+        active_disasters.mark_alerted(dr.id, queued)
+
+    job.status = FanoutStatus.done
+    job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def start_job(job_id: int) -> threading.Thread:
+    t = threading.Thread(target=run_job, args=(job_id,), name=f"fanout-{job_id}", daemon=True)
+    t.start()
+    return t
+
+
+def resume_jobs() -> list[int]:
+    """Restart every job left pending/running by a previous process."""
+    db = SessionLocal()
+    try:
+        ids = [j.id for j in db.query(FanoutJob.id).filter(FanoutJob.status.in_([FanoutStatus.pending, FanoutStatus.running]))]
+    finally:
+        db.close()
+    for job_id in ids:
+        start_job(job_id)
+    return ids
+
+
+def elapsed_s(job: FanoutJob) -> float | None:
+    if job.started_at is None:
+        return None
+    return ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
@@ -1,8 +1,32 @@
-from math import radians, sin, cos, asin, sqrt
-from typing import Iterable
+import csv
+import io
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from itertools import repeat
+from math import radians, degrees, sin, cos, asin, sqrt
+from typing import Iterable, Sequence
+from sqlalchemy import and_, or_, select, insert, update
+from sqlalchemy.orm import Session
+from ..core.config import get_settings
+from ..models.models import User, CellTower
+
+try:
+    import numpy as np
+except ImportError:  # optional; the batch helpers fall back to array('d') loops
+    np = None
 
 EARTH_RADIUS_KM = 6371.0
 
+# Grid used for the User.geo_cell index: fixed-size lat/lng cells numbered
+# row-major, so every row of a bounding box is one contiguous id range.
+CELL_DEG = 0.05
+GRID_ROWS = int(180 / CELL_DEG)
+GRID_COLS = int(360 / CELL_DEG)
+
 
 def haversine_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Return distance in meters between two lat/lon points."""
@@ -17,3 +41,376 @@ def haversine_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) ->
 
 def inside_radius(lat1: float, lon1: float, lat2: float, lon2: float, radius_m: float) -> bool:
     return haversine_distance_m(lat1, lon1, lat2, lon2) <= radius_m
+
+
+def haversine_many_m(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]):
+    """Return distances in meters from (lat, lng) to each point of two parallel arrays.
+
+    Accepts NumPy arrays, array('d') or any float sequence. Returns a NumPy array when
+    NumPy is installed, otherwise an array('d').
+    """
+    if np is not None:
+        plat = np.radians(np.asarray(lats, dtype=np.float64))
+        plng = np.radians(np.asarray(lngs, dtype=np.float64))
+        clat = radians(lat)
+        a = np.sin((plat - clat) / 2) ** 2 + cos(clat) * np.cos(plat) * np.sin((plng - radians(lng)) / 2) ** 2
+        return 2000.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    clat, clng = radians(lat), radians(lng)
+    cos_c = cos(clat)
+    scale = 2000.0 * EARTH_RADIUS_KM
+    out = array("d", bytes(8 * len(lats)))
+    for i, (plat, plng) in enumerate(zip(lats, lngs)):
+        plat = radians(plat)
+        a = sin((plat - clat) / 2) ** 2 + cos_c * cos(plat) * sin((radians(plng) - clng) / 2) ** 2
+        out[i] = scale * asin(sqrt(min(a, 1.0)))
+    return out
+
+
+def inside_radius_many(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float], radius_m,
+                       slack_m=None) -> Sequence[bool]:
+    """Batch inside_radius: boolean mask of the points within radius_m of (lat, lng).
+
+    radius_m is a scalar or a per-point sequence (e.g. one radius per disaster center).
+    slack_m (scalar or per point) widens the test by each point's location uncertainty.
+    """
+    dist = haversine_many_m(lat, lng, lats, lngs)
+    if np is not None:
+        limit = np.asarray(radius_m, dtype=np.float64)
+        if slack_m is not None:
+            limit = limit + np.asarray(slack_m, dtype=np.float64)
+        return dist <= limit
+    if isinstance(radius_m, (int, float)):
+        radius_m = repeat(radius_m)
+    if slack_m is None:
+        return [d <= r for d, r in zip(dist, radius_m)]
+    if isinstance(slack_m, (int, float)):
+        slack_m = repeat(slack_m)
+    return [d <= r + e for d, r, e in zip(dist, radius_m, slack_m)]
+
+
+def cell_id(lat: float | None, lng: float | None) -> int | None:
+    """Return the grid cell containing a point (None when the point is unknown)."""
+    if lat is None or lng is None:
+        return None
+    row = min(max(int((lat + 90.0) // CELL_DEG), 0), GRID_ROWS - 1)
+    col = int(((lng + 180.0) % 360.0) // CELL_DEG) % GRID_COLS
+    return row * GRID_COLS + col
+
+
+def bounding_box(lat: float, lng: float, radius_m: float) -> tuple[float, float, float, float]:
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing a circle on the sphere.
+
+    Longitudes may fall outside [-180, 180] near the antimeridian; cell_ranges wraps them.
+    """
+    ang = radius_m / (EARTH_RADIUS_KM * 1000.0)
+    dlat = degrees(ang)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        # circle contains a pole: every longitude is reachable
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    ratio = sin(ang) / cos(radians(lat))
+    if ratio >= 1.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlng = degrees(asin(ratio))
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+def cell_ranges(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> list[tuple[int, int]]:
+    """Return merged inclusive (lo, hi) geo_cell ranges covering a bounding box."""
+    row0 = min(max(int((min_lat + 90.0) // CELL_DEG), 0), GRID_ROWS - 1)
+    row1 = min(max(int((max_lat + 90.0) // CELL_DEG), 0), GRID_ROWS - 1)
+    if max_lng - min_lng >= 360.0:
+        spans = [(0, GRID_COLS - 1)]
+    else:
+        c0 = int(((min_lng + 180.0) % 360.0) // CELL_DEG) % GRID_COLS
+        c1 = int(((max_lng + 180.0) % 360.0) // CELL_DEG) % GRID_COLS
+        spans = [(c0, c1)] if c0 <= c1 else [(0, c1), (c0, GRID_COLS - 1)]
+
+    ranges: list[tuple[int, int]] = []
+    for row in range(row0, row1 + 1):
+        base = row * GRID_COLS
+        for a, b in spans:
+            lo, hi = base + a, base + b
+            if ranges and ranges[-1][1] + 1 == lo:
+                ranges[-1] = (ranges[-1][0], hi)
+            else:
+                ranges.append((lo, hi))
+    return ranges
+
+
+def expand_box(box: tuple[float, float, float, float], margin_m: float) -> tuple[float, float, float, float]:
+    """Grow a (min_lat, max_lat, min_lng, max_lng) box by margin_m on every side."""
+    min_lat, max_lat, min_lng, max_lng = box
+    if margin_m <= 0:
+        return box
+    dlat = degrees(margin_m / (EARTH_RADIUS_KM * 1000.0))
+    min_lat, max_lat = max(min_lat - dlat, -90.0), min(max_lat + dlat, 90.0)
+    widest = cos(radians(max(abs(min_lat), abs(max_lat))))
+    if widest <= dlat / 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlng = min(dlat / widest, 180.0)
+    return min_lat, max_lat, min_lng - dlng, max_lng + dlng
+
+
+def candidate_users(db: Session, lat: float, lng: float, radius_m: float,
+                    after: tuple[int, int] | None = None, limit: int | None = None):
+    """Return (id, phone, last_lat, last_lng, geo_cell, loc_uncertainty_m) rows for users in grid cells touching the circle's bbox.
+
+    This is a coarse pre-filter; callers still run the exact inside_radius check. Rows come
+    ordered by (geo_cell, id) so `after=(geo_cell, id)` + `limit` pages through them by keyset.
+    """
+    return candidate_users_in_box(db, bounding_box(lat, lng, radius_m), after=after, limit=limit)
+
+
+def candidate_users_in_box(db: Session, box: tuple[float, float, float, float],
+                           after: tuple[int, int] | None = None, limit: int | None = None):
+    """candidate_users for an arbitrary (min_lat, max_lat, min_lng, max_lng) box."""
+    clauses = []
+    for lo, hi in cell_ranges(*box):
+        if after is not None:
+            cell, user_id = after
+            if hi < cell:
+                continue
+            if lo <= cell:
+                clauses.append(and_(User.geo_cell == cell, User.id > user_id))
+                lo = cell + 1
+                if lo > hi:
+                    continue
+        clauses.append(User.geo_cell.between(lo, hi))
+    if not clauses:
+        return []
+    q = (
+        db.query(User.id, User.phone, User.last_lat, User.last_lng, User.geo_cell, User.loc_uncertainty_m, User.lang)
+        .filter(or_(*clauses))
+        .order_by(User.geo_cell, User.id)
+    )
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
+
+
+M_PER_DEG = EARTH_RADIUS_KM * 1000.0 * 3.141592653589793 / 180.0
+
+
+class PreparedArea:
+    """Polygon / MultiPolygon prepared for repeated point-in-polygon tests.
+
+    Every ring is flattened once into parallel edge arrays (lng/lat degrees plus the inverse
+    slope), so a test is one even-odd ray cast per polygon; holes need no special casing.
+    Planar in lng/lat, which is fine at disaster scale but not across the antimeridian.
+    """
+
+    def __init__(self, polygons: list[list[list[tuple[float, float]]]]):
+        self.polygons: list[tuple[array, array, array, array, array]] = []
+        lats: list[float] = []
+        lngs: list[float] = []
+        for rings in polygons:
+            x1, y1, x2, y2, k = (array("d") for _ in range(5))
+            for ring in rings:
+                pts = ring if ring[0] == ring[-1] else [*ring, ring[0]]
+                for (ax, ay), (bx, by) in zip(pts, pts[1:]):
+                    x1.append(ax); y1.append(ay); x2.append(bx); y2.append(by)
+                    k.append((bx - ax) / (by - ay) if by != ay else 0.0)
+                lngs.extend(p[0] for p in pts)
+                lats.extend(p[1] for p in pts)
+            self.polygons.append((x1, y1, x2, y2, k))
+        self.bbox = (min(lats), max(lats), min(lngs), max(lngs))
+
+    @property
+    def center(self) -> tuple[float, float]:
+        min_lat, max_lat, min_lng, max_lng = self.bbox
+        return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+    def _inside_many(self, lats, lngs) -> list[bool]:
+        min_lat, max_lat, min_lng, max_lng = self.bbox
+        if np is not None:
+            py = np.asarray(lats, dtype=np.float64)
+            px = np.asarray(lngs, dtype=np.float64)
+            cand = (py >= min_lat) & (py <= max_lat) & (px >= min_lng) & (px <= max_lng)
+            inside = np.zeros(len(py), dtype=bool)
+            if not cand.any():
+                return inside
+            py, px = py[cand], px[cand]
+            hit = np.zeros(len(py), dtype=bool)
+            for x1, y1, x2, y2, k in self.polygons:
+                odd = np.zeros(len(py), dtype=bool)
+                for ax, ay, by, kk in zip(x1, y1, y2, k):
+                    odd ^= ((ay > py) != (by > py)) & (px < ax + (py - ay) * kk)
+                hit |= odd
+            inside[cand] = hit
+            return inside
+
+        out = []
+        for py, px in zip(lats, lngs):
+            hit = False
+            if min_lat <= py <= max_lat and min_lng <= px <= max_lng:
+                for x1, y1, x2, y2, k in self.polygons:
+                    odd = False
+                    for ax, ay, by, kk in zip(x1, y1, y2, k):
+                        if (ay > py) != (by > py) and px < ax + (py - ay) * kk:
+                            odd = not odd
+                    if odd:
+                        hit = True
+                        break
+            out.append(hit)
+        return out
+
+    def distance_m(self, lat: float, lng: float) -> float:
+        """Approximate distance from a point to the nearest edge (local equirectangular)."""
+        sx = cos(radians(lat)) * M_PER_DEG
+        best = float("inf")
+        for x1, y1, x2, y2, _ in self.polygons:
+            for ax, ay, bx, by in zip(x1, y1, x2, y2):
+                ax, ay, bx, by = (ax - lng) * sx, (ay - lat) * M_PER_DEG, (bx - lng) * sx, (by - lat) * M_PER_DEG
+                dx, dy = bx - ax, by - ay
+                seg = dx * dx + dy * dy
+                t = 0.0 if seg == 0 else min(max(-(ax * dx + ay * dy) / seg, 0.0), 1.0)
+                best = min(best, sqrt((ax + t * dx) ** 2 + (ay + t * dy) ** 2))
+        return best
+
+    def contains_many(self, lats: Sequence[float], lngs: Sequence[float], slack_m=None) -> Sequence[bool]:
+        """Boolean mask of the points inside the area, or within slack_m (scalar or per point) of it."""
+        mask = self._inside_many(lats, lngs)
+        if slack_m is None:
+            return mask
+        if isinstance(slack_m, (int, float)):
+            slack_m = repeat(slack_m)
+        if np is None:
+            mask = list(mask)
+        for i, (py, px, e) in enumerate(zip(lats, lngs, slack_m)):
+            # uncertain points just outside: rare, so the exact edge distance is affordable
+            if e > 0 and not mask[i]:
+                min_lat, max_lat, min_lng, max_lng = expand_box(self.bbox, e)
+                if min_lat <= py <= max_lat and min_lng <= px <= max_lng and self.distance_m(py, px) <= e:
+                    mask[i] = True
+        return mask
+
+    def contains(self, lat: float, lng: float, slack_m: float = 0) -> bool:
+        return bool(self.contains_many([lat], [lng], [slack_m] if slack_m else None)[0])
+
+
+def parse_area(geometry: dict) -> str:
+    """Validate a GeoJSON Polygon / MultiPolygon (or a Feature wrapping one) and return it as
+    compact JSON for DisasterReport.area_geojson. Raises ValueError when it is unusable."""
+    if geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry") or {}
+    kind, coords = geometry.get("type"), geometry.get("coordinates")
+    if kind == "Polygon":
+        coords = [coords]
+    elif kind != "MultiPolygon":
+        raise ValueError("area must be a GeoJSON Polygon or MultiPolygon")
+    try:
+        polygons = [[[(float(p[0]), float(p[1])) for p in ring] for ring in rings] for rings in coords]
+    except (TypeError, ValueError, IndexError):
+        raise ValueError("area coordinates must be [lng, lat] pairs") from None
+    if not polygons or any(not rings or any(len(set(ring)) < 3 for ring in rings) for rings in polygons):
+        raise ValueError("every polygon ring needs at least 3 distinct points")
+    if any(not (-90 <= lat <= 90 and -180 <= lng <= 180) for rings in polygons for ring in rings for lng, lat in ring):
+        raise ValueError("area coordinates out of range")
+    return json.dumps({"type": "MultiPolygon", "coordinates": polygons}, separators=(",", ":"))
+
+
+@lru_cache(maxsize=256)
+def prepare_area(area_geojson: str) -> PreparedArea:
+    """PreparedArea for a stored area_geojson, built once per distinct area."""
+    return PreparedArea(json.loads(area_geojson)["coordinates"])
+
+
+class TowerCache:
+    """tower id -> (lat, lng, coverage_m) for the whole registry, loaded once per process.
+
+    Ids missing from the snapshot (registered by another process, or unknown) are looked
+    up singly and remembered in a bounded LRU, negative answers included, so a flood of
+    pings from one tower costs at most one query. import_towers() invalidates it.
+    """
+
+    def __init__(self, miss_capacity: int = 10_000):
+        self._lock = threading.Lock()
+        self._towers: dict[str, tuple[float, float, int]] | None = None
+        self._max_coverage = 0
+        self._misses: OrderedDict[str, tuple[float, float, int] | None] = OrderedDict()
+        self._miss_capacity = miss_capacity
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._towers = None
+            self._misses.clear()
+
+    def _load(self, db: Session) -> dict[str, tuple[float, float, int]]:
+        towers = self._towers
+        if towers is None:
+            towers = {tid: (lat, lng, cov) for tid, lat, lng, cov in
+                      db.execute(select(CellTower.id, CellTower.lat, CellTower.lng, CellTower.coverage_m))}
+            with self._lock:
+                self._towers = towers
+                self._max_coverage = max((t[2] for t in towers.values()), default=0)
+        return towers
+
+    def resolve(self, db: Session, tower_id: str) -> tuple[float, float, int] | None:
+        found = self._load(db).get(tower_id)
+        if found is not None:
+            return found
+        with self._lock:
+            if tower_id in self._misses:
+                self._misses.move_to_end(tower_id)
+                return self._misses[tower_id]
+        row = db.execute(select(CellTower.lat, CellTower.lng, CellTower.coverage_m).where(CellTower.id == tower_id)).first()
+        found = tuple(row) if row else None
+        with self._lock:
+            self._misses[tower_id] = found
+            if len(self._misses) > self._miss_capacity:
+                self._misses.popitem(last=False)
+            if found:
+                self._max_coverage = max(self._max_coverage, found[2])
+        return found
+
+    def max_coverage_m(self, db: Session) -> int:
+        """Largest coverage radius known; how far a tower-located user may sit outside a bbox."""
+        self._load(db)
+        return self._max_coverage
+
+
+towers = TowerCache()
+
+
+def locate(db: Session, lat: float | None, lng: float | None, tower_id: str | None) -> tuple[float, float, int | None] | None:
+    """Resolve a reported position to (lat, lng, uncertainty_m).
+
+    An explicit lat/lng wins and is exact (uncertainty None); otherwise the tower center is
+    used with its coverage radius as uncertainty. None when neither resolves.
+    """
+    if lat is not None and lng is not None:
+        return lat, lng, None
+    if tower_id is not None:
+        return towers.resolve(db, tower_id)
+    return None
+
+
+def import_towers(db: Session, csv_text: str) -> int:
+    """Upsert towers from CSV with header tower_id,lat,lng[,coverage_m]; returns rows imported."""
+    default_cov = get_settings().tower_default_coverage_m
+    rows: dict[str, dict] = {}
+    for line_no, rec in enumerate(csv.DictReader(io.StringIO(csv_text)), start=2):
+        try:
+            tid = rec["tower_id"].strip()
+            if not tid:
+                raise ValueError("empty tower_id")
+            cov = (rec.get("coverage_m") or "").strip()
+            rows[tid] = {"id": tid, "lat": float(rec["lat"]), "lng": float(rec["lng"]),
+                         "coverage_m": int(float(cov)) if cov else default_cov}
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"line {line_no}: {e}") from None
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    ids = list(rows)
+    known: set[str] = set()
+    for i in range(0, len(ids), 500):
+        known.update(db.scalars(select(CellTower.id).where(CellTower.id.in_(ids[i:i + 500]))))
+    if known:
+        db.execute(update(CellTower), [{**rows[t], "updated_at": now} for t in known])
+    fresh = [{**r, "updated_at": now} for t, r in rows.items() if t not in known]
+    if fresh:
+        db.execute(insert(CellTower), fresh)
+    return len(rows)
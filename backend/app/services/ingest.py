@@ -0,0 +1,99 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from ..core.database import insert_returning_ids
+from ..models.models import DisasterReport, InboundMessage, InboundKind, ReportStatus, HelpRequest
+from .parsing import parse_many
+from .clustering import cluster_reports
+
+
+def _result(kind: InboundKind, report_id: int | None) -> dict:
+    if kind == InboundKind.REPORT and report_id is not None:
+        return {"message": "report received", "report_id": report_id}
+    return {"message": "received"}
+
+
+def _known_keys(db: Session, keys: list[str]) -> dict[str, dict]:
+    """Original results for gateway_msg_ids already stored (one unique-index probe per key)."""
+    found: dict[str, dict] = {}
+    for i in range(0, len(keys), 500):
+        rows = db.execute(
+            select(InboundMessage.gateway_msg_id, InboundMessage.kind, InboundMessage.disaster_id)
+            .where(InboundMessage.gateway_msg_id.in_(keys[i:i + 500]))
+        )
+        for key, kind, disaster_id in rows:
+            found[key] = _result(kind, disaster_id)
+    return found
+
+
+def ingest_batch(db: Session, items: list[tuple[str, str, str | None]]) -> list[dict]:
+    """Parse and store many inbound SMS (phone, message, gateway_msg_id) with one bulk
+    INSERT per table.
+
+    Items whose gateway_msg_id was seen before (in the DB or earlier in the batch) are not
+    stored again; they get the original result with "duplicate": True. Returns one result
+    dict per item, in order. Caller commits.
+    """
+    if not items:
+        return []
+    known = _known_keys(db, list({key for _, _, key in items if key is not None}))
+    new_idx: list[int] = []
+    first_of_key: dict[str, int] = {}
+    for i, (_, _, key) in enumerate(items):
+        if key is None:
+            new_idx.append(i)
+        elif key not in known and key not in first_of_key:
+            first_of_key[key] = i
+            new_idx.append(i)
+
+    parsed = dict(zip(new_idx, parse_many(items[i][1] for i in new_idx)))
+
+    # reports first so each REPORT inbound row can link to the report it created
+    report_idx = [i for i in new_idx if parsed[i].kind == InboundKind.REPORT and parsed[i].report]
+    report_ids: dict[int, int] = {}
+    if report_idx:
+        ids = insert_returning_ids(
+            db, DisasterReport,
+            [
+                {
+                    "raw_text": items[i][1],
+                    "type": parsed[i].report.type,
+                    "location_text": parsed[i].report.location_text,
+                    "radius_m": parsed[i].report.radius_m,
+                    "severity": parsed[i].report.severity,
+                    "status": ReportStatus.pending,
+                    "reporter_phone": items[i][0],
+                }
+                for i in report_idx
+            ],
+        )
+        report_ids = dict(zip(report_idx, ids))
+        cluster_reports(db, [(report_ids[i], parsed[i].report.type, parsed[i].report.location_text) for i in report_idx])
+
+    inbound_ids: dict[int, int] = {}
+    if new_idx:
+        ids = insert_returning_ids(
+            db, InboundMessage,
+            [
+                {"phone": items[i][0], "body": items[i][1], "kind": parsed[i].kind,
+                 "disaster_id": report_ids.get(i), "gateway_msg_id": items[i][2]}
+                for i in new_idx
+            ],
+        )
+        inbound_ids = dict(zip(new_idx, ids))
+
+    help_rows = [
+        {"inbound_id": inbound_ids[i], "phone": items[i][0], "people_count": parsed[i].people_count}
+        for i in new_idx if parsed[i].kind == InboundKind.HELP
+    ]
+    if help_rows:
+        db.execute(insert(HelpRequest), help_rows)
+
+    results = []
+    for i, (_, _, key) in enumerate(items):
+        if i in inbound_ids:
+            results.append(_result(parsed[i].kind, report_ids.get(i)))
+        else:
+            first = first_of_key.get(key)
+            original = known[key] if first is None else _result(parsed[first].kind, report_ids.get(first))
+            results.append({**original, "duplicate": True})
+    return results
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from ..core.config import get_settings
+from ..core.database import insert_ignore
+from ..models.models import MessageTemplate, OutboundPurpose
+from .sms_encoding import fit_message, segments
+
+# alert text per language: (prefix, suffix) around the location. Reply keywords are ones
+# parsing.KEYWORDS understands; add a language here and users with that User.lang get it.
+ALERT_TEXT = {
+    "en": ("ALERT: {type} near ", ". Reply HELP if you need assistance."),
+    "es": ("ALERTA: {type} cerca de ", ". Responda AYUDA si necesita asistencia."),
+    "hi": ("चेतावनी: {type} - ", " के पास। मदद के लिए MADAD भेजें।"),
+}
+# the same alert for a report that named no location (REPORT: FIRE 2km high); same keys
+ALERT_TEXT_NO_LOCATION = {
+    "en": "ALERT: {type} in your area. Reply HELP if you need assistance.",
+    "es": "ALERTA: {type} en su zona. Responda AYUDA si necesita asistencia.",
+    "hi": "चेतावनी: आपके क्षेत्र में {type}। मदद के लिए MADAD भेजें।",
+}
+
+
+@dataclass(frozen=True)
+class Rendered:
+    id: int  # MessageTemplate row
+    body: str
+    segments: int
+
+
+def resolve_lang(lang: str | None) -> str:
+    if lang and lang.lower() in ALERT_TEXT:
+        return lang.lower()
+    default = get_settings().default_lang
+    return default if default in ALERT_TEXT else "en"
+
+
+def render_alert(dr, lang: str) -> str:
+    """Alert text for a disaster (report row or ActiveDisaster) in one language.
+
+    The location is the only free text; it is abbreviated or cut to keep the segment budget.
+    """
+    if not dr.location_text:
+        return ALERT_TEXT_NO_LOCATION[lang].format(type=dr.type)
+    prefix, suffix = ALERT_TEXT[lang]
+    return fit_message(prefix.format(type=dr.type), dr.location_text, suffix,
+                       max_segments=get_settings().alert_max_segments)
+
+
+class TemplateCache:
+    """Process-local LRU of template rows keyed by (disaster_id, purpose, lang).
+
+    A fan-out renders its alert once per language and every later chunk, mover or worker
+    reuses the row. Rows created in a transaction are cached only when it commits, so a
+    rollback can't leave the cache pointing at a row that was never stored.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._lru: OrderedDict[tuple, Rendered] = OrderedDict()
+
+    def get(self, db: Session, key: tuple, render: Callable[[], str]) -> Rendered:
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None:
+                self._lru.move_to_end(key)
+                return hit
+        pending = db.info.setdefault("templates", {})
+        if key in pending:
+            return pending[key]
+        disaster_id, purpose, lang = key
+        where = (MessageTemplate.disaster_id == disaster_id, MessageTemplate.purpose == purpose, MessageTemplate.lang == lang)
+        q = select(MessageTemplate.id, MessageTemplate.body, MessageTemplate.segments).where(*where)
+        row = db.execute(q).first()
+        if row is None:
+            body = render()
+            # a concurrent fan-out may have stored the same key first; then its row is used
+            db.execute(insert_ignore(db, MessageTemplate), [{"disaster_id": disaster_id, "purpose": purpose,
+                                                             "lang": lang, "body": body, "segments": segments(body)}])
+            pending[key] = Rendered(*db.execute(q).one())
+            return pending[key]
+        found = Rendered(*row)
+        self._put(key, found)
+        return found
+
+    def _put(self, key: tuple, value: Rendered) -> None:
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+
+template_cache = TemplateCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_templates(session: Session):
+    for key, value in session.info.pop("templates", {}).items():
+        template_cache._put(key, value)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_templates(session: Session):
+    session.info.pop("templates", None)
+
+
+def alert_templates(db: Session, dr) -> Callable[[str | None], Rendered]:
+    """Per-language lookup of a disaster's shared alert template, for fan_out_alerts."""
+    def for_lang(lang: str | None) -> Rendered:
+        lang = resolve_lang(lang)
+        return template_cache.get(db, (dr.id, OutboundPurpose.ALERT, lang), lambda: render_alert(dr, lang))
+    return for_lang
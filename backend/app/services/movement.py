@@ -0,0 +1,76 @@
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from ..core.database import insert_returning_ids
+from ..models.models import User
+from .active_index import active_disasters
+from .geofence import cell_id, locate
+from .message_templates import alert_templates
+from .sms_gateway import SQL_CHUNK, fan_out_alerts
+
+
+@dataclass
+class MoveResult:
+    moved: int = 0  # moves applied (several for one phone collapse to the last)
+    unresolved: int = 0  # moves with neither a fix nor a known tower
+    new_alerts: int = 0
+    # {disaster_id: alerted user ids}; record with active_disasters.mark_alerted after commit
+    alerted: dict[int, list[int]] = field(default_factory=dict)
+
+
+def apply_moves(db: Session, moves: list[tuple[str, float | None, float | None, str | None]]) -> MoveResult:
+    """Bulk-upsert (phone, lat, lng, tower_id) locations and queue alerts for late entrants.
+
+    Moves without lat/lng are placed at their tower (cached lookup, coverage radius kept as
+    uncertainty). Users are matched by phone in chunks, new ones are inserted and existing
+    ones updated with executemany. The moved set is then checked against every active
+    disaster in one vectorized pass per disaster.
+    """
+    res = MoveResult()
+    latest: dict[str, tuple[float, float, int | None, str | None]] = {}
+    for phone, lat, lng, tower_id in moves:
+        loc = locate(db, lat, lng, tower_id)
+        if loc is None:
+            res.unresolved += 1
+            continue
+        latest[phone] = (*loc, tower_id)  # last position wins
+        res.moved += 1
+    if not latest:
+        return res
+    phones = list(latest)
+    now = datetime.utcnow()
+
+    def values(p: str) -> dict:
+        lat, lng, unc, tower_id = latest[p]
+        row = {"last_lat": lat, "last_lng": lng, "loc_uncertainty_m": unc,
+               "geo_cell": cell_id(lat, lng), "updated_at": now}
+        if tower_id is not None:  # a GPS-only move leaves the stored tower alone, like /move-user
+            row["last_tower"] = tower_id
+        return row
+
+    ids: dict[str, int] = {}
+    langs: dict[str, str | None] = {}  # new users have none yet: default language
+    for i in range(0, len(phones), SQL_CHUNK):
+        for phone, uid, lang in db.execute(select(User.phone, User.id, User.lang).where(User.phone.in_(phones[i:i + SQL_CHUNK]))):
+            ids[phone], langs[phone] = uid, lang
+
+    existing = [p for p in phones if p in ids]
+    missing = [p for p in phones if p not in ids]
+    if missing:
+        new_ids = insert_returning_ids(db, User, [{"phone": p, "last_tower": None, **values(p)} for p in missing])
+        ids.update(zip(missing, new_ids))
+    if existing:
+        db.execute(update(User), [{"id": ids[p], **values(p)} for p in existing])
+
+    user_ids = [ids[p] for p in phones]
+    lats = array("d", (latest[p][0] for p in phones))
+    lngs = array("d", (latest[p][1] for p in phones))
+    slack = array("d", (latest[p][2] or 0 for p in phones))
+    for d, idx in active_disasters.late_entrants(db, user_ids, lats, lngs, slack_m=slack):
+        recipients = [(user_ids[i], phones[i], langs.get(phones[i])) for i in idx]
+        queued = fan_out_alerts(db, d.id, recipients, alert_templates(db, d), severity=d.severity)
+        res.new_alerts += len(queued)
+        res.alerted[d.id] = [user_ids[i] for i in idx]
+    return res
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+
+class Notifier:
+    """Process-local "something changed" signal.
+
+    Waiters remember `version` before checking their condition, then block until
+    it moves on; a notify() that lands in between is never lost.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._version = 0
+        self._async_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def notify(self) -> None:
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, ev in waiters:
+            try:
+                loop.call_soon_threadsafe(ev.set)
+            except RuntimeError:  # loop already closed
+                pass
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """Block until version != since or timeout; True if notified."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._version != since, timeout)
+
+    async def wait_async(self, since: int, timeout: float) -> bool:
+        """Event-loop friendly wait(); notify() may come from any thread."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self._version != since:
+                return True
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+
+# fired after a transaction that queued OutboundSMS rows commits
+outbound_queued = Notifier()
@@ -0,0 +1,50 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE = 100
+MAX_PAGE = 1000
+
+
+def encode_cursor(key: tuple) -> str:
+    """Opaque cursor for a (timestamp, id) or (id,) sort key."""
+    raw = "|".join(v.isoformat() if isinstance(v, datetime) else str(v) for v in key)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, with_ts: bool) -> tuple:
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except Exception:
+        raise ValueError("bad cursor") from None
+    parts = raw.split("|")
+    if len(parts) != (2 if with_ts else 1):
+        raise ValueError("bad cursor")
+    if with_ts:
+        return datetime.fromisoformat(parts[0]), int(parts[1])
+    return (int(parts[0]),)
+
+
+def keyset_page(q, id_col, cursor: str | None = None, limit: int = DEFAULT_PAGE, ts_col=None):
+    """Newest-first page of a query by keyset on (ts_col, id_col), or id_col alone.
+
+    Seeks past the cursor instead of OFFSET, so any page costs O(limit) with an index
+    ending in the sort key. Returns (rows, next_cursor or None).
+    """
+    limit = min(max(limit, 1), MAX_PAGE)
+    if cursor:
+        key = decode_cursor(cursor, ts_col is not None)
+        if ts_col is not None:
+            # expanded row-value comparison: (ts, id) < (:ts, :id)
+            q = q.filter(or_(ts_col < key[0], and_(ts_col == key[0], id_col < key[1])))
+        else:
+            q = q.filter(id_col < key[0])
+    order = [ts_col.desc(), id_col.desc()] if ts_col is not None else [id_col.desc()]
+    rows = q.order_by(*order).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    key = (getattr(last, ts_col.key), last.id) if ts_col is not None else (last.id,)
+    return rows, encode_cursor(key)
@@ -1,18 +1,90 @@
 import re
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Optional
 from ..models.models import SeverityEnum, InboundKind
 
-REPORT_REGEX = re.compile(
-    r"^REPORT:\s*(?P<type>[A-Z0-9_]+)\s+at\s+(?P<location>.+?)\s+radius\s+(?P<radius>\d+(?:\.\d+)?)(?P<unit>km|m)\s+severity\s+(?P<severity>LOW|MEDIUM|HIGH)\s*$",
+# Leading keyword -> message kind. One dict lookup replaces a chain of startswith checks;
+# add aliases here (local-language keywords included) rather than new branches.
+KEYWORDS: dict[str, InboundKind] = {
+    "REPORT": InboundKind.REPORT, "RPT": InboundKind.REPORT, "SUCHNA": InboundKind.REPORT,
+    "HELP": InboundKind.HELP, "SOS": InboundKind.HELP, "MADAD": InboundKind.HELP,
+    "BACHAO": InboundKind.HELP, "AYUDA": InboundKind.HELP,
+    "SAFE": InboundKind.SAFE, "SURAKSHIT": InboundKind.SAFE,
+}
+
+SEVERITY_WORDS: dict[str, SeverityEnum] = {
+    "LOW": SeverityEnum.LOW, "MINOR": SeverityEnum.LOW,
+    "MEDIUM": SeverityEnum.MEDIUM, "MED": SeverityEnum.MEDIUM, "MODERATE": SeverityEnum.MEDIUM,
+    "HIGH": SeverityEnum.HIGH, "SEVERE": SeverityEnum.HIGH, "CRITICAL": SeverityEnum.HIGH, "CRIT": SeverityEnum.HIGH,
+}
+DEFAULT_SEVERITY = SeverityEnum.MEDIUM
+
+UNIT_M: dict[str, float] = {
+    "M": 1, "MTR": 1, "MTRS": 1, "METER": 1, "METERS": 1, "METRE": 1, "METRES": 1,
+    "KM": 1000, "KMS": 1000, "KILOMETER": 1000, "KILOMETERS": 1000, "KILOMETRE": 1000, "KILOMETRES": 1000,
+    "MI": 1609.344, "MILE": 1609.344, "MILES": 1609.344,
+}
+
+
+# Disaster types recognised without an explicit "REPORT:" colon; multi-word phrases are
+# stored as one type (GAS LEAK -> GAS_LEAK). With the colon any single word is accepted.
+DISASTER_TYPES: frozenset[str] = frozenset({
+    "FLOOD", "FLOODS", "FLOODING", "FLASH FLOOD", "FIRE", "FIRES", "WILDFIRE", "FOREST FIRE", "EARTHQUAKE", "QUAKE",
+    "LANDSLIDE", "MUDSLIDE", "CYCLONE", "HURRICANE", "TYPHOON", "TORNADO", "STORM", "TSUNAMI",
+    "GAS", "GAS LEAK", "CHEMICAL SPILL", "EXPLOSION", "BLAST", "COLLAPSE", "BUILDING COLLAPSE",
+    "ACCIDENT", "DROUGHT", "HEATWAVE", "HEAT WAVE", "COLD WAVE", "AVALANCHE", "ERUPTION",
+    "EPIDEMIC", "OUTBREAK", "RIOT", "STAMPEDE", "BLACKOUT",
+})
+
+
+def _alt(words: Iterable[str]) -> str:
+    # longest first so e.g. KMS wins over KM
+    return "|".join(sorted(map(re.escape, words), key=len, reverse=True))
+
+
+# the original keywords keep their startswith matching ("HELPME", "SAFEHOME", even "SAFETY");
+# the aliases added since must be whole words, so "sosa" or "madadgar" stay GENERAL
+PREFIX_KEYWORDS = ("HELP", "SAFE")
+_PREFIX_END = "|".join(f"(?<={k})" for k in PREFIX_KEYWORDS)
+KEYWORD_RE = re.compile(rf"\s*({_alt(KEYWORDS)})(?:\b|{_PREFIX_END})\s*(?P<sep>[:\-])?\s*", re.IGNORECASE)
+
+
+def _radius(n: str = "") -> str:
+    return rf"(?:(?:radius|rad|r)\s*[:=]?\s*)?(?P<radius{n}>\d+(?:\.\d+)?)\s*(?P<unit{n}>{_alt(UNIT_M)})\b"
+
+
+_SEVERITY = rf"(?:(?:severity|sev)\s*[:=]?\s*)?(?P<severity>{_alt(SEVERITY_WORDS)})\b"
+_END = r"[\s.!]*$"
+_KNOWN_TYPE = _alt(DISASTER_TYPES).replace(r"\ ", r"[\s_-]+")  # GAS LEAK, GAS_LEAK, gas-leak
+TYPE_RE = re.compile(rf"(?P<known>{_KNOWN_TYPE})\b|(?P<other>[A-Z0-9_]+)\b", re.IGNORECASE)
+# what may sit between the type and the location
+LOCATION_INTRO_RE = re.compile(r"\s*(?:[,\-]\s*)?(?:(?:at|near|in)\b\s*|@\s*)?", re.IGNORECASE)
+# where the location ends: a radius, an explicit "severity X", or a bare severity word
+# closing the message (alone or before a radius) -- so "HIGH STREET" stays a location
+MARKER_RE = re.compile(
+    rf"(?<![^\s,])(?:{_radius()}|(?:severity|sev)\s*[:=]?\s*(?:{_alt(SEVERITY_WORDS)})\b"
+    rf"|(?:{_alt(SEVERITY_WORDS)})\b(?=[\s,]*(?:{_radius(2)})?{_END}))",
+    re.IGNORECASE,
+)
+RADIUS_RE = re.compile(rf"[\s,]*{_radius()}", re.IGNORECASE)
+SEVERITY_RE = re.compile(rf"[\s,]*{_SEVERITY}", re.IGNORECASE)
+# the strict original format, kept as the fast path
+STRICT_REPORT_RE = re.compile(
+    r"(?P<type>[A-Z0-9_]+)\s+at\s+(?P<location>.+?)\s+radius\s+(?P<radius>\d+(?:\.\d+)?)(?P<unit>km|m)\s+severity\s+(?P<severity>LOW|MEDIUM|HIGH)\s*",
+    re.IGNORECASE,
+)
+# "3 people", "2 adults 1 child", "5 log" (Hindi/Urdu: people)
+PEOPLE_RE = re.compile(
+    r"(\d{1,4})\s*(?:people|persons?|ppl|pax|adults?|children|child|kids?|members?|log|family|families)\b",
     re.IGNORECASE,
 )
 
+
 @dataclass
 class ParsedReport:
     type: str
-    location_text: str
-    radius_m: int
+    location_text: Optional[str]
+    radius_m: Optional[int]
     severity: SeverityEnum
 
 @dataclass
@@ -20,35 +92,95 @@ class ParsedInbound:
     kind: InboundKind
     report: Optional[ParsedReport] = None
     help_text: Optional[str] = None
+    people_count: Optional[int] = None
+
+
+def _report(type_: str, location: Optional[str], radius: Optional[str], unit: Optional[str],
+            severity: Optional[str]) -> ParsedReport:
+    return ParsedReport(
+        type=type_,
+        location_text=location,
+        radius_m=int(float(radius) * UNIT_M[unit.upper()]) if radius else None,
+        severity=SEVERITY_WORDS[severity.upper()] if severity else DEFAULT_SEVERITY,
+    )
+
+
+def _parse_report(body: str, explicit: bool = True) -> Optional[ParsedReport]:
+    """TYPE [at|@|near|in] LOCATION [radius] [severity], or None when the text doesn't
+    read as a report. Without `explicit` (the keyword had no colon) the type must be one of
+    DISASTER_TYPES, so "Report on the situation" stays a GENERAL message."""
+    m = STRICT_REPORT_RE.fullmatch(body)
+    if m:
+        gd = m.groupdict()
+        return _report(gd["type"].upper(), gd["location"].strip(), gd["radius"], gd["unit"], gd["severity"])
+
+    t = TYPE_RE.match(body)
+    if t is None or (t["known"] is None and not explicit):
+        return None
+    type_ = "_".join(t[0].upper().replace("-", " ").replace("_", " ").split())
+    intro = LOCATION_INTRO_RE.match(body, t.end())
+    rest = body[intro.end():]
+    marker = MARKER_RE.search(rest)
+    location = (rest[:marker.start()] if marker else rest).strip(" ,-.!") or None
+    if location and t["known"] is None and not intro[0].strip():
+        # an unknown word run straight into more words: is "SMOKE mill" a SMOKE at "mill"
+        # or the start of a longer type? Too ambiguous to alert on.
+        return None
+    radius = unit = severity = None
+    pos = marker.start() if marker else len(rest)
+    labelled = True
+    # radius and severity in either order, each at most once
+    while True:
+        if radius is None and (r := RADIUS_RE.match(rest, pos)):
+            radius, unit, pos = r["radius"], r["unit"], r.end()
+            labelled = not r[0].lstrip(" ,")[0].isdigit()
+        elif severity is None and (v := SEVERITY_RE.match(rest, pos)):
+            severity, pos = v["severity"], v.end()
+            labelled = v[0].strip(" ,").upper() not in SEVERITY_WORDS
+        else:
+            break
+    # text after "radius 5km severity HIGH" is ignored; after a bare "5 m" it means the
+    # number was probably part of the location ("sector 5 m block")
+    if rest[pos:].strip(" ,-.!") and (not labelled or (location, radius, severity) == (None, None, None)):
+        return None
+    return _report(type_, location, radius, unit, severity)
+
+
+def _people_count(text: str) -> Optional[int]:
+    counts = [int(n) for n in PEOPLE_RE.findall(text)]
+    return sum(counts) if counts else None
 
 
 def parse_inbound(text: str) -> ParsedInbound:
     original = text.strip()
-    upper = original.upper()
+    m = KEYWORD_RE.match(original)
+    if not m:
+        return ParsedInbound(kind=InboundKind.GENERAL)
+    kind = KEYWORDS[m.group(1).upper()]
+    rest = original[m.end():]
 
-    if upper.startswith("REPORT:"):
-        m = REPORT_REGEX.match(original)
-        if not m:
+    if kind == InboundKind.REPORT:
+        pr = _parse_report(rest, explicit=m["sep"] is not None)
+        if pr is None:
             # malformed report treated as GENERAL
             return ParsedInbound(kind=InboundKind.GENERAL)
-        gd = m.groupdict()
-        radius_val = float(gd["radius"])
-        unit = gd["unit"].lower()
-        radius_m = int(radius_val * 1000) if unit == "km" else int(radius_val)
-        sev = SeverityEnum(gd["severity"].upper())
-        pr = ParsedReport(
-            type=gd["type"].upper(),
-            location_text=gd["location"].strip(),
-            radius_m=radius_m,
-            severity=sev,
-        )
         return ParsedInbound(kind=InboundKind.REPORT, report=pr)
 
-    if upper.startswith("HELP"):
-        rest = original[4:].strip()
-        return ParsedInbound(kind=InboundKind.HELP, help_text=rest or None)
+    if kind == InboundKind.HELP:
+        return ParsedInbound(kind=InboundKind.HELP, help_text=rest or None,
+                             people_count=_people_count(rest) if rest else None)
+
+    return ParsedInbound(kind=kind)
 
-    if upper.startswith("SAFE"):
-        return ParsedInbound(kind=InboundKind.SAFE)
 
-    return ParsedInbound(kind=InboundKind.GENERAL)
+def parse_many(texts: Iterable[str]) -> list[ParsedInbound]:
+    """parse_inbound over a batch. Identical texts (retries, forwarded chains) are parsed
+    once and share one result object, so treat the results as read-only."""
+    seen: dict[str, ParsedInbound] = {}
+    out = []
+    for t in texts:
+        p = seen.get(t)
+        if p is None:
+            p = seen[t] = parse_inbound(t)
+        out.append(p)
+    return out
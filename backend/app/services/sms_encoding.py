@@ -0,0 +1,127 @@
+"""GSM 03.38 / UCS-2 aware sizing of outbound SMS bodies.
+
+A body made only of GSM-7 characters costs 160 septets in one SMS or 153 per part once it
+is split; a single character outside that alphabet switches the whole message to UCS-2 at
+70 / 67 UTF-16 units. Alert bodies are transliterated to GSM-7 where that loses nothing
+readable, and the free-text location is abbreviated or cut so the alert stays in budget.
+"""
+import re
+import unicodedata
+
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = frozenset("\f^{}\\[~]|€")  # escape + char: two septets each
+
+GSM7_SINGLE, GSM7_PART = 160, 153
+UCS2_SINGLE, UCS2_PART = 70, 67
+
+# punctuation and symbols phones like to autocorrect into, with their GSM-7 stand-ins
+TRANSLITERATIONS = {
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'", "`": "'",
+    "“": '"', "”": '"', "„": '"', "″": '"', "«": '"', "»": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-", "―": "-", "−": "-",
+    "…": "...", "\u00a0": " ", "\u2007": " ", "\u2009": " ", "\u202f": " ", "\t": " ",
+    "•": "*", "·": ".", "°": "o", "×": "x", "\u200b": "", "\ufeff": "",
+}
+
+# whole words only, applied to a location that would otherwise overflow its segment budget
+ABBREVIATIONS = [
+    (re.compile(rf"\b{word}\b", re.IGNORECASE), short) for word, short in (
+        ("DISTRICT", "DIST"), ("JUNCTION", "JN"), ("CROSSING", "XING"), ("HOSPITAL", "HOSP"),
+        ("VILLAGE", "VLG"), ("STATION", "STN"), ("AVENUE", "AVE"), ("SECTOR", "SEC"),
+        ("BRIDGE", "BR"), ("STREET", "ST"), ("MARKET", "MKT"), ("NATIONAL", "NATL"),
+        ("HIGHWAY", "HWY"), ("COLONY", "COL"), ("NAGAR", "NGR"), ("NORTH", "N"),
+        ("SOUTH", "S"), ("EAST", "E"), ("WEST", "W"), ("ROAD", "RD"), ("NEAR", "NR"),
+    )
+]
+
+
+def is_gsm7(text: str) -> bool:
+    return all(c in GSM7_BASIC or c in GSM7_EXTENDED for c in text)
+
+
+def transliterate(text: str) -> str:
+    """Best-effort GSM-7 version of `text`.
+
+    Typographic punctuation is mapped and accents that GSM-7 lacks are dropped (ê -> e).
+    If anything non-GSM is left (another script entirely), `text` is returned unchanged:
+    UCS-2 is then unavoidable and the original reads better.
+    """
+    if is_gsm7(text):
+        return text
+    out = []
+    for c in text:
+        if c in GSM7_BASIC or c in GSM7_EXTENDED:
+            out.append(c)
+        elif c in TRANSLITERATIONS:
+            out.append(TRANSLITERATIONS[c])
+        else:
+            base = "".join(b for b in unicodedata.normalize("NFKD", c) if not unicodedata.combining(b))
+            if not base or not is_gsm7(base):
+                return text
+            out.append(base)
+    return "".join(out)
+
+
+def _units(text: str, gsm: bool) -> list[int]:
+    # cost of each character: septets for GSM-7, UTF-16 code units for UCS-2
+    if gsm:
+        return [2 if c in GSM7_EXTENDED else 1 for c in text]
+    return [2 if ord(c) > 0xFFFF else 1 for c in text]
+
+
+def segments(text: str) -> int:
+    """Number of SMS parts `text` is sent as."""
+    gsm = is_gsm7(text)
+    units = _units(text, gsm)
+    single, part = (GSM7_SINGLE, GSM7_PART) if gsm else (UCS2_SINGLE, UCS2_PART)
+    if sum(units) <= single:
+        return 1
+    # an escape pair or surrogate pair is never split across parts
+    count, used = 1, 0
+    for u in units:
+        if used + u > part:
+            count, used = count + 1, 0
+        used += u
+    return count
+
+
+def capacity(n_segments: int, gsm: bool) -> int:
+    """Units (septets or UTF-16 units) that fit in `n_segments` parts."""
+    single, part = (GSM7_SINGLE, GSM7_PART) if gsm else (UCS2_SINGLE, UCS2_PART)
+    return single if n_segments <= 1 else part * n_segments
+
+
+def abbreviate(text: str) -> str:
+    for pattern, short in ABBREVIATIONS:
+        text = pattern.sub(short, text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def fit_message(prefix: str, middle: str, suffix: str, max_segments: int = 1, min_middle: int = 8) -> str:
+    """Join prefix + middle + suffix, shrinking only `middle` to stay within `max_segments`.
+
+    Everything is transliterated to GSM-7 when possible; then `middle` is abbreviated and,
+    if still too long, cut with "..". When not even `min_middle` characters of it would
+    fit, one more segment is allowed instead of reducing it to nothing.
+    """
+    prefix, middle, suffix = transliterate(prefix), transliterate(middle), transliterate(suffix)
+    text = prefix + middle + suffix
+    if segments(text) <= max_segments:
+        return text
+    middle = abbreviate(middle)
+    text = prefix + middle + suffix
+    if segments(text) <= max_segments:
+        return text
+    gsm = is_gsm7(text)
+    room = capacity(max_segments, gsm) - sum(_units(prefix + suffix, gsm)) - 2
+    if room < min_middle:
+        return fit_message(prefix, middle, suffix, max_segments + 1, min_middle)
+    units = _units(middle, gsm)
+    keep, used = 0, 0
+    while keep < len(middle) and used + units[keep] <= room:
+        used += units[keep]
+        keep += 1
+    return prefix + middle[:keep].rstrip() + ".." + suffix
@@ -1,21 +1,346 @@
+from sqlalchemy import select, insert, update, and_, or_, func, event
 from sqlalchemy.orm import Session
-from datetime import datetime
-from ..models.models import OutboundSMS, OutboundPurpose
+from datetime import datetime, timedelta
+from typing import Callable, Iterable
+from uuid import uuid4
+from ..core.config import get_settings
+from ..core.database import insert_ignore
+from .notify import outbound_queued
+from .message_templates import Rendered
+from .sms_encoding import segments
+from ..models.models import OutboundSMS, OutboundPurpose, UserAlertLog, DisasterReport, DisasterAlert, SeverityEnum
 
+# Stay well under SQLite's bound-parameter limit when expanding IN (...) lists.
+SQL_CHUNK = 500
+# Above this many recipients it is cheaper to load the disaster's whole alert log once.
+FULL_LOG_THRESHOLD = 500
 
-def queue_alert(db: Session, phone: str, body: str, purpose: OutboundPurpose, disaster_id: int | None = None):
-    sms = OutboundSMS(phone=phone, body=body, purpose=purpose, disaster_id=disaster_id)
-    db.add(sms)
-    return sms
 
+# Priority lanes (lower drains first). Replies to citizens who wrote in outrank broadcasts;
+# alerts are ordered by their disaster's severity.
+PURPOSE_PRIORITY = {OutboundPurpose.HELP_CONFIRM: 0, OutboundPurpose.ACK: 1, OutboundPurpose.INFO: 5}
+SEVERITY_PRIORITY = {SeverityEnum.HIGH: 2, SeverityEnum.MEDIUM: 3, SeverityEnum.LOW: 4}
+REPLY_LANE_MAX = 1
+# Relative share of each poll granted to a disaster's alerts, so a huge LOW alert can't starve others.
+SEVERITY_WEIGHT = {SeverityEnum.HIGH: 4, SeverityEnum.MEDIUM: 2, SeverityEnum.LOW: 1}
 
-def fetch_unsent(db: Session, limit: int = 50):
-    return db.query(OutboundSMS).filter(OutboundSMS.sent_at.is_(None)).order_by(OutboundSMS.id.asc()).limit(limit).all()
 
+def queue_priority(purpose: OutboundPurpose, severity: SeverityEnum | None = None) -> int:
+    if purpose == OutboundPurpose.ALERT:
+        return SEVERITY_PRIORITY.get(severity, SEVERITY_PRIORITY[SeverityEnum.MEDIUM])
+    return PURPOSE_PRIORITY[purpose]
+
+
+def _chunks(seq: list, size: int = SQL_CHUNK) -> Iterable[list]:
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_outbound(session: Session):
+    # wake long-polling gateways only once the new rows are visible to them
+    if session.info.pop("outbound_queued", False):
+        outbound_queued.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_outbound(session: Session):
+    session.info.pop("outbound_queued", None)
+
+
+def alerted_user_ids(db: Session, disaster_id: int, user_ids: list[int] | None = None) -> set[int]:
+    """Return ids already in UserAlertLog for a disaster (optionally restricted to user_ids)."""
+    q = select(UserAlertLog.user_id).where(UserAlertLog.disaster_id == disaster_id)
+    if user_ids is None or len(user_ids) > FULL_LOG_THRESHOLD:
+        return set(db.scalars(q))
+    found: set[int] = set()
+    for chunk in _chunks(user_ids):
+        found.update(db.scalars(q.where(UserAlertLog.user_id.in_(chunk))))
+    return found
+
+
+def fan_out_alerts(db: Session, disaster_id: int, recipients: list[tuple], body: str | Callable[[str | None], Rendered],
+                   purpose: OutboundPurpose = OutboundPurpose.ALERT, severity: SeverityEnum | None = None) -> list[int]:
+    """Bulk-queue `body` to every (user_id, phone[, lang]) not yet alerted for the disaster.
+
+    `body` is either the text itself, copied onto each row, or a per-language template
+    lookup (message_templates.alert_templates): rows then only reference the shared
+    template, rendered once per language. Users already in the alert log are skipped with
+    one set lookup; the log rows are then written with INSERT ... ON CONFLICT DO NOTHING
+    RETURNING, and outbound rows are queued only for the user ids that insert returned.
+    A concurrent fan-out (an approval job racing /move-user, or the same job resumed in
+    two workers) that logged a user first therefore wins, and the user is texted once.
+    Returns the newly alerted user ids.
+    """
+    if not recipients:
+        return []
+    already = alerted_user_ids(db, disaster_id, [r[0] for r in recipients])
+    fresh: dict[int, tuple[str, str | None]] = {}
+    for uid, phone, *lang in recipients:
+        if uid not in already and uid not in fresh:
+            fresh[uid] = (phone, lang[0] if lang else None)
+    if not fresh:
+        return []
 
-def mark_sent(db: Session, sms_ids: list[int]):
     now = datetime.utcnow()
-    updated = db.query(OutboundSMS).filter(OutboundSMS.id.in_(sms_ids)).all()
-    for sms in updated:
-        sms.sent_at = now
-    return len(updated)
+    priority = queue_priority(purpose, severity)
+    logged = set(db.scalars(
+        insert_ignore(db, UserAlertLog).returning(UserAlertLog.user_id),
+        [{"disaster_id": disaster_id, "user_id": uid, "first_sent_at": now} for uid in fresh],
+    ))
+    fresh = {uid: v for uid, v in fresh.items() if uid in logged}
+    if not fresh:
+        return []
+    common = {"purpose": purpose, "disaster_id": disaster_id, "priority": priority, "created_at": now}
+    if callable(body):
+        by_lang: dict[str | None, Rendered] = {}
+        rows = []
+        for phone, lang in fresh.values():
+            t = by_lang.get(lang) or by_lang.setdefault(lang, body(lang))
+            rows.append({"phone": phone, "inline_body": None, "template_id": t.id, "segments": t.segments, **common})
+    else:
+        parts = segments(body)
+        rows = [{"phone": phone, "inline_body": body, "segments": parts, **common} for phone, _ in fresh.values()]
+    db.execute(insert(OutboundSMS), rows)
+    db.info["outbound_queued"] = True
+    return list(fresh)
+
+
+def claimable(now: datetime):
+    """Filter for rows a gateway may claim: unsent, not given up, lease free or expired."""
+    return and_(
+        OutboundSMS.sent_at.is_(None),
+        OutboundSMS.failed_at.is_(None),
+        or_(OutboundSMS.lease_expires_at.is_(None), OutboundSMS.lease_expires_at < now),
+    )
+
+
+def _give_up(db: Session, now: datetime, ids: list[int]) -> int:
+    """Move rows among `ids` that have used all their attempts to the terminal failed state."""
+    return db.execute(
+        update(OutboundSMS)
+        .where(OutboundSMS.id.in_(ids), claimable(now), OutboundSMS.attempt_count >= get_settings().outbound_max_attempts)
+        .values(failed_at=now, claimed_by=None, claim_token=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _fair_shares(db: Session, room: int) -> list[tuple[int, int]]:
+    """Split `room` slots across active disasters in proportion to their severity weight."""
+    active = db.execute(
+        select(DisasterReport.id, DisasterReport.severity)
+        .join(DisasterAlert, DisasterAlert.disaster_id == DisasterReport.id)
+        .where(DisasterAlert.deactivated_at.is_(None))
+    ).all()
+    if not active:
+        return []
+    weights = [(did, SEVERITY_WEIGHT.get(sev, SEVERITY_WEIGHT[SeverityEnum.MEDIUM])) for did, sev in active]
+    total = sum(w for _, w in weights)
+    weights.sort(key=lambda dw: -dw[1])
+    return [(did, max(1, -(-room * w // total))) for did, w in weights]
+
+
+def _pick_ids(db: Session, now: datetime, limit: int) -> list[int]:
+    """Choose up to `limit` claimable ids: reply lanes strictly first, then a weighted
+    fair share per active disaster, then anything left in plain priority order."""
+    avail = claimable(now)
+
+    def ids(q):
+        return list(db.scalars(q.with_for_update(skip_locked=True)))
+
+    picked = ids(select(OutboundSMS.id).where(avail, OutboundSMS.priority <= REPLY_LANE_MAX)
+                 .order_by(OutboundSMS.priority, OutboundSMS.id).limit(limit))
+    room = limit - len(picked)
+    if room > 0:
+        for disaster_id, share in _fair_shares(db, room):
+            share = min(share, limit - len(picked))
+            if share <= 0:
+                break
+            picked += ids(select(OutboundSMS.id)
+                          .where(avail, OutboundSMS.disaster_id == disaster_id, OutboundSMS.priority > REPLY_LANE_MAX)
+                          .order_by(OutboundSMS.id).limit(share))
+    room = limit - len(picked)
+    if room > 0:
+        q = select(OutboundSMS.id).where(avail, OutboundSMS.priority > REPLY_LANE_MAX)
+        if picked:
+            q = q.where(OutboundSMS.id.not_in(picked))
+        picked += ids(q.order_by(OutboundSMS.priority, OutboundSMS.id).limit(room))
+    return picked
+
+
+def _within_segments(db: Session, ids: list[int], max_segments: int) -> list[int]:
+    """Longest prefix of `ids` whose SMS parts add up to at most `max_segments` (min. one row)."""
+    parts = dict(db.execute(select(OutboundSMS.id, OutboundSMS.segments).where(OutboundSMS.id.in_(ids))).all())
+    kept, total = [], 0
+    for i in ids:
+        total += parts.get(i, 1)
+        if kept and total > max_segments:
+            break
+        kept.append(i)
+    return kept
+
+
+def claim_batch(db: Session, gateway_id: str, limit: int = 50, lease_seconds: int | None = None,
+                max_segments: int | None = None, claim_token: str | None = None) -> list[OutboundSMS]:
+    """Atomically lease up to `limit` unsent rows to one gateway.
+
+    The UPDATE re-checks claimability, so rows grabbed by a concurrent gateway between
+    the SELECT and the UPDATE are simply skipped; the random claim token identifies
+    exactly the rows this call won. Each claim counts as one delivery attempt; a row
+    reached again with no attempts left (its last lease expired unsent) is given up here
+    instead, so the queue's head never fills with rows nobody may send.
+    `max_segments` additionally caps the batch by SMS parts, for gateways whose carrier
+    rate limit counts parts rather than messages. A gateway may pick the `claim_token`
+    itself (see resume_claims); rows it already holds under that token are returned too.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=lease_seconds if lease_seconds is not None else get_settings().outbound_lease_seconds)
+    ids = _pick_ids(db, now, limit)
+    while ids and _give_up(db, now, ids):
+        ids = _pick_ids(db, now, limit)
+    if ids and max_segments is not None:
+        ids = _within_segments(db, ids, max_segments)
+    if not ids:
+        return []
+    token = claim_token or uuid4().hex
+    db.execute(
+        update(OutboundSMS)
+        .where(OutboundSMS.id.in_(ids), claimable(now), OutboundSMS.attempt_count < get_settings().outbound_max_attempts)
+        .values(claimed_by=gateway_id, claim_token=token, lease_expires_at=now + lease,
+                attempt_count=OutboundSMS.attempt_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return (
+        db.query(OutboundSMS).filter(OutboundSMS.claim_token == token, OutboundSMS.claimed_by == gateway_id)
+        .order_by(OutboundSMS.priority.asc(), OutboundSMS.id.asc()).all()
+    )
+
+
+def resume_claims(db: Session, gateway_id: str, claim_token: str, since_id: int | None = None,
+                  limit: int = 50, lease_seconds: int | None = None) -> list[OutboundSMS]:
+    """Rows still leased to `gateway_id` under `claim_token`, above the `since_id` cursor.
+
+    The gateway picks a fresh token per poll and repeats it until a response arrives, so
+    these are rows from a claim whose response never did (e.g. a dropped 2G link); they
+    are handed out again with a renewed lease instead of waiting for it to expire. Keyed
+    on the token, not the gateway's name, so two phones that share a name never get each
+    other's live leases.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=lease_seconds if lease_seconds is not None else get_settings().outbound_lease_seconds)
+    rows = (
+        db.query(OutboundSMS)
+        .filter(OutboundSMS.claim_token == claim_token, OutboundSMS.claimed_by == gateway_id,
+                OutboundSMS.id > (since_id or 0), OutboundSMS.sent_at.is_(None),
+                OutboundSMS.failed_at.is_(None), OutboundSMS.lease_expires_at >= now)
+        .order_by(OutboundSMS.priority.asc(), OutboundSMS.id.asc()).limit(limit).all()
+    )
+    if rows:
+        db.execute(
+            update(OutboundSMS).where(OutboundSMS.id.in_([m.id for m in rows]))
+            .values(lease_expires_at=now + lease).execution_options(synchronize_session=False)
+        )
+    return rows
+
+
+def compact_outbound(msgs, since_id: int | None = None) -> dict:
+    """Wire-compact form of a claimed batch: one entry per distinct (body, purpose,
+    disaster, claim) with parallel id / phone lists, so a broadcast carries its text once."""
+    groups: dict[tuple, dict] = {}
+    for m in msgs:
+        key = (m.body, m.purpose, m.disaster_id, m.claim_token)
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {"body": m.body, "purpose": OutboundPurpose(m.purpose).value, "disaster_id": m.disaster_id,
+                               "segments": m.segments, "claim_token": m.claim_token, "ids": [], "phones": []}
+        g["ids"].append(m.id)
+        g["phones"].append(m.phone)
+    return {
+        "count": len(msgs),
+        "next_since_id": max([m.id for m in msgs] + [since_id or 0]),
+        "templates": list(groups.values()),
+    }
+
+
+def mark_sent(db: Session, sms_ids: list[int]) -> int:
+    """Mark rows sent with one UPDATE per chunk of ids; re-acks keep the first sent_at."""
+    now = datetime.utcnow()
+    updated = 0
+    for chunk in _chunks(sorted(set(sms_ids))):
+        updated += db.execute(
+            update(OutboundSMS).where(OutboundSMS.id.in_(chunk))
+            .values(sent_at=func.coalesce(OutboundSMS.sent_at, now))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return updated
+
+
+def mark_delivered(db: Session, sms_ids: list[int]) -> int:
+    now = datetime.utcnow()
+    updated = 0
+    for chunk in _chunks(sorted(set(sms_ids))):
+        updated += db.execute(
+            update(OutboundSMS).where(OutboundSMS.id.in_(chunk))
+            .values(sent_at=func.coalesce(OutboundSMS.sent_at, now), delivered_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return updated
+
+
+def retry_backoff_s(attempt_count: int) -> int:
+    settings = get_settings()
+    return min(settings.outbound_retry_base_seconds * 2 ** max(attempt_count - 1, 0), settings.outbound_retry_max_seconds)
+
+
+def mark_failed(db: Session, reports) -> int:
+    """Requeue rows from failed status reports (objects with id, error and optionally the
+    reporting gateway_id / claim_token).
+
+    The lease is reused as a not-before time, so a row becomes claimable again only after
+    an exponential backoff based on its attempt_count; a row that has used all its attempts
+    is given up (failed_at) instead. Only rows still unsent are touched, and when the report
+    names its gateway or claim, only while that claim still holds the row: a failure
+    reported after a delivery, or by a gateway whose lease has since passed to another,
+    is ignored.
+    """
+    now = datetime.utcnow()
+    max_attempts = get_settings().outbound_max_attempts
+    by_id = {r.id: r for r in reports}
+    groups: dict[tuple, list[int]] = {}
+    for chunk in _chunks(sorted(by_id)):
+        for sms_id, attempts in db.execute(select(OutboundSMS.id, OutboundSMS.attempt_count).where(OutboundSMS.id.in_(chunk))):
+            r = by_id[sms_id]
+            backoff = None if attempts >= max_attempts else retry_backoff_s(attempts)
+            key = (backoff, r.error, getattr(r, "gateway_id", None), getattr(r, "claim_token", None))
+            groups.setdefault(key, []).append(sms_id)
+    updated = 0
+    for (backoff, error, gateway_id, claim_token), ids in groups.items():
+        values = {"claimed_by": None, "claim_token": None, "last_error": error[:255] if error else None}
+        if backoff is None:
+            values.update(failed_at=now, lease_expires_at=None)
+        else:
+            values["lease_expires_at"] = now + timedelta(seconds=backoff)
+        guard = [OutboundSMS.sent_at.is_(None), OutboundSMS.delivered_at.is_(None), OutboundSMS.failed_at.is_(None)]
+        if gateway_id is not None:
+            guard.append(OutboundSMS.claimed_by == gateway_id)
+        if claim_token is not None:
+            guard.append(OutboundSMS.claim_token == claim_token)
+        for chunk in _chunks(ids):
+            updated += db.execute(
+                update(OutboundSMS).where(OutboundSMS.id.in_(chunk), *guard).values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+    return updated
+
+
+def record_delivery(db: Session, reports) -> dict[str, int]:
+    """Apply a bulk batch of gateway status reports (objects with id, status, error and
+    optionally gateway_id / claim_token, see mark_failed)."""
+    by_status: dict[str, dict[int, object]] = {"sent": {}, "delivered": {}, "failed": {}}
+    for r in reports:
+        by_status[r.status][r.id] = r
+    return {
+        "sent": mark_sent(db, list(by_status["sent"])) if by_status["sent"] else 0,
+        "delivered": mark_delivered(db, list(by_status["delivered"])) if by_status["delivered"] else 0,
+        "failed": mark_failed(db, list(by_status["failed"].values())) if by_status["failed"] else 0,
+    }
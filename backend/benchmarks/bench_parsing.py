@@ -0,0 +1,74 @@
+"""Parser micro-benchmark.
+
+Parses a synthetic mix of inbound SMS (strict and fuzzy REPORTs, HELP/SOS/MADAD with head
+counts, SAFE, chatter) and prints messages/sec. The headline is parse_inbound over texts
+that are all distinct, i.e. the parser's own cost. parse_many is then timed on a batch
+where only a `--unique` fraction of texts are distinct, which mostly measures its
+duplicate sharing.
+
+Usage (from the repo root):
+  python -m backend.benchmarks.bench_parsing --n 200000 --unique 0.5
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+
+from backend.app.services.parsing import parse_inbound, parse_many
+
+TEMPLATES = [
+    "REPORT: FLOOD at MARKET STREET {i} radius 5km severity HIGH",
+    "report fire at sector {i} radius 2 KM",
+    "RPT landslide near km {i} marker sev: critical r=500m",
+    "REPORT: CYCLONE @ ward {i}, 10 kms, severe",
+    "HELP {i} people trapped on roof",
+    "sos 2 adults {i} children",
+    "MADAD {i} log",
+    "SAFE",
+    "surakshit hai",
+    "where is the relief camp {i}?",
+]
+
+
+def messages(n: int, unique: float, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    pool = max(1, int(n * unique))
+    base = [rnd.choice(TEMPLATES).format(i=rnd.randrange(pool)) for _ in range(pool)]
+    return [base[rnd.randrange(pool)] for _ in range(n)]
+
+
+def distinct_messages(n: int, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    # templates without a placeholder ("SAFE") collapse to one text each
+    return list(dict.fromkeys(rnd.choice(TEMPLATES).format(i=i) for i in range(n)))
+
+
+def bench(n: int, unique: float, repeat: int = 3) -> dict:
+    distinct = distinct_messages(n)
+    texts = messages(n, unique)
+    best_many = best_single = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for t in distinct:
+            parse_inbound(t)
+        best_single = min(best_single, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        parse_many(texts)
+        best_many = min(best_many, time.perf_counter() - t0)
+    return {"n": n, "unique": unique, "distinct_n": len(distinct),
+            "parse_inbound_msgs_per_s": len(distinct) / best_single, "parse_many_msgs_per_s": n / best_many}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--unique", type=float, default=0.5, help="fraction of distinct texts in the batch")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    r = bench(args.n, args.unique, args.repeat)
+    print(f"parse_inbound: {r['parse_inbound_msgs_per_s']:,.0f} msg/s over {r['distinct_n']} distinct msgs")
+    print(f"parse_many: {r['parse_many_msgs_per_s']:,.0f} msg/s over {r['n']} msgs, {r['unique']:.0%} unique")
+
+
+if __name__ == "__main__":
+    main()
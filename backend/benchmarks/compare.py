@@ -0,0 +1,52 @@
+"""Compare two benchmark result files written by run.py.
+
+Usage:
+  python -m backend.benchmarks.compare backend/benchmarks/results/abc1234.json backend/benchmarks/results/def5678.json
+
+Prints per-scenario deltas (new vs. base) and exits 1 when any throughput dropped, or any
+p99 grew, by more than --threshold (default 20%).
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+
+
+def compare(base: dict, new: dict, threshold: float) -> tuple[list[str], bool]:
+    lines, regressed = [], False
+    for name in sorted(set(base["results"]) & set(new["results"])):
+        b, n = base["results"][name], new["results"][name]
+        cells = [f"{name:<20}"]
+        for key, higher_is_better in (("rows_per_s", True), ("p99_ms", False)):
+            if not b.get(key) or n.get(key) is None:
+                cells.append(" " * 30)
+                continue
+            change = (n[key] - b[key]) / b[key]
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else "  "
+            regressed |= worse > threshold
+            cells.append(f"{key} {b[key]:>11,.1f} -> {n[key]:>11,.1f} {change:+7.1%}{flag}")
+        lines.append("  ".join(cells))
+    return lines, regressed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("base")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"base {base['commit']} ({base['timestamp']})  vs  new {new['commit']} ({new['timestamp']})")
+    if base.get("params") != new.get("params"):
+        print("warning: runs used different parameters", file=sys.stderr)
+    lines, regressed = compare(base, new, args.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Backend benchmark suite (offline, SQLite).
+
+Seeds synthetic users into a fresh database, then measures approval fan-out, /move-user,
+/receive-sms, gateway polling + mark-sent and the parser. Latencies are reported as p50/p99
+per call and throughput as rows (or messages) per second. Results go to
+backend/benchmarks/results/<commit>.json; compare two runs with compare.py.
+
+Usage (from the repo root):
+  python -m backend.benchmarks.run --users 100000
+  python -m backend.benchmarks.run --users 10000 --only ingest,gateway
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+SCENARIOS = ("fanout", "move", "ingest", "gateway", "parse")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(samples: list[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def summarize(latencies_s: list[float], rows: int, wall_s: float) -> dict:
+    return {
+        "calls": len(latencies_s),
+        "rows": rows,
+        "p50_ms": round(percentile(latencies_s, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies_s, 0.99) * 1000, 3),
+        "rows_per_s": round(rows / wall_s, 1) if wall_s > 0 else None,
+        "wall_s": round(wall_s, 3),
+    }
+
+
+def timed_calls(fn, args_list) -> tuple[list[float], float]:
+    lat = []
+    t0 = time.perf_counter()
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        lat.append(time.perf_counter() - t)
+    return lat, time.perf_counter() - t0
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    # the app reads DATABASE_URL at import time, so point it at a scratch DB first
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="disaster-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from fastapi.testclient import TestClient
+    from backend.app.main import app
+    from backend.app.core.database import SessionLocal
+    from backend.benchmarks.seed import CENTER, random_points, seed_users
+    from backend.benchmarks.bench_parsing import bench as bench_parsing
+
+    client = TestClient(app)
+    only = set(args.only.split(",")) if args.only else set(SCENARIOS)
+    results: dict[str, dict] = {}
+
+    db = SessionLocal()
+    t0 = time.perf_counter()
+    seed_users(db, args.users)
+    db.close()
+    results["seed_users"] = summarize([time.perf_counter() - t0], args.users, time.perf_counter() - t0)
+    print(f"seeded {args.users} users in {results['seed_users']['wall_s']}s", file=sys.stderr)
+
+    def report(msg: str, phone: str) -> int:
+        return client.post("/receive-sms", json={"from": phone, "message": msg}).json()["report_id"]
+
+    if "fanout" in only:
+        rid = report(f"REPORT: FLOOD at BENCH CENTER radius {args.radius_km}km severity HIGH", "+1000000001")
+        t0 = time.perf_counter()
+        client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": CENTER[0], "lng": CENTER[1]})
+        wall = time.perf_counter() - t0  # TestClient returns after the background fan-out job
+        job = client.get(f"/disasters/{rid}/fanout").json()
+        results["fanout"] = {**summarize([wall], job["alerts_queued"], wall), "users_scanned": job["users_scanned"]}
+
+    if "move" in only:
+        pts = random_points(args.calls)
+        lat, wall = timed_calls(lambda i, p: client.post("/move-user", json={"phone": f"+92{i:09d}", "lat": p[0], "lng": p[1]}),
+                                list(enumerate(pts)))
+        results["move_user"] = summarize(lat, len(pts), wall)
+        batch = [{"phone": f"+93{i:09d}", "lat": p[0], "lng": p[1]} for i, p in enumerate(random_points(args.batch, seed=12))]
+        t0 = time.perf_counter()
+        client.post("/move-users/batch", json=batch)
+        wall = time.perf_counter() - t0
+        results["move_users_batch"] = summarize([wall], len(batch), wall)
+
+    if "ingest" in only:
+        msgs = [(f"HELP {i % 7 + 1} people trapped", f"+94{i:09d}") for i in range(args.calls)]
+        lat, wall = timed_calls(lambda m, p: client.post("/receive-sms", json={"from": p, "message": m}), msgs)
+        results["receive_sms"] = summarize(lat, len(msgs), wall)
+        batch = [{"from": f"+95{i:09d}", "message": f"REPORT: FIRE at SECTOR {i % 50} radius 1km", "gateway_msg_id": f"b{i}"}
+                 for i in range(args.batch)]
+        t0 = time.perf_counter()
+        client.post("/receive-sms/batch", json=batch)
+        wall = time.perf_counter() - t0
+        results["receive_sms_batch"] = summarize([wall], len(batch), wall)
+
+    if "gateway" in only:
+        poll_lat, mark_lat, rows = [], [], 0
+        t0 = time.perf_counter()
+        while rows < args.gateway_rows:
+            t = time.perf_counter()
+            msgs = client.get("/gateway/outbound", params={"limit": args.poll_limit, "gateway_id": "bench"}).json()
+            poll_lat.append(time.perf_counter() - t)
+            if not msgs:
+                break
+            t = time.perf_counter()
+            client.post("/gateway/mark-sent", json=[m["id"] for m in msgs])
+            mark_lat.append(time.perf_counter() - t)
+            rows += len(msgs)
+        wall = time.perf_counter() - t0
+        if poll_lat:
+            results["gateway_poll"] = summarize(poll_lat, rows, wall)
+        if mark_lat:
+            results["gateway_mark_sent"] = summarize(mark_lat, rows, wall)
+
+    if "parse" in only:
+        r = bench_parsing(args.parse_n, 0.5, repeat=1)
+        results["parse_inbound"] = {"rows": r["distinct_n"], "rows_per_s": round(r["parse_inbound_msgs_per_s"], 1)}
+        results["parse_many"] = {"rows": r["n"], "unique": r["unique"], "rows_per_s": round(r["parse_many_msgs_per_s"], 1)}
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "db")},
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=10_000)
+    ap.add_argument("--radius-km", type=int, default=20, help="approval radius; the user box is ~110 km wide")
+    ap.add_argument("--calls", type=int, default=500, help="requests per single-call scenario")
+    ap.add_argument("--batch", type=int, default=5_000, help="items per batch-endpoint call")
+    ap.add_argument("--gateway-rows", type=int, default=20_000)
+    ap.add_argument("--poll-limit", type=int, default=100)
+    ap.add_argument("--parse-n", type=int, default=100_000)
+    ap.add_argument("--only", help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    ap.add_argument("--db", help="SQLite file to use (default: fresh temp file)")
+    ap.add_argument("--out", help="result file (default: results/<commit>.json)")
+    args = ap.parse_args()
+
+    doc = run(args)
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{doc['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2))
+    for name, r in doc["results"].items():
+        lat = f"p50 {r['p50_ms']:>9.3f} ms  p99 {r['p99_ms']:>9.3f} ms" if "p50_ms" in r else " " * 36
+        print(f"{name:<20} {lat}  {r['rows_per_s'] or 0:>12,.0f} rows/s")
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
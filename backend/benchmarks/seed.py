@@ -0,0 +1,35 @@
+"""Synthetic data for the benchmarks: users around a center point and reports to approve."""
+from __future__ import annotations
+import random
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend.app.models.models import User
+from backend.app.services.geofence import cell_id
+
+CENTER = (12.97, 77.59)
+SPREAD_DEG = 0.5  # users are uniform in a ±SPREAD_DEG box around CENTER
+
+
+def seed_users(db: Session, n: int, seed: int = 7, chunk: int = 50_000, prefix: str = "+9100") -> int:
+    """Bulk-insert n users with positions and geo cells; returns n."""
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    for start in range(0, n, chunk):
+        rows = []
+        for i in range(start, min(start + chunk, n)):
+            lat = CENTER[0] + rnd.uniform(-SPREAD_DEG, SPREAD_DEG)
+            lng = CENTER[1] + rnd.uniform(-SPREAD_DEG, SPREAD_DEG)
+            rows.append({"phone": f"{prefix}{i:08d}", "last_lat": lat, "last_lng": lng,
+                         "geo_cell": cell_id(lat, lng), "updated_at": now})
+        db.execute(insert(User), rows)
+        db.commit()
+    return n
+
+
+def random_points(n: int, seed: int = 11) -> list[tuple[float, float]]:
+    rnd = random.Random(seed)
+    return [(CENTER[0] + rnd.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER[1] + rnd.uniform(-SPREAD_DEG, SPREAD_DEG))
+            for _ in range(n)]
@@ -3,54 +3,58 @@ Polls backend outbound queue and 'sends' SMS by printing them.
 Marks them sent via /gateway/mark-sent.
 
 Usage:
-  python gateway_simulator.py --base-url http://localhost:8000 --interval 5
+  python gateway_simulator.py --base-url http://localhost:8000 --wait 30
 
 Stop with Ctrl+C.
 """
 from __future__ import annotations
+import os
+import sys
 import time
 import argparse
+import uuid
 import requests
-from typing import List
 
-
-def fetch_outbound(base_url: str, limit: int = 20):
-    r = requests.get(f"{base_url}/gateway/outbound", params={"limit": limit}, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-def mark_sent(base_url: str, ids: List[int]):
-    r = requests.post(f"{base_url}/gateway/mark-sent", json=ids, timeout=10)
-    r.raise_for_status()
-    return r.json()
+# the gateway client lives with the phone scripts so it can be copied onto the device as-is
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "android"))
+from gateway_client import GatewayClient  # noqa: E402
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--base-url", default="http://localhost:8000")
-    ap.add_argument("--interval", type=int, default=5, help="Polling interval seconds")
+    ap.add_argument("--interval", type=int, default=5, help="Pause after an error, or between polls when --wait is 0")
+    ap.add_argument("--wait", type=int, default=30, help="Long-poll seconds; 0 = plain fixed-interval polling")
     ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--gateway-id", default=f"simulator-{uuid.uuid4().hex[:8]}", help="Unique per running simulator")
     args = ap.parse_args()
 
-    print(f"[SIM] Starting gateway simulator polling {args.base_url} every {args.interval}s")
+    client = GatewayClient(args.base_url)
+    since_id = None
+    print(f"[SIM] Starting gateway simulator polling {args.base_url} (long-poll {args.wait}s)")
     try:
         while True:
             try:
-                msgs = fetch_outbound(args.base_url, args.limit)
+                msgs = client.fetch_outbound(args.limit, args.gateway_id, args.wait, since_id=since_id, compact=True)
+                since_id = max([m["id"] for m in msgs] + [since_id or 0]) if msgs else since_id
                 if msgs:
                     print(f"[SIM] Found {len(msgs)} outbound messages")
                     to_mark = []
                     for m in msgs:
                         print(f"[SEND] -> {m['phone']}: {m['body']}")
                         to_mark.append(m['id'])
-                    res = mark_sent(args.base_url, to_mark)
+                    res = client.mark_sent(to_mark)
                     print(f"[SIM] Marked sent: {res}")
                 else:
                     print("[SIM] No messages.")
+                if args.wait <= 0:
+                    time.sleep(args.interval)
             except requests.RequestException as e:
                 print(f"[ERR] Request failed: {e}")
-            time.sleep(args.interval)
+                time.sleep(args.interval)
     except KeyboardInterrupt:
         print("[SIM] Stopped.")
+    finally:
+        client.close()
 
 if __name__ == "__main__":
     main()
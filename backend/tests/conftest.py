@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Run the suite against a throwaway SQLite file instead of ./disaster.db, so tests
+# neither depend on nor pollute a local database (old schemas are covered by
+# test_database's upgrade_schema test).
+os.environ.setdefault(
+    "DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="disaster-tests-"), "test.db"),
+)
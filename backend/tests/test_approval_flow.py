@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 from backend.app.main import app
+from backend.app.core.database import SessionLocal
 
 client = TestClient(app)
 
@@ -18,8 +19,187 @@ def test_report_and_approve_flow():
     assert approve.status_code == 200
 
     # Outbound messages should exist
-    outbound = client.get("/gateway/outbound")
+    outbound = client.get("/gateway/outbound", params={"gateway_id": "flow-test"})
     assert outbound.status_code == 200
     data = outbound.json()
     assert len(data) >= 1
     assert any("ALERT:" in m["body"] for m in data)
+
+
+def test_late_entrant_alerted_once():
+    r = client.post("/receive-sms", json={"from": "+1002", "message": "REPORT: FIRE at HILL ROAD radius 1km severity HIGH"})
+    rid = r.json()["report_id"]
+    client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": 45.0, "lng": 45.0})
+
+    first = client.post("/move-user", json={"phone": "+2002", "lat": 45.001, "lng": 45.0})
+    assert first.json()["new_alerts"] == 1
+    again = client.post("/move-user", json={"phone": "+2002", "lat": 45.002, "lng": 45.0})
+    assert again.json()["new_alerts"] == 0
+    outside = client.post("/move-user", json={"phone": "+2003", "lat": 46.0, "lng": 45.0})
+    assert outside.json()["new_alerts"] == 0
+
+
+def test_report_without_radius_needs_one_to_approve():
+    rid = client.post("/receive-sms", json={"from": "+1012", "message": "REPORT: FLOOD at HIGH STREET"}).json()["report_id"]
+    refused = client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": 41.0, "lng": 41.0})
+    assert refused.status_code == 400
+    assert client.post(f"/ui/approve/{rid}", data={"lat": "41.0", "lng": "41.0"}).status_code == 400
+    assert rid in {r["id"] for r in client.get("/disasters/pending").json()}
+
+    approved = client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": 41.0, "lng": 41.0, "radius_m": 500})
+    assert "fanout_job_id" in approved.json()
+    assert client.post("/move-user", json={"phone": "+2012", "lat": 41.001, "lng": 41.0}).json()["new_alerts"] == 1
+
+
+def test_fan_out_alerts_is_idempotent():
+    from backend.app.models.models import User, OutboundSMS, DisasterReport, ReportStatus
+    from backend.app.services.sms_gateway import fan_out_alerts
+
+    db = SessionLocal()
+    try:
+        dr = DisasterReport(raw_text="x", status=ReportStatus.approved)
+        users = [User(phone=f"+30{i:02d}") for i in range(3)]
+        db.add_all([dr, *users])
+        db.flush()
+        recipients = [(u.id, u.phone) for u in users]
+        assert sorted(fan_out_alerts(db, dr.id, recipients[:2], "hi")) == sorted(u.id for u in users[:2])
+        assert fan_out_alerts(db, dr.id, recipients + recipients, "hi") == [users[2].id]
+        assert fan_out_alerts(db, dr.id, recipients, "hi") == []
+        assert db.query(OutboundSMS).filter_by(disaster_id=dr.id).count() == 3
+    finally:
+        db.rollback()
+        db.close()
+
+
+
+def test_concurrent_fan_outs_alert_each_user_once(monkeypatch):
+    import threading
+    from backend.app.models.models import User, OutboundSMS, DisasterReport, ReportStatus, UserAlertLog
+    from backend.app.services import sms_gateway
+
+    db = SessionLocal()
+    dr = DisasterReport(raw_text="x", status=ReportStatus.approved)
+    users = [User(phone=f"+31{i:02d}") for i in range(4)]
+    db.add_all([dr, *users])
+    db.commit()
+    disaster_id, recipients = dr.id, [(u.id, u.phone) for u in users]
+    db.close()
+
+    # both fan-outs read the alert log before either has written to it
+    barrier = threading.Barrier(2)
+
+    def stale_log(*args):
+        barrier.wait(5)
+        return set()
+
+    monkeypatch.setattr(sms_gateway, "alerted_user_ids", stale_log)
+    won = []
+
+    def run():
+        s = SessionLocal()
+        try:
+            won.append(sms_gateway.fan_out_alerts(s, disaster_id, recipients, "hi"))
+            s.commit()
+        finally:
+            s.close()
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(map(sorted, won), key=len) == [[], [uid for uid, _ in recipients]]
+    db = SessionLocal()
+    try:
+        assert db.query(UserAlertLog).filter_by(disaster_id=disaster_id).count() == 4
+        assert db.query(OutboundSMS).filter_by(disaster_id=disaster_id).count() == 4
+    finally:
+        db.close()
+
+
+def test_smssync_form_inbound_creates_pending_report():
+    r = client.post("/receive-sms-smssync", data={"from": "+1003", "message": "REPORT: QUAKE at OLD TOWN radius 500m severity LOW"})
+    assert r.status_code == 200
+    rid = r.json()["report_id"]
+    assert any(p["id"] == rid for p in client.get("/disasters/pending").json())
+
+
+def test_move_user_uses_active_index_and_deactivation():
+    from array import array
+    from backend.app.services.active_index import active_disasters
+
+    rid = client.post("/receive-sms", json={"from": "+1004", "message": "REPORT: GAS at PLANT radius 1km severity HIGH"}).json()["report_id"]
+    client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": -45.0, "lng": -45.0})
+    assert client.post("/move-user", json={"phone": "+2004", "lat": -45.001, "lng": -45.0}).json()["new_alerts"] == 1
+
+    user_id = client.post("/users", json={"phone": "+2004"}).json()["id"]
+    db = SessionLocal()
+    try:
+        # the index, not the alert log, answers the repeat check
+        here = active_disasters.late_entrants(db, [user_id, user_id + 10_000], array("d", [-45.001] * 2), array("d", [-45.0] * 2))
+        assert [idx for d, idx in here if d.id == rid] == [[1]]
+        # an alert logged by another worker is picked up by the next refresh, which reads
+        # only alert-log rows past the watermark
+        from backend.app.models.models import UserAlertLog
+        db.add(UserAlertLog(disaster_id=rid, user_id=user_id + 10_000))
+        db.commit()
+        active_disasters.invalidate()
+        here = active_disasters.late_entrants(db, [user_id, user_id + 10_000], array("d", [-45.001] * 2), array("d", [-45.0] * 2))
+        assert [idx for d, idx in here if d.id == rid] == []
+        assert active_disasters._log_watermark == db.query(UserAlertLog.id).order_by(UserAlertLog.id.desc()).first()[0]
+    finally:
+        db.close()
+
+    assert client.post(f"/disasters/{rid}/deactivate").status_code == 200
+    assert client.post("/move-user", json={"phone": "+2005", "lat": -45.0, "lng": -45.0}).json()["new_alerts"] == 0
+    assert client.post(f"/disasters/{rid}/deactivate").status_code == 404
+
+
+def test_user_bitmap():
+    from backend.app.services.active_index import UserBitmap
+    bm = UserBitmap()
+    bm.update([0, 7, 8, 1_000_003])
+    assert all(i in bm for i in (0, 7, 8, 1_000_003))
+    assert not any(i in bm for i in (1, 9, 1_000_002, 5_000_000))
+
+
+def test_move_users_batch_and_stream():
+    import json
+    from backend.app.models.models import User
+
+    rid = client.post("/receive-sms", json={"from": "+1006", "message": "REPORT: FLOOD at DELTA radius 2km severity HIGH"}).json()["report_id"]
+    client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": 50.0, "lng": 50.0})
+    client.post("/users", json={"phone": "+2600", "last_lat": 0.0, "last_lng": 0.0})
+
+    moves = [
+        {"phone": "+2600", "lat": 50.001, "lng": 50.0},  # existing user walks in
+        {"phone": "+2601", "lat": 51.0, "lng": 51.0},    # new user, outside
+        {"phone": "+2602", "lat": 50.0, "lng": 50.0},    # new user, inside
+        {"phone": "+2602", "lat": 50.0, "lng": 50.001},  # repeat in the same batch
+    ]
+    r = client.post("/move-users/batch", json=moves).json()
+    assert r["moved"] == 4 and r["new_alerts"] == 2
+
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter_by(phone="+2600").one()
+        assert (u.last_lat, u.last_lng) == (50.001, 50.0) and u.geo_cell is not None
+        assert db.query(User).filter_by(phone="+2602").one().last_lng == 50.001
+    finally:
+        db.close()
+
+    # a GPS-only move keeps the tower a previous move stored
+    client.post("/move-users/batch", json=[{"phone": "+2604", "lat": 10.0, "lng": 10.0, "tower_id": "T-2604"}])
+    client.post("/move-users/batch", json=[{"phone": "+2604", "lat": 10.01, "lng": 10.0}, {"phone": "+2605", "lat": 10.0, "lng": 10.0}])
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter_by(phone="+2604").one()
+        assert (u.last_lat, u.last_tower) == (10.01, "T-2604")
+        assert db.query(User).filter_by(phone="+2605").one().last_tower is None
+    finally:
+        db.close()
+
+    ndjson = "\n".join(json.dumps(m) for m in moves + [{"phone": "+2603", "lat": 50.0, "lng": 49.999}])
+    r = client.post("/move-users/stream", content=ndjson, headers={"Content-Type": "application/x-ndjson"}).json()
+    assert r["moved"] == 5 and r["new_alerts"] == 1
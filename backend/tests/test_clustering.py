@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.core.config import get_settings
+from backend.app.core.database import SessionLocal
+from backend.app.models.models import DisasterReport, OutboundSMS, ReportStatus
+from backend.app.services.clustering import location_tokens, similarity
+
+client = TestClient(app)
+
+
+def _report(phone, msg):
+    return client.post("/receive-sms", json={"from": phone, "message": msg}).json()["report_id"]
+
+
+def test_location_similarity():
+    a = location_tokens("Zebra Market Street")
+    assert a == location_tokens("the ZEBRA MARKET ST") == location_tokens("zebra mkt street")
+    assert similarity(a, location_tokens("ZEBRA MARKET")) >= 0.5
+    assert similarity(a, location_tokens("AIRPORT ROAD")) == 0
+
+
+def test_duplicate_reports_cluster_and_approve_once():
+    client.post("/users", json={"phone": "+2180", "last_lat": 33.0, "last_lng": 33.0})
+    rep = _report("+1180", "REPORT: FLOOD at ZEBRA MARKET STREET radius 2km severity HIGH")
+    dup1 = _report("+1181", "report flooding at the zebra market st radius 2 km")
+    dup2 = _report("+1182", "REPORT: FLOOD at ZEBRA MKT STREET 1km high")
+    other_type = _report("+1183", "REPORT: FIRE at ZEBRA MARKET STREET radius 1km severity LOW")
+    other_place = _report("+1184", "REPORT: FLOOD at YAK AIRPORT radius 1km severity LOW")
+
+    pending = {r["id"]: r for r in client.get("/disasters/pending").json()}
+    assert pending[rep]["report_count"] == 3
+    assert dup1 not in pending and dup2 not in pending
+    assert pending[other_type]["report_count"] == 1 and pending[other_place]["report_count"] == 1
+    assert "ZEBRA MARKET STREET" in client.get("/ui/pending").text
+
+    r = client.post(f"/disasters/{rep}/verify", json={"approve": True, "lat": 33.0, "lng": 33.0}).json()
+    assert r["merged_reports"] == 2
+    db = SessionLocal()
+    try:
+        assert {db.get(DisasterReport, i).status for i in (dup1, dup2)} == {ReportStatus.merged}
+        assert db.query(OutboundSMS).filter_by(phone="+2180").count() == 1
+    finally:
+        db.close()
+
+    # cluster closed: a late duplicate starts a new one instead of joining a verified report
+    late = _report("+1185", "REPORT: FLOOD at ZEBRA MARKET STREET radius 2km severity HIGH")
+    pending = {r["id"]: r for r in client.get("/disasters/pending").json()}
+    assert pending[late]["report_count"] == 1 and pending[late]["cluster_id"] is None
+
+    # rejecting a member rejects the whole cluster
+    again = _report("+1186", "REPORT: FLOOD at ZEBRA MARKET radius 2km")
+    assert client.post(f"/disasters/{again}/verify", json={"approve": False}).json()["merged_reports"] == 1
+    pending = {r["id"] for r in client.get("/disasters/pending").json()}
+    assert late not in pending and again not in pending
+
+
+def test_cluster_window(monkeypatch):
+    monkeypatch.setattr(get_settings(), "cluster_window_s", 0)
+    a = _report("+1190", "REPORT: STORM at QUAIL BAY radius 1km")
+    b = _report("+1191", "REPORT: STORM at QUAIL BAY radius 1km")
+    pending = {r["id"] for r in client.get("/disasters/pending").json()}
+    assert {a, b} <= pending
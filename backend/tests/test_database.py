@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from backend.app.core.database import SessionLocal, ReadSessionLocal, engine, insert_returning_ids
+from backend.app.models.migrations import upgrade_schema
+from backend.app.models.models import User
+from backend.app.services.geofence import cell_id
+
+
+def test_sqlite_tuned_profile_pragmas():
+    db = SessionLocal()
+    try:
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert db.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    finally:
+        db.close()
+
+
+def test_read_session_sees_commits_but_cannot_write():
+    db, ro = SessionLocal(), ReadSessionLocal()
+    try:
+        db.execute(text("INSERT INTO users (phone, updated_at) VALUES ('+60000', CURRENT_TIMESTAMP)"))
+        db.commit()
+        assert ro.execute(text("SELECT count(*) FROM users WHERE phone = '+60000'")).scalar() == 1
+        with pytest.raises(OperationalError):
+            ro.execute(text("DELETE FROM users"))
+    finally:
+        ro.rollback()
+        ro.close()
+        db.close()
+
+
+def test_insert_returning_ids_is_one_statement_in_row_order():
+    rows = [{"phone": f"+6100{i:04d}"} for i in range(1500)]
+    statements = []
+    listener = lambda *a: statements.append(a[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    db = SessionLocal()
+    try:
+        ids = insert_returning_ids(db, User, rows)
+        db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    try:
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        assert len(inserts) <= 2  # batched by insertmanyvalues page size, not one per row
+        by_id = dict(db.query(User.id, User.phone).filter(User.id.in_(ids)).all())
+        assert [by_id[i] for i in ids] == [r["phone"] for r in rows]
+    finally:
+        db.close()
+
+
+def test_upgrade_schema_adds_columns_and_backfills_geo_cell(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old.begin() as conn:
+        # users / outbound_sms as created before geo_cell, leases and priorities existed
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, phone VARCHAR(32) NOT NULL UNIQUE, "
+                          "last_lat FLOAT, last_lng FLOAT, last_tower VARCHAR(64), updated_at DATETIME NOT NULL)"))
+        conn.execute(text("CREATE TABLE outbound_sms (id INTEGER PRIMARY KEY, phone VARCHAR(32) NOT NULL, body TEXT NOT NULL, "
+                          "purpose VARCHAR(12) NOT NULL, disaster_id INTEGER, created_at DATETIME NOT NULL, "
+                          "sent_at DATETIME, attempt_count INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO users (phone, last_lat, last_lng, updated_at) VALUES "
+                          "('+1', 12.5, 77.5, CURRENT_TIMESTAMP), ('+2', NULL, NULL, CURRENT_TIMESTAMP)"))
+        conn.execute(text("INSERT INTO outbound_sms (phone, body, purpose, created_at, attempt_count) "
+                          "VALUES ('+1', 'hi', 'INFO', CURRENT_TIMESTAMP, 0)"))
+    upgrade_schema(old)
+    upgrade_schema(old)  # idempotent
+
+    insp = inspect(old)
+    assert {"geo_cell", "loc_uncertainty_m", "lang"} <= {c["name"] for c in insp.get_columns("users")}
+    assert "ix_outbound_pending" in {i["name"] for i in insp.get_indexes("outbound_sms")}
+    with old.connect() as conn:
+        cells = dict(conn.execute(text("SELECT phone, geo_cell FROM users")).all())
+        assert cells == {"+1": cell_id(12.5, 77.5), "+2": None}
+        assert conn.execute(text("SELECT body, priority, segments FROM outbound_sms")).one() == ("hi", 5, 1)
+    # body became nullable (template-backed broadcasts); SQLite needed a table rebuild
+    assert {c["name"]: c["nullable"] for c in inspect(old).get_columns("outbound_sms")}["body"] is True
+    assert "ix_outbound_pending" in {i["name"] for i in inspect(old).get_indexes("outbound_sms")}
+    with old.begin() as conn:
+        conn.execute(text("INSERT INTO outbound_sms (phone, body, purpose, created_at, attempt_count, segments, priority) "
+                          "VALUES ('+2', NULL, 'ALERT', CURRENT_TIMESTAMP, 0, 1, 1)"))
+    old.dispose()
@@ -0,0 +1,58 @@
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.core.config import get_settings
+from backend.app.core.database import SessionLocal
+from backend.app.models.models import FanoutJob, FanoutStatus, OutboundSMS, User, UserAlertLog
+from backend.app.services import fanout
+
+client = TestClient(app)
+
+
+def _report(sender: str) -> int:
+    r = client.post("/receive-sms", json={"from": sender, "message": "REPORT: STORM at HARBOUR radius 3km severity LOW"})
+    return r.json()["report_id"]
+
+
+def test_fanout_job_runs_in_chunks_and_reports_progress(monkeypatch):
+    monkeypatch.setattr(get_settings(), "fanout_chunk_size", 2)
+    for i in range(5):
+        client.post("/users", json={"phone": f"+40{i:02d}", "last_lat": -5.0 + i * 0.001, "last_lng": 60.0})
+    client.post("/users", json={"phone": "+4099", "last_lat": -5.05, "last_lng": 60.0})  # candidate cell, outside radius
+    rid = _report("+1401")
+
+    res = client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": -5.0, "lng": 60.0})
+    assert "fanout_job_id" in res.json()
+
+    progress = client.get(f"/disasters/{rid}/fanout").json()
+    assert progress["status"] == "done"
+    assert progress["alerts_queued"] == 5
+    assert progress["users_scanned"] >= 5
+    assert progress["elapsed_s"] is not None
+    assert client.get("/disasters/999999/fanout").status_code == 404
+
+
+def test_fanout_job_resumes_from_cursor():
+    for i in range(4):
+        client.post("/users", json={"phone": f"+41{i:02d}", "last_lat": 5.0 + i * 0.001, "last_lng": -60.0})
+    rid = _report("+1402")
+    client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": 5.0, "lng": -60.0})
+
+    db = SessionLocal()
+    try:
+        job = db.query(FanoutJob).filter_by(disaster_id=rid).one()
+        # simulate a crash after the first two users: rewind the cursor and drop later alerts
+        users = db.query(User).filter(User.phone.in_([f"+41{i:02d}" for i in range(4)])).order_by(User.geo_cell, User.id).all()
+        late = [u.id for u in users[2:]]
+        db.query(UserAlertLog).filter(UserAlertLog.disaster_id == rid, UserAlertLog.user_id.in_(late)).delete()
+        db.query(OutboundSMS).filter(OutboundSMS.disaster_id == rid, OutboundSMS.phone.in_([u.phone for u in users[2:]])).delete()
+        job.cursor_cell, job.cursor_user_id = users[1].geo_cell, users[1].id
+        job.status = FanoutStatus.running
+        job.finished_at = None
+        db.commit()
+
+        fanout.run_job(job.id)
+        db.refresh(job)
+        assert job.status == FanoutStatus.done
+        assert db.query(OutboundSMS).filter_by(disaster_id=rid).count() == 4
+    finally:
+        db.close()
@@ -0,0 +1,379 @@
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from backend.app.main import app
+from backend.app.core.database import SessionLocal
+from backend.app.models.models import OutboundSMS, OutboundPurpose
+from backend.app.services.sms_encoding import segments
+from backend.app.services.sms_gateway import claim_batch, queue_priority
+
+client = TestClient(app)
+
+
+def _drain(db):
+    # leave the shared queue empty so each test sees only its own rows
+    db.query(OutboundSMS).filter(OutboundSMS.sent_at.is_(None)).update({"sent_at": datetime.utcnow()})
+    db.commit()
+
+
+def _queue(db, n, prefix="+50"):
+    rows = [OutboundSMS(phone=f"{prefix}{i:03d}", body=f"msg {i}", purpose=OutboundPurpose.INFO) for i in range(n)]
+    db.add_all(rows)
+    db.commit()
+    return [r.id for r in rows]
+
+
+def _queue_one(db, phone, body, purpose, disaster_id=None, severity=None):
+    sms = OutboundSMS(phone=phone, body=body, purpose=purpose, disaster_id=disaster_id,
+                      segments=segments(body), priority=queue_priority(purpose, severity))
+    db.add(sms)
+    db.info["outbound_queued"] = True  # wake long-polls on commit, as the queueing services do
+    return sms
+
+
+def test_parallel_gateways_get_disjoint_leases():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        ids = _queue(db, 6)
+        a = client.get("/gateway/outbound", params={"limit": 4, "gateway_id": "sim-a"}).json()
+        b = client.get("/gateway/outbound", params={"limit": 4, "gateway_id": "sim-b"}).json()
+        got_a, got_b = {m["id"] for m in a}, {m["id"] for m in b}
+        assert len(got_a) == 4 and len(got_b) == 2
+        assert not got_a & got_b
+        assert got_a | got_b == set(ids)
+        assert all(m["attempt_count"] == 1 for m in a + b)
+        assert client.get("/gateway/outbound", params={"gateway_id": "sim-c"}).json() == []
+    finally:
+        db.close()
+
+
+def test_expired_lease_returns_to_pool_until_attempts_run_out(monkeypatch):
+    from backend.app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "outbound_max_attempts", 2)
+    db = SessionLocal()
+    try:
+        _drain(db)
+        [sms_id] = _queue(db, 1, prefix="+51")
+        assert [m.id for m in claim_batch(db, "sim-a")] == [sms_id]
+        assert claim_batch(db, "sim-b") == []
+
+        db.query(OutboundSMS).filter_by(id=sms_id).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        [again] = claim_batch(db, "sim-b")
+        assert again.claimed_by == "sim-b" and again.attempt_count == 2
+
+        db.query(OutboundSMS).filter_by(id=sms_id).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        assert claim_batch(db, "sim-c") == []
+        db.commit()
+        # given up: out of the dequeue index, listed on the failed page
+        gone = db.get(OutboundSMS, sms_id)
+        db.refresh(gone)
+        assert gone.failed_at is not None and gone.sent_at is None and gone.claimed_by is None
+        assert f"<td>{sms_id}</td>" in client.get("/ui/outbound", params={"state": "failed"}).text
+        assert f"<td>{sms_id}</td>" not in client.get("/ui/outbound", params={"state": "queued"}).text
+    finally:
+        db.close()
+
+
+def test_failed_report_on_last_attempt_gives_row_up(monkeypatch):
+    from backend.app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "outbound_max_attempts", 1)
+    db = SessionLocal()
+    try:
+        _drain(db)
+        [sms_id] = _queue(db, 1, prefix="+56")
+        [m] = client.get("/gateway/outbound", params={"gateway_id": "sim-a"}).json()
+        assert client.post("/gateway/delivered", json=[{"id": sms_id, "status": "failed", "error": "NO_SERVICE"}]).json()["failed"] == 1
+        row = db.get(OutboundSMS, sms_id)
+        assert row.failed_at is not None and row.lease_expires_at is None and row.last_error == "NO_SERVICE"
+        plan = " ".join(r[-1] for r in db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM outbound_sms WHERE sent_at IS NULL AND failed_at IS NULL "
+            "ORDER BY priority, id LIMIT 10")))
+        assert "ix_outbound_pending" in plan and "TEMP B-TREE" not in plan
+    finally:
+        db.close()
+
+
+def test_priority_lanes_and_fair_share_across_disasters():
+    from backend.app.models.models import DisasterReport, DisasterAlert, ReportStatus, SeverityEnum
+
+    db = SessionLocal()
+    try:
+        _drain(db)
+        big = DisasterReport(raw_text="big", status=ReportStatus.approved, severity=SeverityEnum.LOW)
+        small = DisasterReport(raw_text="small", status=ReportStatus.approved, severity=SeverityEnum.HIGH)
+        db.add_all([big, small])
+        db.flush()
+        db.add_all([DisasterAlert(disaster_id=big.id), DisasterAlert(disaster_id=small.id)])
+        for i in range(50):  # the big LOW alert was queued first
+            _queue_one(db, f"+52{i:03d}", "low", OutboundPurpose.ALERT, disaster_id=big.id, severity=SeverityEnum.LOW)
+        for i in range(5):
+            _queue_one(db, f"+53{i:03d}", "high", OutboundPurpose.ALERT, disaster_id=small.id, severity=SeverityEnum.HIGH)
+        reply = _queue_one(db, "+54000", "we got your HELP", OutboundPurpose.HELP_CONFIRM)
+        db.commit()
+
+        batch = claim_batch(db, "sim-a", limit=8)
+        db.commit()
+        assert batch[0].id == reply.id
+        by_disaster = [m.disaster_id for m in batch[1:]]
+        assert small.id in by_disaster and big.id in by_disaster
+        assert by_disaster.count(small.id) > by_disaster.count(big.id)
+    finally:
+        db.close()
+
+
+def test_mark_sent_and_delivery_reports():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        ids = _queue(db, 4, prefix="+55")
+        claimed = client.get("/gateway/outbound", params={"limit": 10, "gateway_id": "sim-a"}).json()
+        assert {m["id"] for m in claimed} == set(ids)
+
+        assert client.post("/gateway/mark-sent", json=[ids[0], ids[0]]).json() == {"updated": 1}
+        res = client.post("/gateway/delivered", json=[
+            {"id": ids[1], "status": "sent"},
+            {"id": ids[2], "status": "delivered"},
+            {"id": ids[3], "status": "failed", "error": "RESULT_ERROR_NO_SERVICE"},
+        ])
+        assert res.json() == {"sent": 1, "delivered": 1, "failed": 1}
+
+        rows = {r.id: r for r in db.query(OutboundSMS).filter(OutboundSMS.id.in_(ids))}
+        assert rows[ids[0]].sent_at and rows[ids[1]].sent_at
+        assert rows[ids[2]].delivered_at is not None
+        failed = rows[ids[3]]
+        assert failed.sent_at is None and failed.claimed_by is None
+        assert failed.last_error == "RESULT_ERROR_NO_SERVICE"
+        assert failed.lease_expires_at > datetime.utcnow()  # backing off
+        assert client.get("/gateway/outbound", params={"gateway_id": "sim-b"}).json() == []
+
+        db.query(OutboundSMS).filter_by(id=ids[3]).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        [retry] = client.get("/gateway/outbound", params={"gateway_id": "sim-b"}).json()
+        assert retry["id"] == ids[3] and retry["attempt_count"] == 2
+    finally:
+        db.close()
+
+
+
+def test_failed_report_only_applies_to_unsent_rows_still_held_by_the_reporter():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        ids = _queue(db, 3, prefix="+57")
+        claimed = {m["id"]: m for m in client.get("/gateway/outbound", params={"limit": 3, "gateway_id": "sim-a"}).json()}
+        token = claimed[ids[0]]["claim_token"]
+        assert token and all(m["claim_token"] == token for m in claimed.values())
+
+        # delivered first: a later "failed" must not send it again
+        client.post("/gateway/delivered", json=[{"id": ids[0], "status": "delivered"}])
+        late = client.post("/gateway/delivered", json=[{"id": ids[0], "status": "failed", "gateway_id": "sim-a"}])
+        assert late.json()["failed"] == 0
+
+        # sim-a's lease on ids[1] expires and sim-b takes it over
+        db.query(OutboundSMS).filter_by(id=ids[1]).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        [taken] = client.get("/gateway/outbound", params={"gateway_id": "sim-b"}).json()
+        assert taken["id"] == ids[1] and taken["claim_token"] != token
+        stale = client.post("/gateway/delivered", json=[
+            {"id": ids[1], "status": "failed", "gateway_id": "sim-a", "claim_token": token},
+            {"id": ids[2], "status": "failed", "gateway_id": "sim-a", "claim_token": "other-claim"},
+        ])
+        assert stale.json()["failed"] == 0
+
+        ok = client.post("/gateway/delivered", json=[{"id": ids[2], "status": "failed", "gateway_id": "sim-a", "claim_token": token}])
+        assert ok.json()["failed"] == 1
+        db.expire_all()
+        rows = {r.id: r for r in db.query(OutboundSMS).filter(OutboundSMS.id.in_(ids))}
+        assert rows[ids[0]].delivered_at is not None and rows[ids[0]].sent_at is not None
+        assert rows[ids[1]].claimed_by == "sim-b" and rows[ids[1]].claim_token == taken["claim_token"]
+        assert rows[ids[2]].claimed_by is None and rows[ids[2]].sent_at is None
+    finally:
+        db.close()
+
+def test_long_poll_returns_when_alert_is_queued():
+    import threading
+    import time
+
+    db = SessionLocal()
+    try:
+        _drain(db)
+    finally:
+        db.close()
+
+    def enqueue_later():
+        time.sleep(0.3)
+        s = SessionLocal()
+        try:
+            _queue_one(s, "+56000", "late", OutboundPurpose.INFO)
+            s.commit()
+        finally:
+            s.close()
+
+    t0 = time.monotonic()
+    assert client.get("/gateway/outbound", params={"wait": 0.2, "gateway_id": "lp"}).json() == []
+    assert time.monotonic() - t0 >= 0.2
+
+    threading.Thread(target=enqueue_later).start()
+    t0 = time.monotonic()
+    msgs = client.get("/gateway/outbound", params={"wait": 10, "gateway_id": "lp"}).json()
+    assert [m["phone"] for m in msgs] == ["+56000"]
+    assert time.monotonic() - t0 < 5
+
+
+def test_compact_format_groups_bodies_and_claim_token_resumes_lost_claims():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        rows = [OutboundSMS(phone=f"+56{i:03d}", body="ALERT: FLOOD" if i < 4 else "other", purpose=OutboundPurpose.INFO)
+                for i in range(5)]
+        db.add_all(rows)
+        db.commit()
+        ids = [r.id for r in rows]
+
+        res = client.get("/gateway/outbound", params={"limit": 3, "gateway_id": "sim-z", "format": "compact",
+                                                      "claim_token": "a" * 32})
+        page = res.json()
+        assert page["count"] == 3 and page["next_since_id"] == ids[2]
+        assert res.headers["x-next-since-id"] == str(ids[2])
+        [group] = page["templates"]
+        assert (group["body"], group["purpose"], group["ids"]) == ("ALERT: FLOOD", "INFO", ids[:3])
+        assert group["phones"] == ["+56000", "+56001", "+56002"]
+
+        # the next response is lost in transit; repeating its token gets the same rows back
+        lost = {"limit": 2, "gateway_id": "sim-z", "since_id": ids[2], "claim_token": "b" * 32}
+        assert [m["id"] for m in client.get("/gateway/outbound", params=lost).json()] == ids[3:]
+        again = client.get("/gateway/outbound", params={**lost, "limit": 5, "format": "compact"}).json()
+        assert [g["ids"] for g in again["templates"]] == [[ids[3]], [ids[4]]]
+        # a phone under the same name without the token, another name with it, or a cursor
+        # past the rows sees none of these live leases
+        assert client.get("/gateway/outbound", params={"gateway_id": "sim-z", "since_id": 0}).json() == []
+        assert client.get("/gateway/outbound", params={**lost, "gateway_id": "sim-y", "since_id": 0}).json() == []
+        assert client.get("/gateway/outbound", params={**lost, "since_id": ids[4]}).json() == []
+    finally:
+        db.close()
+
+
+def test_outbound_requires_a_real_gateway_id():
+    assert client.get("/gateway/outbound").status_code == 422
+    assert client.get("/gateway/outbound", params={"gateway_id": "default"}).status_code == 400
+    assert client.get("/gateway/outbound/stream", params={"gateway_id": "default"}).status_code == 400
+    assert client.get("/gateway/outbound", params={"gateway_id": "sim-t", "claim_token": "short"}).status_code == 400
+
+
+def test_msgpack_is_negotiated_when_available():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        ids = _queue(db, 2, prefix="+57")
+        res = client.get("/gateway/outbound", params={"gateway_id": "sim-m", "format": "compact"},
+                         headers={"Accept": "application/msgpack, application/json"})
+        try:
+            import msgpack
+        except ImportError:
+            assert res.headers["content-type"] == "application/json"
+            assert res.json()["templates"][0]["ids"] == ids[:1]
+        else:
+            assert res.headers["content-type"] == "application/msgpack"
+            assert msgpack.unpackb(res.content)["count"] == 2
+    finally:
+        db.close()
+
+
+def test_claims_can_be_budgeted_in_sms_parts():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        _queue_one(db, "+58001", "x" * 200, OutboundPurpose.INFO)  # 2 parts
+        _queue_one(db, "+58002", "short", OutboundPurpose.INFO)
+        db.commit()
+        first = client.get("/gateway/outbound", params={"gateway_id": "sim-s", "max_segments": 2}).json()
+        assert [(m["phone"], m["segments"]) for m in first] == [("+58001", 2)]
+        # an oversized row still goes out alone rather than blocking the queue
+        rest = client.get("/gateway/outbound", params={"gateway_id": "sim-s", "max_segments": 1, "format": "compact"}).json()
+        assert [(t["phones"], t["segments"]) for t in rest["templates"]] == [(["+58002"], 1)]
+    finally:
+        db.close()
+
+
+def test_sse_stream_waits_on_the_event_loop(monkeypatch):
+    import asyncio
+    from backend.app.api import routes
+
+    db = SessionLocal()
+    try:
+        _drain(db)
+    finally:
+        db.close()
+    monkeypatch.setattr(routes, "SSE_KEEPALIVE_S", 0.1)
+
+    def enqueue():
+        s = SessionLocal()
+        try:
+            _queue_one(s, "+58000", "streamed", OutboundPurpose.INFO)
+            s.commit()
+        finally:
+            s.close()
+
+    async def run():
+        events = (await routes.gateway_outbound_stream(limit=10, gateway_id="sse")).body_iterator
+        try:
+            idle = await asyncio.wait_for(events.__anext__(), 5)
+            await asyncio.get_running_loop().run_in_executor(None, enqueue)
+            while True:
+                event = await asyncio.wait_for(events.__anext__(), 5)
+                if not event.startswith(":"):
+                    return idle, event
+        finally:
+            await events.aclose()
+
+    idle, event = asyncio.run(run())
+    assert idle == ": keepalive\n\n"
+    assert event.startswith("event: outbound\n") and '"+58000"' in event
+
+
+def test_waiting_long_poll_does_not_hold_the_async_connection():
+    import asyncio
+    import time
+    from starlette.requests import Request
+    from backend.app.api import routes
+    from backend.app.core.database import AsyncSessionLocal, async_engine
+
+    db = SessionLocal()
+    try:
+        _drain(db)
+    finally:
+        db.close()
+
+    async def run():
+        async def poll():
+            async with AsyncSessionLocal() as s:
+                request = Request({"type": "http", "headers": []})
+                return await routes.gateway_outbound(request=request, limit=5, gateway_id="idle", wait=1.5, db=s)
+
+        waiting = asyncio.ensure_future(poll())
+        await asyncio.sleep(0.3)
+        t0 = time.monotonic()
+        async with AsyncSessionLocal() as s:
+            await routes.receive_sms(routes.InboundSMSIn(**{"from": "+59000", "message": "hello"}), s)
+        took = time.monotonic() - t0
+        await waiting
+        await async_engine.dispose()  # its pooled connection belongs to this event loop
+        return took
+
+    assert asyncio.run(run()) < 1.0
+
+
+def test_peek_lists_queued_rows_without_claiming_them():
+    db = SessionLocal()
+    try:
+        _drain(db)
+        ids = _queue(db, 2, prefix="+57")
+        for _ in range(6):  # more than OUTBOUND_MAX_ATTEMPTS refreshes
+            peeked = client.get("/gateway/outbound/peek", params={"phone": "+57001"}).json()
+        assert [m["id"] for m in peeked] == [ids[1]]
+        rows = db.query(OutboundSMS).filter(OutboundSMS.id.in_(ids)).all()
+        assert all(r.claimed_by is None and r.attempt_count == 0 and r.failed_at is None for r in rows)
+        assert sorted(m["id"] for m in client.get("/gateway/outbound", params={"gateway_id": "sim-p"}).json()) == ids
+    finally:
+        db.close()
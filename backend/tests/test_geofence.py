@@ -0,0 +1,149 @@
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.core.database import SessionLocal
+from backend.app.models.models import OutboundSMS
+from array import array
+import pytest
+from backend.app.services import geofence
+from backend.app.services.geofence import bounding_box, cell_id, cell_ranges, haversine_distance_m, inside_radius_many
+
+client = TestClient(app)
+
+
+def _covered(lat, lng, ranges):
+    c = cell_id(lat, lng)
+    return any(lo <= c <= hi for lo, hi in ranges)
+
+
+def test_cell_ranges_cover_circle_edges():
+    lat, lng, radius = 48.85, 2.35, 20000
+    ranges = cell_ranges(*bounding_box(lat, lng, radius))
+    # points just inside the circle along each axis
+    for dlat, dlng in [(0.179, 0), (-0.179, 0), (0, 0.27), (0, -0.27)]:
+        assert _covered(lat + dlat, lng + dlng, ranges)
+    assert not _covered(lat + 1.0, lng, ranges)
+
+
+def test_cell_ranges_wrap_antimeridian():
+    ranges = cell_ranges(*bounding_box(0.0, 179.99, 10000))
+    assert _covered(0.0, -179.99, ranges)
+    assert _covered(0.0, 179.95, ranges)
+
+
+def test_approve_alerts_only_users_in_radius():
+    r = client.post("/receive-sms", json={"from": "+1101", "message": "REPORT: FLOOD at RIVER BANK radius 2km severity HIGH"})
+    rid = r.json()["report_id"]
+    client.post("/users", json={"phone": "+2101", "last_lat": -30.0, "last_lng": 150.0})
+    client.post("/users", json={"phone": "+2102", "last_lat": -30.5, "last_lng": 150.0})
+    # moved into the zone after registering elsewhere: index must follow the write
+    client.post("/users", json={"phone": "+2103", "last_lat": 10.0, "last_lng": 10.0})
+    client.post("/move-user", json={"phone": "+2103", "lat": -30.01, "lng": 150.0})
+
+    client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": -30.0, "lng": 150.0})
+    db = SessionLocal()
+    try:
+        phones = {m.phone for m in db.query(OutboundSMS).filter_by(disaster_id=rid)}
+    finally:
+        db.close()
+    assert phones == {"+2101", "+2103"}
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_inside_radius_many_matches_scalar(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(geofence, "np", None)
+    lats = array("d", [10.0, 10.01, 10.2, -10.0])
+    lngs = array("d", [20.0, 20.0, 20.0, 20.0])
+    dist = geofence.haversine_many_m(10.0, 20.0, lats, lngs)
+    for d, la, ln in zip(dist, lats, lngs):
+        assert d == pytest.approx(haversine_distance_m(10.0, 20.0, la, ln))
+    assert list(inside_radius_many(10.0, 20.0, lats, lngs, 5000)) == [True, True, False, False]
+    # per-point radii
+    assert list(inside_radius_many(10.0, 20.0, lats, lngs, [1, 1, 30000, 1])) == [True, False, True, False]
+    # per-point slack (location uncertainty)
+    assert list(inside_radius_many(10.0, 20.0, lats, lngs, 1, slack_m=[0, 2000, 30000, 0])) == [True, True, True, False]
+
+
+def test_tower_registry_resolves_moves_with_coverage():
+    from backend.app.models.models import User
+
+    csv_text = "tower_id,lat,lng,coverage_m\nT-35A,-35.0,140.0,1500\nT-35B,-36.0,140.0,\n"
+    r = client.post("/towers/import", files={"file": ("towers.csv", csv_text, "text/csv")})
+    assert r.json()["imported"] == 2
+    assert client.post("/towers/import", files={"file": ("bad.csv", "tower_id,lat,lng\nX,north,1\n")}).status_code == 400
+
+    # tower-only registration: placed at the tower, coverage kept as uncertainty
+    u = client.post("/users", json={"phone": "+2150", "last_tower": "T-35A"}).json()
+    assert (u["last_lat"], u["last_lng"], u["loc_uncertainty_m"]) == (-35.0, 140.0, 1500)
+    assert client.post("/users", json={"phone": "+2151", "last_tower": "T-35B"}).json()["loc_uncertainty_m"] == 2000
+
+    # tower center is ~2.2 km from the zone center: outside 1 km, but within 1 km + coverage
+    rid = client.post("/receive-sms", json={"from": "+1150", "message": "REPORT: FIRE at RIDGE radius 1km severity HIGH"}).json()["report_id"]
+    client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": -35.02, "lng": 140.0})
+    db = SessionLocal()
+    try:
+        assert {m.phone for m in db.query(OutboundSMS).filter_by(disaster_id=rid)} == {"+2150"}
+    finally:
+        db.close()
+
+    assert client.post("/move-user", json={"phone": "+2152", "tower_id": "T-35A"}).json()["new_alerts"] == 1
+    assert client.post("/move-user", json={"phone": "+2153", "tower_id": "NOPE"}).status_code == 404
+    assert client.post("/move-user", json={"phone": "+2153"}).status_code == 422
+
+    # re-import shrinks the coverage; the cached registry must follow
+    client.post("/towers/import", files={"file": ("towers.csv", "tower_id,lat,lng,coverage_m\nT-35A,-35.0,140.0,100\n")})
+    assert client.post("/move-user", json={"phone": "+2154", "tower_id": "T-35A"}).json()["new_alerts"] == 0
+    db = SessionLocal()
+    try:
+        assert db.query(User).filter_by(phone="+2154").one().loc_uncertainty_m == 100
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_prepared_area_point_in_polygon(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(geofence, "np", None)
+    # 1°x1° square with a 0.2° hole, plus a separate triangle; [lng, lat] order
+    square = [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]], [[0.4, 0.4], [0.6, 0.4], [0.6, 0.6], [0.4, 0.6]]]
+    triangle = [[[5, 5], [6, 5], [5, 6]]]
+    area = geofence.prepare_area(geofence.parse_area({"type": "MultiPolygon", "coordinates": [square, triangle]}))
+    assert area.bbox == (0, 6, 0, 6)
+    lats = [0.5, 0.2, 5.1, 5.9, 2.0, 0.5]
+    lngs = [0.5, 0.2, 5.1, 5.9, 2.0, 1.001]
+    assert list(area.contains_many(lats, lngs)) == [False, True, True, False, False, False]
+    # ~111 m outside the east edge: caught only with enough slack
+    assert list(area.contains_many(lats, lngs, slack_m=[0, 0, 0, 0, 0, 150])) == [False, True, True, False, False, True]
+    assert area.contains(1.0005, 0.5) is False and area.contains(0.5, 1.001, 150) is True
+
+    with pytest.raises(ValueError):
+        geofence.parse_area({"type": "Point", "coordinates": [0, 0]})
+    with pytest.raises(ValueError):
+        geofence.parse_area({"type": "Polygon", "coordinates": [[[0, 0], [1, 1], [0, 0]]]})
+
+
+def test_polygon_disaster_alerts_only_inside_area():
+    # narrow river strip: 0.01° wide, 0.2° long
+    strip = {"type": "Polygon", "coordinates": [[[60.0, 40.0], [60.01, 40.0], [60.01, 40.2], [60.0, 40.2], [60.0, 40.0]]]}
+    client.post("/users", json={"phone": "+2160", "last_lat": 40.1, "last_lng": 60.005})   # in the strip
+    client.post("/users", json={"phone": "+2161", "last_lat": 40.1, "last_lng": 60.05})    # beside it
+    rid = client.post("/receive-sms", json={"from": "+1160", "message": "REPORT: FLOOD at RIVER radius 20km severity HIGH"}).json()["report_id"]
+    assert client.post(f"/disasters/{rid}/verify", json={"approve": True, "area": {"type": "Point", "coordinates": [0, 0]}}).status_code == 400
+    for bad in ("[1, 2]", "42", "not json"):
+        assert client.post(f"/ui/approve/{rid}", data={"area": bad}, follow_redirects=False).status_code == 400
+    assert client.post(f"/disasters/{rid}/verify", json={"approve": True, "area": strip}).status_code == 200
+
+    db = SessionLocal()
+    try:
+        assert {m.phone for m in db.query(OutboundSMS).filter_by(disaster_id=rid)} == {"+2160"}
+    finally:
+        db.close()
+    report = next(r for r in client.get("/disasters/active").json() if r["id"] == rid)
+    assert report["area_geojson"] and report["lat"] == pytest.approx(40.1)
+
+    assert client.post("/move-user", json={"phone": "+2162", "lat": 40.19, "lng": 60.002}).json()["new_alerts"] == 1
+    assert client.post("/move-user", json={"phone": "+2163", "lat": 40.19, "lng": 60.03}).json()["new_alerts"] == 0
@@ -0,0 +1,29 @@
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "android"))
+from termux_inbound_forwarder import SeenStore, hash_msg, load_legacy_seen, new_messages  # noqa: E402
+
+
+def _sms(i, read=False):
+    return {"id": i, "number": f"+9{i}", "body": f"HELP {i}", "date": f"2024-01-0{i} 10:00", "read": read, "type": "inbox"}
+
+
+def test_upgrade_keeps_messages_the_old_state_file_had_forwarded(tmp_path):
+    old, new = _sms(1), _sms(2)
+    # the pre-SeenStore forwarder's state: hashes that included `read`
+    legacy_key = hashlib.sha256("1-+91-HELP 1-2024-01-01 10:00-False".encode("utf-8")).hexdigest()
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"seen": [legacy_key]}))
+    legacy = load_legacy_seen(str(state))
+
+    seen = SeenStore(str(tmp_path / "seen.log"))
+    old["read"] = True  # opened since it was forwarded
+    pending = new_messages([new, old], seen, legacy)
+    assert [item["message"] for _, item in pending] == ["HELP 2"]
+    # the old message is now known under its current key, so the legacy file isn't needed again
+    seen.flush()
+    assert hash_msg(old) in SeenStore(str(tmp_path / "seen.log"))
+    assert load_legacy_seen(str(tmp_path / "missing.json")) == set()
@@ -0,0 +1,126 @@
+import gzip
+import json
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.core.database import SessionLocal
+from backend.app.models.models import InboundMessage, HelpRequest, DisasterReport, InboundKind
+
+client = TestClient(app)
+
+
+def test_batch_ingest_returns_per_item_results():
+    batch = [
+        {"from": "+7001", "message": "REPORT: FLOOD at DOCKS radius 2km severity HIGH", "gateway_msg_id": "a1"},
+        {"from": "+7002", "message": "HELP 2 people on roof", "gateway_msg_id": "a2"},
+        {"from": "+7003", "message": "SAFE"},
+        {"from": "+7004", "message": "REPORT: FIRE at MILL radius 1km severity LOW"},
+    ]
+    res = client.post("/receive-sms/batch", json=batch)
+    assert res.status_code == 200
+    results = res.json()["results"]
+    assert [r["message"] for r in results] == ["report received", "received", "received", "report received"]
+    assert results[0]["gateway_msg_id"] == "a1" and "gateway_msg_id" not in results[2]
+
+    db = SessionLocal()
+    try:
+        r1 = db.get(DisasterReport, results[0]["report_id"])
+        r4 = db.get(DisasterReport, results[3]["report_id"])
+        assert (r1.type, r1.reporter_phone) == ("FLOOD", "+7001")
+        assert (r4.type, r4.reporter_phone) == ("FIRE", "+7004")
+        report_inbound = db.query(InboundMessage).filter_by(phone="+7001").one()
+        assert report_inbound.kind == InboundKind.REPORT and report_inbound.disaster_id == r1.id
+        help_inbound = db.query(InboundMessage).filter_by(phone="+7002").one()
+        assert db.query(HelpRequest).filter_by(inbound_id=help_inbound.id).count() == 1
+    finally:
+        db.close()
+
+
+def test_batch_ingest_empty():
+    assert client.post("/receive-sms/batch", json=[]).json() == {"results": []}
+
+
+def test_retried_post_returns_original_result():
+    msg = {"from": "+7101", "message": "REPORT: FIRE at DEPOT radius 1km severity HIGH", "gateway_msg_id": "k-7101"}
+    first = client.post("/receive-sms", json=msg).json()
+    again = client.post("/receive-sms", json=msg).json()
+    assert again == {**first, "duplicate": True}
+
+    db = SessionLocal()
+    try:
+        assert db.query(DisasterReport).filter_by(reporter_phone="+7101").count() == 1
+    finally:
+        db.close()
+
+
+def test_batch_dedupes_against_db_and_within_batch():
+    client.post("/receive-sms", json={"from": "+7201", "message": "HELP", "gateway_msg_id": "k-7201"})
+    batch = [
+        {"from": "+7201", "message": "HELP", "gateway_msg_id": "k-7201"},
+        {"from": "+7202", "message": "HELP stuck", "gateway_msg_id": "k-7202"},
+        {"from": "+7202", "message": "HELP stuck", "gateway_msg_id": "k-7202"},
+        {"from": "+7203", "message": "HELP no key"},
+    ]
+    results = client.post("/receive-sms/batch", json=batch).json()["results"]
+    assert [r.get("duplicate", False) for r in results] == [True, False, True, False]
+
+    db = SessionLocal()
+    try:
+        assert db.query(HelpRequest).filter(HelpRequest.phone.in_(["+7201", "+7202"])).count() == 2
+    finally:
+        db.close()
+
+
+def test_smssync_message_id_is_idempotency_key():
+    form = {"from": "+7301", "message": "REPORT: STORM at PIER radius 1km severity LOW", "message_id": "smssync-1"}
+    first = client.post("/receive-sms-smssync", data=form).json()
+    assert client.post("/receive-sms-smssync", data=form).json()["report_id"] == first["report_id"]
+
+
+def test_gzip_request_body_is_inflated():
+    batch = [{"from": f"+7301{i:03d}", "message": "SAFE", "gateway_msg_id": f"gz{i}"} for i in range(50)]
+    body = gzip.compress(json.dumps(batch).encode())
+    res = client.post("/receive-sms/batch", content=body,
+                      headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert len(res.json()["results"]) == 50
+
+    bad = client.post("/receive-sms/batch", content=b"not gzip",
+                      headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert bad.status_code == 400
+    cut = client.post("/receive-sms/batch", content=body[:-20],
+                      headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert cut.status_code == 400
+
+
+def test_gzip_request_limits_compressed_and_inflated_size():
+    import os
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from backend.app.core.middleware import GzipRequestMiddleware
+
+    async def size(request: Request):
+        return PlainTextResponse(str(len(await request.body())))
+
+    small = TestClient(GzipRequestMiddleware(Starlette(routes=[Route("/", size, methods=["POST"])]),
+                                             max_size=10_000, max_compressed_size=1_000))
+    gz = {"Content-Encoding": "gzip"}
+    assert small.post("/", content=gzip.compress(b"0" * 5_000), headers=gz).text == "5000"
+    # received bytes: incompressible data over the compressed cap, with or without a length
+    noise = gzip.compress(os.urandom(2_000))
+    assert small.post("/", content=noise, headers=gz).status_code == 413
+    assert small.post("/", content=iter([noise[:500], noise[500:]]), headers=gz).status_code == 413
+    # inflated bytes: a few hundred compressed bytes that expand past max_size
+    bomb = gzip.compress(b"0" * 200_000)
+    assert len(bomb) < 1_000
+    assert small.post("/", content=bomb, headers=gz).status_code == 413
+
+
+def test_large_responses_are_gzipped():
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    big = client.post("/receive-sms/batch", headers={"Accept-Encoding": "gzip"},
+                      json=[{"from": f"+7302{i:03d}", "message": "SAFE", "gateway_msg_id": f"gzr{i}"} for i in range(50)])
+    assert big.headers.get("content-encoding") == "gzip"
+    assert len(big.json()["results"]) == 50
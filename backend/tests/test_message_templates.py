@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.core.database import SessionLocal
+from backend.app.models.models import DisasterReport, MessageTemplate, OutboundPurpose, OutboundSMS, ReportStatus
+from backend.app.services.message_templates import alert_templates, render_alert, template_cache
+
+client = TestClient(app)
+
+
+def test_alert_rendered_once_per_language_and_shared_by_rows():
+    rid = client.post("/receive-sms", json={"from": "+8001", "message": "REPORT: FLOOD at RIVER BEND radius 2km severity HIGH"}).json()["report_id"]
+    for phone, lang in (("+8101", None), ("+8102", "es"), ("+8103", "HI"), ("+8104", "xx"), ("+8105", "es")):
+        client.post("/users", json={"phone": phone, "last_lat": -35.0, "last_lng": 140.0, "lang": lang})
+    assert client.post(f"/disasters/{rid}/verify", json={"approve": True, "lat": -35.0, "lng": 140.001}).status_code == 200
+
+    db = SessionLocal()
+    try:
+        rows = db.query(OutboundSMS).filter(OutboundSMS.disaster_id == rid, OutboundSMS.phone.like("+810%")).all()
+        assert len(rows) == 5
+        assert all(r.inline_body is None and r.template_id is not None for r in rows)
+        bodies = {r.phone: r.body for r in rows}
+        assert bodies["+8101"] == bodies["+8104"] == "ALERT: FLOOD near RIVER BEND. Reply HELP if you need assistance."
+        assert bodies["+8102"] == bodies["+8105"] == "ALERTA: FLOOD cerca de RIVER BEND. Responda AYUDA si necesita asistencia."
+        assert bodies["+8103"].startswith("चेतावनी: FLOOD - RIVER BEND")
+        templates = db.query(MessageTemplate).filter_by(disaster_id=rid).all()
+        assert sorted(t.lang for t in templates) == ["en", "es", "hi"]
+        assert {t.lang: t.segments for t in templates}["hi"] == 1
+        assert (rid, OutboundPurpose.ALERT, "es") in template_cache._lru
+    finally:
+        db.close()
+
+    # a late entrant reuses the committed row; gateways see the resolved text
+    assert client.post("/move-user", json={"phone": "+8106", "lat": -35.0, "lng": 140.0}).json()["new_alerts"] == 1
+    db = SessionLocal()
+    try:
+        assert db.query(MessageTemplate).filter_by(disaster_id=rid).count() == 3
+        late = db.query(OutboundSMS).filter_by(disaster_id=rid, phone="+8106").one()
+        assert late.template.lang == "en"
+    finally:
+        db.close()
+    sent = client.get("/gateway/outbound", params={"limit": 1000, "gateway_id": "tpl"}).json()
+    assert "ALERTA: FLOOD cerca de RIVER BEND. Responda AYUDA si necesita asistencia." in {m["body"] for m in sent}
+
+
+def test_template_cached_only_after_commit():
+    db = SessionLocal()
+    try:
+        dr = DisasterReport(raw_text="x", type="FIRE", location_text="MILL", status=ReportStatus.approved)
+        db.add(dr)
+        db.flush()
+        lookup = alert_templates(db, dr)
+        first = lookup("es")
+        assert lookup("es") == first  # same transaction: served from the pending set
+        assert (dr.id, OutboundPurpose.ALERT, "es") not in template_cache._lru
+        db.rollback()
+        assert (dr.id, OutboundPurpose.ALERT, "es") not in template_cache._lru
+
+        db.add(dr)
+        db.flush()
+        t = alert_templates(db, dr)("es")
+        db.commit()
+        assert template_cache._lru[(dr.id, OutboundPurpose.ALERT, "es")] == t
+        assert t.body == "ALERTA: FIRE cerca de MILL. Responda AYUDA si necesita asistencia."
+    finally:
+        db.close()
+
+
+def test_alert_without_location_uses_area_phrase():
+    dr = DisasterReport(type="FIRE", location_text=None)
+    assert render_alert(dr, "en") == "ALERT: FIRE in your area. Reply HELP if you need assistance."
+    assert "None" not in render_alert(dr, "es") and "en su zona" in render_alert(dr, "es")
+    assert "आपके क्षेत्र में FIRE" in render_alert(dr, "hi")
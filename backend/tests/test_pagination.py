@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from backend.app.services.pagination import decode_cursor, encode_cursor
+
+client = TestClient(app)
+
+
+def _walk(url, params):
+    seen, pages, cursor = [], 0, None
+    while True:
+        r = client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        seen += [row["id"] for row in r.json()]
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen, pages
+
+
+def test_cursor_roundtrip():
+    from datetime import datetime
+    ts = datetime(2026, 3, 1, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor((ts, 42)), with_ts=True) == (ts, 42)
+    assert decode_cursor(encode_cursor((7,)), with_ts=False) == (7,)
+
+
+def test_help_list_pages_by_keyset():
+    for i in range(7):
+        client.post("/receive-sms", json={"from": f"+130{i}", "message": f"SOS {i + 1} people"})
+    everything = [h["id"] for h in client.get("/messages/help", params={"limit": 1000}).json()]
+    assert everything == sorted(everything, reverse=True)  # newest first
+
+    ids, pages = _walk("/messages/help", {"limit": 3})
+    assert ids == everything and pages == -(-len(everything) // 3)
+    assert client.get("/messages/help", params={"status": "resolved"}).json() == []
+    assert client.get("/messages/help", params={"since": "2999-01-01T00:00:00"}).json() == []
+    assert client.get("/messages/help", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_pending_and_ui_pages():
+    for i in range(4):
+        client.post("/receive-sms", json={"from": f"+131{i}", "message": f"REPORT: TSUNAMI at PIER {i}{i}{i} radius 1km"})
+    ids, pages = _walk("/disasters/pending", {"limit": 2})
+    assert len(ids) == len(set(ids)) and pages >= 2
+
+    page = client.get("/ui/help", params={"limit": 2})
+    assert page.status_code == 200 and "cursor=" in page.text
+    for url in ("/ui/pending", "/ui/active", "/ui/users", "/ui/outbound"):
+        assert client.get(url, params={"limit": 1}).status_code == 200, url
+    assert client.get("/ui/outbound", params={"state": "sent", "disaster_id": ""}).status_code == 200
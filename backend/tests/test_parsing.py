@@ -1,4 +1,4 @@
-from backend.app.services.parsing import parse_inbound
+from backend.app.services.parsing import parse_inbound, parse_many
 from backend.app.models.models import InboundKind, SeverityEnum
 
 def test_parse_valid_report():
@@ -21,3 +21,52 @@ def test_parse_general():
     msg = "Random message"
     parsed = parse_inbound(msg)
     assert parsed.kind == InboundKind.GENERAL
+
+
+def test_parse_report_variants():
+    cases = {
+        "report flood at market street radius 5 KM": ("FLOOD", "market street", 5000, SeverityEnum.MEDIUM),
+        "REPORT: FIRE @ Ridge Road 2km high": ("FIRE", "Ridge Road", 2000, SeverityEnum.HIGH),
+        "RPT landslide near km 42 marker sev: critical r=500m": ("LANDSLIDE", "km 42 marker", 500, SeverityEnum.HIGH),
+        "REPORT: FIRE at X severity low radius 3 kms": ("FIRE", "X", 3000, SeverityEnum.LOW),
+        "Suchna: FLOOD at gaon 1 mile": ("FLOOD", "gaon", 1609, SeverityEnum.MEDIUM),
+        "REPORT: FLOOD at HIGH STREET": ("FLOOD", "HIGH STREET", None, SeverityEnum.MEDIUM),
+    }
+    for msg, (typ, loc, radius, sev) in cases.items():
+        p = parse_inbound(msg)
+        assert p.kind == InboundKind.REPORT, msg
+        assert (p.report.type, p.report.location_text, p.report.radius_m, p.report.severity) == (typ, loc, radius, sev), msg
+    assert parse_inbound("REPORT:").kind == InboundKind.GENERAL
+
+
+def test_parse_report_rejects_ambiguous_text():
+    # a REPORT keyword without a colon needs a known disaster type after it
+    assert parse_inbound("Report on the situation please").kind == InboundKind.GENERAL
+    assert parse_inbound("REPORT: SMOKE at mill").report.type == "SMOKE"
+    # an unknown type followed straight by words could be either
+    assert parse_inbound("REPORT: SMOKE mill").kind == InboundKind.GENERAL
+    # a bare "5 m" followed by more words is probably part of the location
+    assert parse_inbound("REPORT: FLOOD at sector 5 m block").kind == InboundKind.GENERAL
+    cases = {
+        "REPORT: FLOOD at MARKET STREET radius 5km severity HIGH please hurry": ("FLOOD", "MARKET STREET", 5000, SeverityEnum.HIGH),
+        "REPORT GAS LEAK at PLANT": ("GAS_LEAK", "PLANT", None, SeverityEnum.MEDIUM),
+        "REPORT: FIRE 2km high": ("FIRE", None, 2000, SeverityEnum.HIGH),
+    }
+    for msg, (typ, loc, radius, sev) in cases.items():
+        p = parse_inbound(msg)
+        assert p.kind == InboundKind.REPORT, msg
+        assert (p.report.type, p.report.location_text, p.report.radius_m, p.report.severity) == (typ, loc, radius, sev), msg
+
+
+def test_parse_help_keywords_and_head_count():
+    parsed = parse_many(["SOS 2 adults 3 children on roof", "madad 5 log", "HELP", "surakshit", "HELPME", "SOS 2 adults 3 children on roof"])
+    assert [p.kind for p in parsed] == [InboundKind.HELP, InboundKind.HELP, InboundKind.HELP, InboundKind.SAFE, InboundKind.HELP, InboundKind.HELP]
+    assert parsed[4].help_text == "ME"
+    assert [p.people_count for p in parsed[:3]] == [5, 5, None]
+    assert parsed[0] is parsed[-1]  # identical texts parsed once
+
+
+def test_original_keywords_match_as_prefixes_aliases_as_words():
+    # HELP / SAFE keep the startswith behaviour the parser always had
+    assert [parse_inbound(t).kind for t in ("SAFETY first", "SAFEHOME", "helpme")] == [InboundKind.SAFE, InboundKind.SAFE, InboundKind.HELP]
+    assert [parse_inbound(t).kind for t in ("sosa is here", "madadgar", "Reported already")] == [InboundKind.GENERAL] * 3
@@ -0,0 +1,37 @@
+from backend.app.services.sms_encoding import fit_message, is_gsm7, segments, transliterate
+
+SUFFIX = ". Reply HELP if you need assistance."
+
+
+def test_segment_counts_at_gsm7_and_ucs2_boundaries():
+    assert [segments("a" * n) for n in (1, 160, 161, 306, 307)] == [1, 1, 2, 2, 3]
+    # extension characters cost two septets
+    assert segments("€" * 80) == 1 and segments("€" * 81) == 2
+    assert segments("ä" * 160) == 1  # GSM-7 has its own ä
+    assert [segments("ê" * n) for n in (70, 71, 134, 135)] == [1, 2, 2, 3]
+
+
+def test_transliterate_keeps_meaning_or_leaves_text_alone():
+    assert transliterate("“Café” — rue de l’Église…") == '"Café" - rue de l\'Église...'
+    assert transliterate("Crêpe") == "Crepe" and is_gsm7("Crepe")
+    hindi = "नदी के पास"
+    assert transliterate(hindi) == hindi
+
+
+def test_alert_fits_one_segment_by_abbreviating_then_cutting_location():
+    loc = "NORTH MARKET STREET NEAR THE OLD RAILWAY STATION, SECTOR 14"
+    msg = fit_message("ALERT: FLOOD near ", loc, SUFFIX)
+    assert msg == "ALERT: FLOOD near " + loc + SUFFIX  # fits as is
+
+    long_loc = loc + ", GANDHI NAGAR DISTRICT, BEHIND THE NATIONAL HIGHWAY BRIDGE"
+    msg = fit_message("ALERT: FLOOD near ", long_loc, SUFFIX)
+    assert msg == "ALERT: FLOOD near N MKT ST NR THE OLD RAILWAY STN, SEC 14, GANDHI NGR DIST, BEHIND THE NATL HWY BR" + SUFFIX
+    msg = fit_message("ALERT: FLOOD near ", long_loc + " AND THE GOVERNMENT HOSPITAL OPPOSITE THE BUS DEPOT", SUFFIX)
+    assert segments(msg) == 1 and msg.endswith(".." + SUFFIX)
+    assert msg.startswith("ALERT: FLOOD near N MKT ST NR THE OLD RAILWAY STN")
+
+    msg = fit_message("ALERT: FLOOD near ", "नदी के पास पुराना बाज़ार और रेलवे स्टेशन", SUFFIX)
+    assert segments(msg) == 1 and msg.startswith("ALERT: FLOOD near नदी") and msg.endswith(".." + SUFFIX)
+    # a budget too small for a useful location grows by a segment instead
+    msg = fit_message("ALERT: " + "X" * 60 + " near ", "नदी के पास पुराना बाज़ार", SUFFIX)
+    assert segments(msg) == 2 and "नदी के पास" in msg
@@ -1,8 +1,13 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+import sys
 import requests
+from flask import Flask, render_template, request, redirect, url_for, jsonify
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "android"))
+from gateway_client import GatewayClient  # noqa: E402
 
 BASE = os.environ.get("BACKEND_BASE_URL", "http://127.0.0.1:8000")
+api = GatewayClient(BASE)  # one pooled session for all request threads
 
 app = Flask(__name__)
 
@@ -16,8 +21,7 @@ def mock_phone():
 def send_inbound():
     frm = request.form.get("from") or ""
     msg = request.form.get("message") or ""
-    r = requests.post(f"{BASE}/receive-sms", json={"from": frm, "message": msg})
-    return jsonify(r.json())
+    return jsonify(api.post_inbound(frm, msg))
 
 @app.get("/get-outbound")
 def get_outbound():
@@ -26,36 +30,54 @@ def get_outbound():
     params = {"limit": limit}
     if phone:
         params["phone"] = phone
-    r = requests.get(f"{BASE}/gateway/outbound", params=params)
-    return jsonify(r.json())
+    # read-only: the claiming /gateway/outbound would lease rows and burn an attempt per refresh
+    return jsonify(api.get("/gateway/outbound/peek", **params))
 
 @app.post("/mark-sent")
 def mark_sent():
     ids = request.json or []
-    r = requests.post(f"{BASE}/gateway/mark-sent", json=ids)
-    return jsonify(r.json())
+    return jsonify(api.mark_sent(ids))
 
 # ---------- Admin ----------
+def backend_error(e: requests.HTTPError) -> str:
+    """The backend's own error message (FastAPI's `detail`) for showing on the page."""
+    try:
+        detail = e.response.json().get("detail")
+    except (ValueError, AttributeError):
+        detail = None
+    return f"Backend returned {e.response.status_code}: {detail or e.response.reason}"
+
 @app.get("/admin")
 def admin_home():
-    pend = requests.get(f"{BASE}/disasters/pending").json()
-    actv = requests.get(f"{BASE}/disasters/active").json()
-    helpq = requests.get(f"{BASE}/messages/help").json()
-    return render_template("admin.html", base=BASE, pending=pend, active=actv, helpq=helpq)
+    pend = api.get("/disasters/pending")
+    actv = api.get("/disasters/active")
+    helpq = api.get("/messages/help")
+    return render_template("admin.html", base=BASE, pending=pend, active=actv, helpq=helpq,
+                           error=request.args.get("error"))
 
 @app.post("/approve/<int:did>")
 def approve(did: int):
     lat = request.form.get("lat")
     lng = request.form.get("lng")
+    radius = request.form.get("radius_m")
     body = {"approve": True}
     if lat and lng:
         body.update({"lat": float(lat), "lng": float(lng)})
-    requests.post(f"{BASE}/disasters/{did}/verify", json=body)
+    if radius:
+        body["radius_m"] = int(radius)
+    try:
+        api.post(f"/disasters/{did}/verify", body)
+    except requests.HTTPError as e:
+        # e.g. 400 when the report was already processed
+        return redirect(url_for('admin_home', error=backend_error(e)))
     return redirect(url_for('admin_home'))
 
 @app.post("/reject/<int:did>")
 def reject(did: int):
-    requests.post(f"{BASE}/disasters/{did}/verify", json={"approve": False})
+    try:
+        api.post(f"/disasters/{did}/verify", {"approve": False})
+    except requests.HTTPError as e:
+        return redirect(url_for('admin_home', error=backend_error(e)))
     return redirect(url_for('admin_home'))
 
 @app.post("/add-user")
@@ -66,7 +88,7 @@ def add_user():
     payload = {"phone": phone}
     if lat: payload["last_lat"] = float(lat)
     if lng: payload["last_lng"] = float(lng)
-    requests.post(f"{BASE}/users", json=payload)
+    api.post("/users", payload, idempotent=True)
     return redirect(url_for('admin_home'))
 
 if __name__ == "__main__":